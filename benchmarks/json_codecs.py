@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the speed of the JSON codecs in ``relayr.jsoncodec``.
+
+The benchmark encodes and decodes synthetic pages of historical device data
+shaped like the responses of ``Api.get_device_data`` (see its docstring) and
+compares all available codecs with the text round trip done by
+``requests.Response.json()``, which the API layer used before.
+
+Example:
+
+$ python benchmarks/json_codecs.py --number 5
+page size: 1000 results, 452.9 kB
+codec           decode (ms)  encode (ms)
+requests-text          6.43            -
+json                   6.62        11.63
+ujson                  6.44         3.22
+orjson                 2.57         1.16
+"""
+
+import sys
+import json
+import random
+import timeit
+import argparse
+
+from relayr.jsoncodec import CODECS
+
+
+def make_history_page(pagesize=1000, seed=42):
+    "Return a synthetic ``get_device_data`` page with ``pagesize`` results."
+
+    rnd = random.Random(seed)
+    device = '3f8e85c7-3624-4bab-8ea4-a1058a6ca233'
+    results = []
+    for i in range(pagesize):
+        stamp = '2015-03-06T10:%02d:%02d.%03dZ' % (i // 60 % 60, i % 60, rnd.randint(0, 999))
+        results.append({
+            'received': stamp,
+            'readings': [
+                {'meaning': 'acceleration', 'recorded': stamp,
+                 'value': {'x': rnd.uniform(-2, 2), 'y': rnd.uniform(-2, 2), 'z': rnd.uniform(-2, 2)}},
+                {'meaning': 'angularSpeed', 'recorded': stamp,
+                 'value': {'x': rnd.uniform(-90, 90), 'y': rnd.uniform(-90, 90), 'z': rnd.uniform(-90, 90)}},
+                {'meaning': 'temperature', 'recorded': stamp, 'value': rnd.uniform(15, 30)},
+            ]
+        })
+    href = '/devices/%s/history/list?page=%%d&pageSize=%d&start=2015-03-01T00:00:00.000Z&end=2015-04-01T00:00:00.000Z' % (device, pagesize)
+    return {
+        'start': '2015-03-01T00:00:00.000Z',
+        'end': '2015-04-01T00:00:00.000Z',
+        'pageSize': pagesize,
+        'page': 1,
+        'totalResults': 94061,
+        'results': results,
+        '_links': {'self': {'href': href % 1}, 'next': {'href': href % 2}},
+    }
+
+
+def best_of(func, number, repeat=3):
+    "Return the best time of one call in milliseconds."
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--pagesize', type=int, default=1000)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    page = make_history_page(args.pagesize)
+    content = json.dumps(page).encode('utf-8')
+    print('page size: %d results, %.1f kB' % (args.pagesize, len(content) / 1024.0))
+    print('%-14s %12s %12s' % ('codec', 'decode (ms)', 'encode (ms)'))
+
+    # what requests.Response.json() does: decode bytes to text, then parse
+    t = best_of(lambda: json.loads(content.decode('utf-8')), args.number)
+    print('%-14s %12.2f %12s' % ('requests-text', t, '-'))
+
+    for cls in reversed(CODECS):
+        if not cls.available():
+            print('%-14s %12s %12s' % (cls.name, 'n/a', 'n/a'))
+            continue
+        codec = cls()
+        assert codec.loads(codec.dumps(page))['totalResults'] == page['totalResults']
+        dec = best_of(lambda: codec.loads(content), args.number)
+        enc = best_of(lambda: codec.dumps(page), args.number)
+        print('%-14s %12.2f %12.2f' % (cls.name, dec, enc))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
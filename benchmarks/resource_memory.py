@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the memory used by resource objects for a large device catalogue.
+
+The benchmark builds :py:class:`relayr.resources.Device` objects from
+a synthetic ``get_public_devices`` payload, as ``Client.get_public_devices``
+does, and compares them with the previous representation: every field in
+a per-instance ``__dict__`` and one separate device model object (with its
+own readings) per device. The slot-based resources are measured without
+a client and with a client, whose identity map shares the device models,
+but costs a weak reference per object. Only the memory allocated for the
+objects is measured (with tracemalloc, Python 3.4+), not the parsed payload.
+The savings are larger on Python versions before 3.11, where instance
+dictionaries are not as compact.
+
+Example:
+
+$ python3.11 benchmarks/resource_memory.py --count 100000
+devices: 100000, models: 20
+representation       memory (MB)  bytes/device
+dict                       28.23           296
+slots                      23.65           248
+slots+identity             24.27           254
+"""
+
+import sys
+import json
+import random
+import argparse
+import tracemalloc
+
+from relayr.client import Client
+from relayr.resources import Device
+
+
+def make_public_devices(count=100000, models=20, seed=42):
+    "Return a synthetic ``get_public_devices`` payload with ``count`` devices."
+
+    rnd = random.Random(seed)
+    uuid = lambda: '%08x-%04x-%04x-%04x-%012x' % tuple(
+        rnd.getrandbits(n) for n in (32, 16, 16, 16, 48))
+    model_payloads = []
+    for i in range(models):
+        model_payloads.append({
+            'id': uuid(),
+            'name': 'Sensor %d' % i,
+            'manufacturer': 'relayr',
+            'readings': [
+                {'meaning': 'temperature', 'unit': 'celsius',
+                 'minimum': -100, 'maximum': 100, 'precision': 0.25},
+                {'meaning': 'humidity', 'unit': 'percent',
+                 'minimum': 0, 'maximum': 100, 'precision': 0.5},
+            ],
+        })
+    devices = []
+    for i in range(count):
+        devices.append({
+            'id': uuid(),
+            'name': 'device %d' % i,
+            'owner': uuid(),
+            'public': True,
+            'model': rnd.choice(model_payloads),
+        })
+    # parse from JSON so that each device gets its own model dictionaries
+    return json.loads(json.dumps(devices))
+
+
+class DictResource(object):
+    "A resource storing its fields in ``__dict__``, as before."
+
+    def __init__(self, id=None, client=None):
+        self.id = id
+        self.client = client
+
+
+def build_dicts(payload, client):
+    devs = []
+    for p in payload:
+        d = DictResource(p['id'], client=client)
+        for k, v in p.items():
+            if k == 'model':
+                v = DictResource(v['id'], client=client)
+                for mk, mv in p['model'].items():
+                    setattr(v, mk, mv)
+            setattr(d, k, v)
+        devs.append(d)
+    return devs
+
+
+def build_slots(payload, client):
+    return [Device.from_payload(p, client, 'never') for p in payload]
+
+
+def measure(func, *args):
+    "Return the result of a call and the memory allocated by it in bytes."
+
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--models', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    payload = make_public_devices(args.count, args.models)
+    client = Client(token='...', check=False)
+    print('devices: %d, models: %d' % (args.count, args.models))
+    print('%-18s %13s %13s' % ('representation', 'memory (MB)', 'bytes/device'))
+    runs = (
+        ('dict', build_dicts, client),
+        ('slots', build_slots, None),
+        ('slots+identity', build_slots, client),
+    )
+    for name, func, c in runs:
+        devs, size = measure(func, payload, c)
+        assert len(devs) == args.count
+        print('%-18s %13.2f %13d' % (name, size / 1024.0 ** 2, size // args.count))
+        del devs
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the speed of parsing reading timestamps.
+
+The benchmark converts synthetic ``recorded`` timestamps in the format of
+the API (``YYYY-MM-DDTHH:MM:SS.sssZ``) into epoch milliseconds, one by one
+with ``isodate`` (the previous way) and with the fast path of
+:py:mod:`relayr.utils.timestamps`, and all at once with
+:py:func:`relayr.utils.timestamps.to_epoch_ms_array`, which uses array
+operations if NumPy is installed. It also compares parsing into datetime
+objects. The best of three runs is reported.
+
+Example:
+
+$ python3.11 benchmarks/timestamps.py --count 1000000
+timestamps: 1000000, numpy: yes
+method                        time (s)   ns/stamp
+isodate datetime                11.718      11717
+fast datetime                    4.011       4010
+isodate epoch ms                12.148      12147
+fast epoch ms                    4.179       4179
+batch epoch ms                   0.537        537
+"""
+
+import sys
+import time
+import random
+import argparse
+import datetime
+
+import isodate
+
+from relayr.utils import timestamps
+
+
+EPOCH = isodate.parse_datetime('1970-01-01T00:00:00Z')
+
+
+def make_stamps(count=1000000, seed=42):
+    "Return ``count`` random timestamps in the format of the API."
+
+    rnd = random.Random(seed)
+    stamps = []
+    for i in range(count):
+        ms = rnd.randrange(1420070400000, 1451606400000)
+        dt = EPOCH + datetime.timedelta(seconds=ms // 1000)
+        stamps.append(dt.strftime('%Y-%m-%dT%H:%M:%S.') + '%03dZ' % (ms % 1000))
+    return stamps
+
+
+def isodate_epoch_ms(stamps):
+    result = []
+    for s in stamps:
+        delta = isodate.parse_datetime(s) - EPOCH
+        result.append((delta.days * 86400 + delta.seconds) * 1000 +
+            delta.microseconds // 1000)
+    return result
+
+
+def best_time(func, arg, repeat=3):
+    "Return the result of a call and the best time of several calls."
+
+    times = []
+    for i in range(repeat):
+        t0 = time.time()
+        result = func(arg)
+        times.append(time.time() - t0)
+    return result, min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--count', type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    stamps = make_stamps(args.count)
+    numpy = 'yes' if timestamps.numpy is not None else 'no'
+    print('timestamps: %d, numpy: %s' % (args.count, numpy))
+    print('%-24s %13s %10s' % ('method', 'time (s)', 'ns/stamp'))
+    runs = (
+        ('isodate datetime', lambda a: [isodate.parse_datetime(s) for s in a]),
+        ('fast datetime', lambda a: [timestamps.parse_datetime(s) for s in a]),
+        ('isodate epoch ms', isodate_epoch_ms),
+        ('fast epoch ms', lambda a: [timestamps.to_epoch_ms(s) for s in a]),
+        ('batch epoch ms', timestamps.to_epoch_ms_array),
+    )
+    expected = None
+    for name, func in runs:
+        result, secs = best_time(func, stamps)
+        if name.endswith('epoch ms'):
+            result = list(result)
+            if expected is None:
+                expected = result
+            assert result == expected
+        print('%-24s %13.3f %10d' % (name, secs, secs * 1e9 // args.count))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,893 @@
+# -*- coding: utf-8 -*-
+
+"""
+Asynchronous versions of the API layer, the client and the resources.
+
+This module provides :py:class:`AsyncApi` and :py:class:`AsyncClient` for
+use inside asyncio applications. They expose the same endpoints and methods
+as :py:class:`relayr.api.Api` and :py:class:`relayr.client.Client`, but as
+coroutines running on a pooled ``aiohttp`` client session, so one event loop
+can drive many concurrent API calls without needing one thread per call.
+
+This module needs Python 3.6 or later and the ``aiohttp`` package
+(``pip install aiohttp``) and is not imported by the ``relayr`` package itself.
+
+Example:
+
+.. code-block:: python
+
+    import asyncio
+    from relayr.aio import AsyncClient
+
+    async def main():
+        async with AsyncClient(token='...') as c:
+            usr = await c.get_user()
+            async for dev in usr.get_devices():
+                print(dev.id, dev.name)
+
+    asyncio.get_event_loop().run_until_complete(main())
+"""
+
+import asyncio
+import heapq
+import warnings
+from collections import deque
+from itertools import islice
+
+import aiohttp
+
+from relayr import config
+from relayr.api import Api, build_curl_call, server_status_cache
+from relayr.api import _HistoryDedup, _received_key, _sort_keys
+from relayr.api import _split_history_windows, _group_history_windows
+from relayr.client import Client
+from relayr.exceptions import RelayrException, RelayrApiException
+from relayr.history import readings_to_arrays
+from relayr.resources import User, App, Device, DeviceModel, Transmitter, Publisher
+from relayr.resources import Resource
+from relayr.resources import HYDRATE_NEVER, HYDRATE_MISSING, HYDRATE_ALWAYS
+from relayr.utils.misc import get_start_end
+
+
+async def _anext(stream):
+    "Return the next item of an async generator or None at its end."
+
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class AsyncApi(Api):
+    """
+    This class provides asynchronous access to the relayr API endpoints.
+
+    Every endpoint method of :py:class:`relayr.api.Api` is available with the
+    same name and parameters, but returns an awaitable. All instances can
+    share one ``aiohttp.ClientSession`` whose connector pools the connections.
+
+    Example:
+
+    .. code-block:: python
+
+        from relayr.aio import AsyncApi
+        async with AsyncApi(token='...') as a:
+            devices = await asyncio.gather(*[a.get_device(id) for id in ids])
+    """
+
+    def __init__(self, token=None, session=None, check='lazy', limit=None,
+                 limit_per_host=None, retry=None, rate_limiter=None, codec=None):
+        """
+        Object construction.
+
+        :param token: A token generated on the relayr platform for a combination of
+            a relayr user and application.
+        :type token: string
+        :param session: An ``aiohttp.ClientSession`` to be used for all requests,
+            possibly shared with other ``AsyncApi`` instances (by default
+            a new one is created on the first request).
+        :type session: ``aiohttp.ClientSession``
+        :param check: When to check that the API is available: ``'lazy'``
+            (default) right before the first request or ``False`` never.
+        :type check: boolean or string
+        :param limit: Maximum number of simultaneous connections (defaults to
+            ``config.HTTP_POOL_CONNECTIONS * config.HTTP_POOL_MAXSIZE``).
+        :type limit: integer
+        :param limit_per_host: Maximum number of simultaneous connections per
+            host (defaults to ``config.HTTP_POOL_MAXSIZE``).
+        :type limit_per_host: integer
+        :param retry: The policy for retrying calls failing with transient
+            errors, see :py:class:`relayr.api.Api`.
+        :type retry: :py:class:`relayr.retry.RetryPolicy`
+        :param rate_limiter: A rate limiter delaying requests without blocking
+            the event loop, see :py:class:`relayr.api.Api`.
+        :type rate_limiter: :py:class:`relayr.ratelimit.RateLimiter`
+        :param codec: The JSON codec for request and response bodies (defaults
+            to the fastest one available).
+        :type codec: :py:class:`relayr.jsoncodec.JsonCodec`
+        """
+        super(AsyncApi, self).__init__(token=token, check=False, retry=retry,
+            rate_limiter=rate_limiter, codec=codec)
+        self._check_pending = bool(check)
+        self._session = session
+        self._owns_session = session is None
+        if limit is None:
+            limit = config.HTTP_POOL_CONNECTIONS * config.HTTP_POOL_MAXSIZE
+        if limit_per_host is None:
+            limit_per_host = config.HTTP_POOL_MAXSIZE
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def session(self):
+        "The ``aiohttp.ClientSession`` used for all requests."
+
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        "Close the client session unless it was passed in by the caller."
+
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def check(self, force=False):
+        """
+        Check if the API is available and return its server status.
+
+        See :py:meth:`relayr.api.Api.check`, results are cached in the same
+        process-wide cache.
+        """
+        self._check_pending = False
+        status = None if force else server_status_cache.get(self.host)
+        if status is None:
+            status = await self.get_server_status()
+            server_status_cache.set(self.host, status)
+        return status
+
+    def perform_request(self, method, url, data=None, headers=None, retry=None):
+        """
+        Prepare an API call, returning a tuple ``(None, awaitable)``.
+
+        This keeps the calling convention of
+        :py:meth:`relayr.api.Api.perform_request`, so all inherited endpoint
+        methods return the awaitable as their result. Use :py:meth:`request`
+        to get the status code, too.
+        """
+        return None, self._request_data(method, url, data=data, headers=headers,
+            retry=retry)
+
+    async def stream_request(self, method, url, data=None, headers=None, retry=None):
+        """
+        Perform an API call returning a JSON array and yield its elements.
+
+        This is an async generator, so endpoints called with ``stream=True``
+        can be used in ``async for`` loops. Unlike
+        :py:meth:`relayr.api.Api.stream_request` the response is read
+        completely before the first element is yielded.
+        """
+        _, js = await self.request(method, url, data=data, headers=headers,
+            retry=retry)
+        for item in js or ():
+            yield item
+
+    async def iter_device_data(self, deviceID, start=None, end=None, duration=None,
+                               pagesize=1000, workers=0):
+        """
+        Iterate over all historical data of a device in a time interval.
+
+        This is an async generator with the parameters of
+        :py:meth:`relayr.api.Api.iter_device_data`. The next page is fetched
+        while the data points of one page are consumed, with ``workers``
+        greater than zero up to ``workers`` pages are fetched concurrently.
+        """
+        start, end = get_start_end(start=start, end=end, duration=duration)
+        url = self._history_url(deviceID, start, end, pagesize, 1)
+        data = await self._get_history_page(url)
+        if workers > 0:
+            dedup = _HistoryDedup()
+            async for data in self._iter_history_pages(data, deviceID, start,
+                    end, pagesize, workers):
+                for point in dedup(data):
+                    yield point
+        else:
+            async for point in self._follow_history_pages(data):
+                yield point
+
+    async def _iter_history_pages(self, data, deviceID, start, end, pagesize, workers):
+        "Yield a first history page and fetch all further ones concurrently."
+
+        yield data
+        total = (data or {}).get('totalResults') or 0
+        pagesize = (data or {}).get('pageSize') or pagesize
+        pages = (total + pagesize - 1) // pagesize
+        numbers = iter(range(2, pages + 1))
+        fetch = lambda n: asyncio.ensure_future(self._get_history_page(
+            self._history_url(deviceID, start, end, pagesize, n)))
+        tasks = deque(fetch(n) for n in islice(numbers, workers))
+        try:
+            while tasks:
+                data = await tasks.popleft()
+                n = next(numbers, None)
+                if n is not None:
+                    tasks.append(fetch(n))
+                total = max(total, (data or {}).get('totalResults') or 0)
+                yield data
+        finally:
+            for task in tasks:
+                task.cancel()
+        # data arriving meanwhile may have shifted points beyond the last page
+        while pages * pagesize < total:
+            pages += 1
+            data = await self._get_history_page(
+                self._history_url(deviceID, start, end, pagesize, pages))
+            total = max(total, (data or {}).get('totalResults') or 0)
+            yield data
+
+    async def _follow_history_pages(self, data):
+        "Yield the data points of a history page and all pages linked from it."
+
+        count, task = 0, None
+        try:
+            while data is not None:
+                results = data.get('results') or []
+                count += len(results)
+                total = data.get('totalResults')
+                url = self._next_history_url(data)
+                if results and url and (total is None or count < total):
+                    task = asyncio.ensure_future(self._get_history_page(url))
+                data = None
+                for point in results:
+                    yield point
+                if task is not None:
+                    data, task = await task, None
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def iter_devices_data(self, deviceIDs, start=None, end=None, duration=None,
+                                max_points=10000, pagesize=1000, workers=4):
+        """
+        Iterate over the historical data of devices, split into time windows.
+
+        This is an async generator with the parameters of
+        :py:meth:`relayr.api.Api.iter_devices_data`. The first pages of all
+        windows of one level are fetched concurrently, then up to ``workers``
+        windows per device are downloaded concurrently and all data points
+        are merged by their ``received`` timestamps.
+        """
+        start, end = get_start_end(start=start, end=end, duration=duration)
+        windows = await self._plan_history_windows(deviceIDs, start, end,
+            max_points, pagesize)
+        streams = [self._iter_history_windows(i, deviceID, windows[i], workers)
+            for i, deviceID in enumerate(deviceIDs)]
+        try:
+            heads = await asyncio.gather(*[_anext(s) for s in streams])
+            heap = [item for item in heads if item is not None]
+            heapq.heapify(heap)
+            while heap:
+                item = heap[0]
+                yield item[3], item[4]
+                item = await _anext(streams[item[1]])
+                if item is None:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, item)
+        finally:
+            for stream in streams:
+                await stream.aclose()
+
+    async def _iter_history_windows(self, index, deviceID, windows, workers):
+        "Yield the data points of the windows of a device decorated for merging."
+
+        windows = iter(windows)
+        fetch = lambda w: asyncio.ensure_future(self._fetch_history_window(w))
+        tasks = deque(fetch(w) for w in islice(windows, max(workers, 1)))
+        dedup = _HistoryDedup()
+        try:
+            while tasks:
+                results = await tasks.popleft()
+                window = next(windows, None)
+                if window is not None:
+                    tasks.append(fetch(window))
+                points = dedup({'results': results})
+                for item in _sort_keys(points, index, deviceID):
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _plan_history_windows(self, deviceIDs, start, end, max_points, pagesize):
+        "Split the interval per device into windows, see the synchronous version."
+
+        pending = [((i,), deviceID, start, end) for i, deviceID in enumerate(deviceIDs)]
+        planned = []
+        while pending:
+            pages = await asyncio.gather(*[self._get_history_page(
+                self._history_url(deviceID, s, e, pagesize, 1))
+                for key, deviceID, s, e in pending])
+            pending = _split_history_windows(pending, pages, max_points, planned)
+        return _group_history_windows(planned, len(deviceIDs))
+
+    async def _fetch_history_window(self, window):
+        "Return all data points of a window, given its first page."
+
+        deviceID, start, end, data = window
+        points = list(data.get('results') or [])
+        total = data.get('totalResults') or 0
+        pagesize = data.get('pageSize') or len(points)
+        pagenum = 1
+        while points and len(points) < total and pagenum * pagesize < total:
+            pagenum += 1
+            url = self._history_url(deviceID, start, end, pagesize, pagenum)
+            data = await self._get_history_page(url) or {}
+            results = data.get('results') or []
+            if not results:
+                break
+            points += results
+            total = max(total, data.get('totalResults') or 0)
+        points.sort(key=_received_key)
+        return points
+
+    async def _request_data(self, method, url, data=None, headers=None, retry=None):
+        _, js = await self.request(method, url, data=data, headers=headers,
+            retry=retry)
+        return js
+
+    async def request(self, method, url, data=None, headers=None, retry=None):
+        """
+        Perform an API call and return the status code and JSON result.
+
+        :param method: HTTP request method, ``GET``, ``POST``, etc.
+        :type method: string
+        :param url: Full HTTP path.
+        :type url: string
+        :param data: Data to be transmitted, usually *posted*.
+        :type data: object serializable as JSON
+        :param headers: Additional HTTP request headers.
+        :type headers: dictionary
+        :param retry: Opt-in (True) or opt-out (False) of retrying this call
+            on transient failures, None to retry idempotent methods only.
+        :type retry: boolean
+        :rtype: A tuple with the status code and a Python data structure.
+
+        Failed calls are retried according to ``self.retry`` and for returned
+        status codes other than 2XX a ``RelayrApiException`` is raised like
+        in :py:meth:`relayr.api.Api.perform_request`.
+        """
+        if self._check_pending:
+            await self.check()
+
+        if config.LOG:
+            command = build_curl_call(method, url, data, headers)
+            self.logger.info("API request: " + command)
+
+        body = None
+        if data is not None:
+            body = self.codec.dumps(data)
+
+        status, content = await self._send(method, url, body, headers or {}, retry)
+
+        if 200 <= status < 300:
+            try:
+                js = self.codec.loads(content)
+            except ValueError:
+                js = None
+                if config.DEBUG:
+                    warnings.warn("Replaced suspicious API response (invalid JSON?) %r with 'null'!" % content)
+            return status, js
+        else:
+            try:
+                message = self.codec.loads(content)['message']
+            except (ValueError, KeyError, TypeError):
+                message = 'HTTP error {0}'.format(status)
+            args = (message, method.upper(), url)
+            msg = "{0} - {1} {2}".format(*args)
+            command = build_curl_call(method, url, data, headers)
+            msg = "%s - %s" % (msg, command)
+            raise RelayrApiException(msg, status_code=status)
+
+    async def _send(self, method, url, body, headers, retry=None):
+        """
+        Send an HTTP request and return the final status code and content.
+
+        Failures are retried like in :py:meth:`relayr.api.Api._send`,
+        waiting without blocking the event loop.
+        """
+        retries = 0
+        while True:
+            if self.rate_limiter is not None:
+                bucket = self.rate_limiter.bucket(self.token, method, url)
+                wait = bucket.take()
+                while wait > 0:
+                    await asyncio.sleep(wait)
+                    wait = bucket.take()
+            self.retry_stats.record_request()
+            try:
+                async with self.session.request(method.upper(), url, data=body,
+                        headers=headers) as resp:
+                    status = resp.status
+                    content = await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not self.retry.can_retry(method, retries, retry=retry):
+                    self.retry_stats.record_failure()
+                    raise
+                reason = e.__class__.__name__
+                delay = self.retry.backoff(retries)
+            else:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.update(self.token, method, url, resp.headers)
+                if 200 <= status < 300:
+                    return status, content
+                if not self.retry.can_retry(method, retries, status, retry):
+                    self.retry_stats.record_failure()
+                    return status, content
+                reason = status
+                delay = self.retry.backoff(retries, resp.headers.get('Retry-After'))
+            self.retry_stats.record_retry(reason)
+            retries += 1
+            await asyncio.sleep(delay)
+
+
+class AsyncClient(Client):
+    """
+    An asynchronous client providing a higher level interface to the relayr
+    cloud platform.
+
+    All methods are coroutines, the methods returning generators in
+    :py:class:`relayr.client.Client` return asynchronous generators here.
+
+    Example:
+
+    .. code-block:: python
+
+        c = AsyncClient(token='...')
+        async for dev in c.get_public_devices(meaning='temperature'):
+            print(dev.id)
+        await c.close()
+    """
+
+    api_class = AsyncApi
+
+    def __init__(self, token=None, models=None, fleet_client=None, **kwargs):
+        """
+        :arg token: A token generated on the relayr site for the combination of
+            a user and an application.
+        :type token: A string.
+        :arg models: The registry of device models and meanings, see
+            :py:class:`relayr.client.Client`. It is not prewarmed, but filled
+            by :py:meth:`get_public_device_models`.
+        :type models: A :py:class:`relayr.registry.ModelRegistry` object.
+        :arg fleet_client: The synchronous client loading fleet snapshots
+            (by default one with the same token and model registry is
+            created on first use).
+        :type fleet_client: A :py:class:`relayr.client.Client` object.
+
+        Additional keyword arguments like ``session`` or ``check`` are passed
+        to :py:class:`AsyncApi`. Metadata stores are not supported.
+        """
+        super(AsyncClient, self).__init__(token=token, store=None,
+            models=models, prewarm=False, **kwargs)
+        self._fleet_client = fleet_client
+        self._owns_fleet_client = fleet_client is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        "Close the underlying API client session."
+        await self.api.close()
+        if self._owns_fleet_client and self._fleet_client is not None:
+            self._fleet_client.api.shutdown(wait=False)
+            self._fleet_client = None
+
+    async def get_public_apps(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator for all apps on the relayr platform."
+
+        for app in await self.api.get_public_apps():
+            yield await AsyncApp.from_payload(app, self, hydrate)
+
+    async def get_public_publishers(self):
+        "Returns an async generator for all publishers on the relayr platform."
+
+        for pub in await self.api.get_public_publishers():
+            yield await AsyncPublisher.from_payload(pub, self, HYDRATE_NEVER)
+
+    async def get_public_devices(self, meaning='', hydrate=HYDRATE_MISSING):
+        "Returns an async generator for all devices on the relayr platform."
+
+        for dev in await self.api.get_public_devices(meaning=meaning):
+            yield await AsyncDevice.from_payload(dev, self, hydrate)
+
+    async def get_public_device_models(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator for all device models on the relayr platform."
+
+        res = await self.api.get_public_device_models()
+        if self.models is not None:
+            self.models.update(res)
+        for dm in res:
+            yield await AsyncDeviceModel.from_payload(dm, self, hydrate)
+
+    async def get_public_device_model_meanings(self):
+        "Returns an async generator for all device models' meanings."
+
+        for dmm in await self.api.get_public_device_model_meanings():
+            yield dmm
+
+    async def get_user(self):
+        "Returns the relayr user owning the API client."
+
+        info = await self.api.get_oauth2_user_info()
+        usr = AsyncUser.shared(info['id'], self)
+        return usr._update(info, complete=True)
+
+    async def get_app(self):
+        "Returns the relayr application of the API client."
+
+        info = await self.api.get_oauth2_app_info()
+        app = AsyncApp.shared(info['id'], self)
+        await app.get_info()
+        return app
+
+    def get_device(self, id):
+        "Returns the device with the specified ID (without fetching it)."
+
+        return AsyncDevice.shared(id, self)
+
+    def _get_fleet_client(self):
+        "Return the synchronous client loading fleet snapshots."
+
+        if self._fleet_client is None:
+            api = self.api
+            self._fleet_client = Client(token=api.token,
+                models=self.models or False, prewarm=False, check=False,
+                retry=api.retry, rate_limiter=api.rate_limiter, codec=api.codec)
+        return self._fleet_client
+
+    async def fleet_snapshot(self, channels=True):
+        """
+        Returns a read-only, indexed view of all resources of the user.
+
+        The snapshot is loaded by a synchronous client in a thread of the
+        event loop's default executor, see
+        :py:meth:`relayr.client.Client.fleet_snapshot`. It holds synchronous,
+        detached copies of the resources.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None,
+            self._get_fleet_client().fleet_snapshot, channels)
+
+    async def refresh_fleet(self, fleet, channels=True):
+        """
+        Returns the changes since a fleet snapshot and a refreshed snapshot.
+
+        Like :py:meth:`fleet_snapshot` this runs in a thread, see
+        :py:meth:`relayr.client.Client.refresh_fleet`.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None,
+            self._get_fleet_client().refresh_fleet, fleet, channels)
+
+
+class AsyncResource(Resource):
+    """
+    Base class of relayr resources with asynchronous methods.
+
+    Here :py:meth:`hydrate` and hence ``from_payload`` return awaitables.
+    Attributes are not fetched lazily on access, since that would block.
+    """
+
+    __slots__ = ()
+
+    lazy = False
+
+    async def hydrate(self, policy=HYDRATE_MISSING, fields=None, **kwargs):
+        "Fetch the resource details depending on a policy."
+
+        if self._needs_info(policy, fields):
+            await self.get_info(**kwargs)
+        return self
+
+
+class AsyncUser(AsyncResource, User):
+    "A relayr user with asynchronous methods."
+
+    __slots__ = ()
+
+    async def get_info(self):
+        "Retrieves user info and stores it as instance attributes."
+
+        res = await self.client.api.get_oauth2_user_info()
+        if res.get('id') != self.id:
+            raise RelayrException('No info available for user %r.' % self.id)
+        return self._update(res, complete=True)
+
+    async def get_publishers(self):
+        "Returns an async generator of the publishers of the user."
+
+        for pub_json in await self.client.api.get_user_publishers(self.id):
+            yield await AsyncPublisher.from_payload(pub_json, self.client,
+                HYDRATE_NEVER)
+
+    async def get_apps(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator of the apps of the user."
+
+        for app_json in await self.client.api.get_user_apps(self.id):
+            yield await AsyncApp.from_payload(app_json, self.client, hydrate,
+                id_key='app')
+
+    async def get_transmitters(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator of the transmitters of the user."
+
+        for trans_json in await self.client.api.get_user_transmitters(self.id):
+            yield await AsyncTransmitter.from_payload(trans_json, self.client,
+                hydrate)
+
+    async def get_devices(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator of the devices of the user."
+
+        for dev_json in await self.client.api.get_user_devices(self.id):
+            yield await AsyncDevice.from_payload(dev_json, self.client, hydrate)
+
+    async def update(self, name=None, email=None):
+        res = await self.client.api.patch_user(self.id, name=name, email=email)
+        for k in res:
+            setattr(self, k, res[k])
+        return self
+
+    async def register_wunderbar(self):
+        "Returns an async generator over registered Wunderbar devices."
+
+        res = await self.client.api.post_user_wunderbar(self.id)
+        for k, v in res.items():
+            if 'model' in v:
+                item = AsyncDevice.shared(res[k]['id'], self.client)
+            else:
+                item = AsyncTransmitter.shared(res[k]['id'], self.client)
+            await item.get_info()
+            yield item
+
+    async def get_bookmarked_devices(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator of bookmarked devices."
+
+        for dev in await self.client.api.get_user_devices_bookmarks(self.id):
+            yield await AsyncDevice.from_payload(dev, self.client, hydrate)
+
+    async def remove_wunderbar(self):
+        "Removes all Wunderbars associated with the user."
+
+        return await self.client.api.post_users_destroy(self.id)
+
+    async def bookmark_device(self, device):
+        "Bookmarks a device."
+
+        return await self.client.api.post_user_devices_bookmark(self.id, device.id)
+
+    async def delete_device_bookmark(self, device):
+        "Deletes the bookmark of a device."
+
+        return await self.client.api.delete_user_devices_bookmark(self.id,
+            device.id)
+
+
+class AsyncPublisher(AsyncResource, Publisher):
+    "A relayr publisher with asynchronous methods."
+
+    __slots__ = ()
+
+    async def get_apps(self, extended=False, hydrate=HYDRATE_MISSING):
+        "Returns an async generator of the apps of this publisher."
+
+        func = self.client.api.get_publisher_apps
+        fields = AsyncApp.fields
+        if extended:
+            func = self.client.api.get_publisher_apps_extended
+            fields = AsyncApp.extended_fields
+        for a in await func(self.id):
+            app = await AsyncApp.from_payload(a, self.client, HYDRATE_NEVER)
+            yield await app.hydrate(hydrate, fields=fields, extended=extended)
+
+    async def update(self, name=None):
+        "Updates certain information fields of the publisher's."
+
+        res = await self.client.api.patch_publisher(self.id, name=name)
+        for k in res:
+            setattr(self, k, res[k])
+        return self
+
+    async def delete(self):
+        "Deletes the publisher from the relayr platform."
+
+        await self.client.api.delete_publisher(self.id)
+        return self
+
+
+class AsyncApp(AsyncResource, App):
+    "A relayr application with asynchronous methods."
+
+    __slots__ = ()
+
+    async def get_info(self, extended=False):
+        "Get application info and store it as instance attributes."
+
+        func = self.client.api.get_app_info
+        if extended:
+            func = self.client.api.get_app_info_extended
+        res = await func(self.id)
+        for k in res:
+            setattr(self, k, res[k])
+        return self
+
+    async def update(self, description=None, name=None, redirectUri=None):
+        "Updates certain fields in the application's description."
+
+        res = await self.client.api.patch_app(self.id, description=description,
+            name=name, redirectUri=redirectUri)
+        for k in res:
+            setattr(self, k, res[k])
+        return self
+
+    async def delete(self):
+        "Deletes the app from the relayr platform."
+
+        await self.client.api.delete_app(self.id)
+        return self
+
+
+class AsyncDevice(AsyncResource, Device):
+    """
+    A relayr device with asynchronous methods.
+
+    Methods not overwritten here, like ``send_command``, return awaitables
+    of the respective :py:class:`AsyncApi` call.
+    """
+
+    __slots__ = ()
+
+    def _model_class(self):
+        return AsyncDeviceModel
+
+    async def hydrate(self, policy=HYDRATE_MISSING, fields=None, **kwargs):
+        "Fetch the device details and those of its model depending on a policy."
+
+        await super(AsyncDevice, self).hydrate(policy, fields, **kwargs)
+        model = self._peek('model')
+        eager = policy in (HYDRATE_MISSING, HYDRATE_ALWAYS)
+        if eager and isinstance(model, DeviceModel):
+            await model.hydrate(HYDRATE_MISSING)
+        return self
+
+    async def get_info(self):
+        "Retrieves device info and stores it as instance attributes."
+
+        res = await self.client.api.get_device(self.id)
+        self._update(res)
+        if isinstance(self._peek('model'), DeviceModel):
+            await self.model.hydrate(HYDRATE_MISSING)
+        return self
+
+    async def refresh(self):
+        "Fetch the device info again and return what has changed."
+
+        res = await self.client.api.get_device(self.id)
+        changes = self.diff(res)
+        self._update(res, complete=True)
+        return changes
+
+    async def iter_data(self, start=None, end=None, duration=None, pagesize=1000,
+                        workers=0, max_points=None):
+        """
+        Returns an async generator of all historical data in a time interval.
+
+        See :py:meth:`AsyncApi.iter_device_data` and, with ``max_points``,
+        :py:meth:`AsyncApi.iter_devices_data`.
+        """
+        api = self.client.api
+        if max_points:
+            points = api.iter_devices_data([self.id], start=start, end=end,
+                duration=duration, max_points=max_points, pagesize=pagesize,
+                workers=workers or 4)
+            async for deviceID, point in points:
+                yield point
+        else:
+            points = api.iter_device_data(self.id, start=start, end=end,
+                duration=duration, pagesize=pagesize, workers=workers)
+            async for point in points:
+                yield point
+
+    async def get_data_arrays(self, start=None, end=None, duration=None,
+                              pagesize=1000, workers=0, max_points=None):
+        "Get the historical data recorded in a time interval as NumPy arrays."
+
+        points = [p async for p in self.iter_data(start=start, end=end,
+            duration=duration, pagesize=pagesize, workers=workers,
+            max_points=max_points)]
+        return readings_to_arrays(points, pagesize, self._reading_units())
+
+    async def update(self, description=None, name=None, modelID=None, public=None):
+        "Updates certain fields in the device information."
+
+        res = await self.client.api.patch_device(self.id, description=description,
+            name=name, modelID=modelID, public=public)
+        for k in res:
+            setattr(self, k, res[k])
+        return self
+
+    async def get_connected_apps(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator of all apps connected to the device."
+
+        for app_json in await self.client.api.get_device_apps(self.id):
+            yield await AsyncApp.from_payload(app_json, self.client, hydrate)
+
+    async def delete(self):
+        "Deletes the device from the relayr platform."
+
+        await self.client.api.delete_device(self.id)
+        return self
+
+    async def switch_led_on(self, bool=True):
+        "Switches on device's LED for ca. 10 seconds or switches it off."
+
+        await self.client.api.post_device_command_led(self.id, {'cmd': int(bool)})
+        return self
+
+
+class AsyncDeviceModel(AsyncResource, DeviceModel):
+    "A relayr device model with asynchronous methods."
+
+    __slots__ = ()
+
+    async def get_info(self):
+        "Retrieves device model info and stores it as instance attributes."
+
+        res = await self.client.api.get_device_model(self.id)
+        for k, v in res.items():
+            setattr(self, k, v)
+        return self
+
+
+class AsyncTransmitter(AsyncResource, Transmitter):
+    "A relayr transmitter with asynchronous methods."
+
+    __slots__ = ()
+
+    async def get_info(self):
+        "Retrieves transmitter info and stores it as instance attributes."
+
+        res = await self.client.api.get_transmitter(self.id)
+        for k, v in res.items():
+            setattr(self, k, v)
+        return self
+
+    async def delete(self):
+        "Deletes the transmitter from the relayr platform."
+
+        await self.client.api.delete_transmitter(self.id)
+        return self
+
+    async def update(self, name=None):
+        "Updates transmitter info."
+
+        res = await self.client.api.patch_transmitter(self.id, name=name)
+        for k, v in res.items():
+            setattr(self, k, v)
+        return self
+
+    async def get_connected_devices(self, hydrate=HYDRATE_MISSING):
+        "Returns an async generator of devices connected to the transmitter."
+
+        for d in await self.client.api.get_transmitter_devices(self.id):
+            yield await AsyncDevice.from_payload(d, self.client, hydrate)
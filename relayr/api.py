@@ -14,14 +14,27 @@ import platform
 import urllib
 import warnings
 import logging
+import heapq
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
 from relayr import config
 from relayr.version import __version__
 from relayr.exceptions import RelayrApiException
-from relayr.utils.misc import get_start_end
+from relayr.sessions import get_default_pool
+from relayr.retry import RetryPolicy, RetryStats
+from relayr.cache import cache_key
+from relayr.jsoncodec import get_codec
+from relayr.utils.misc import get_start_end, split_range
+from relayr.utils.jsonstream import iter_json_array
+from relayr.utils.concurrency import SingleFlight, readahead
+
+
+# exceptions of failed requests which are worth retrying
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
 
 
 def create_logger(sender):
@@ -80,6 +93,163 @@ def build_curl_call(method, url, data=None, headers=None):
         command += " --data {0}".format(json.dumps(jsdata))
     return command
 
+class ServerStatusCache(object):
+    """
+    A process-wide cache of server status results with a time-to-live.
+
+    All ``Api`` objects share the module-level instance ``server_status_cache``
+    so that creating many API clients for the same host results in at most
+    one server status request per ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=None):
+        """
+        :param ttl: Time-to-live of cached results in seconds (defaults to
+            ``config.SERVER_STATUS_TTL``).
+        :type ttl: number
+        """
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        """
+        Return the cached server status for a host or None if expired/missing.
+
+        :param host: The API host, e.g. ``https://api.relayr.io``.
+        :type host: string
+        """
+        ttl = config.SERVER_STATUS_TTL if self.ttl is None else self.ttl
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry is None or time.time() - entry[0] > ttl:
+            return None
+        return entry[1]
+
+    def set(self, host, status):
+        "Store a server status for a host."
+        with self._lock:
+            self._entries[host] = (time.time(), status)
+
+    def clear(self):
+        "Remove all cached results."
+        with self._lock:
+            self._entries.clear()
+
+
+server_status_cache = ServerStatusCache()
+
+
+def _history_key(point):
+    "Return a key identifying a data point of a history page."
+
+    readings = tuple((r.get('meaning'), r.get('recorded'))
+        for r in point.get('readings') or ())
+    return point.get('received'), readings
+
+
+def _repeated(previous, keys, limit=None):
+    """
+    Return the length of the longest end of ``previous`` repeated at the
+    start of ``keys``, up to ``limit``.
+    """
+    n = min(len(previous), len(keys))
+    if limit is not None:
+        n = min(n, limit)
+    for k in range(n, 0, -1):
+        if previous[-k] == keys[0] and previous[-k:] == keys[:k]:
+            return k
+    return 0
+
+
+class _HistoryDedup(object):
+    """
+    A filter for data points repeated from one history page (or time window)
+    in the next one.
+
+    New data arriving during a download shifts points from the end of a
+    page to the start of the next one, and windows share their boundary,
+    so only data points at the end of the previous page repeated at the
+    start of the next one are removed. For pages with ``totalResults`` at
+    most as many as have arrived since the first page. Identical data
+    points anywhere else are legitimate and kept.
+    """
+
+    def __init__(self):
+        self.previous = []
+        self.first_total = None
+
+    def __call__(self, data):
+        "Return the data points of the next page without repeated ones."
+
+        data = data or {}
+        results = data.get('results') or []
+        total = data.get('totalResults')
+        limit = None
+        if total is not None:
+            if self.first_total is None:
+                self.first_total = total
+            limit = max(total - self.first_total, 0)
+        keys = [_history_key(point) for point in results]
+        skip = _repeated(self.previous, keys, limit)
+        self.previous = keys
+        return results[skip:]
+
+
+def _dedup_history(pages):
+    "Yield the data points of consecutive history pages without repeated ones."
+
+    dedup = _HistoryDedup()
+    for data in pages:
+        for point in dedup(data):
+            yield point
+
+
+def _split_history_windows(pending, pages, max_points, planned):
+    """
+    Split the windows too dense for ``max_points`` given their first pages.
+
+    Windows dense enough are appended to ``planned``, the list of windows
+    to be split further is returned.
+    """
+    split = []
+    for (key, deviceID, s, e), data in zip(pending, pages):
+        data = data or {}
+        total = data.get('totalResults') or 0
+        parts = -(-total // max_points)
+        ranges = split_range(s, e, parts) if parts > 1 else []
+        if len(ranges) > 1:
+            split += [(key + (j,), deviceID, a, b)
+                for j, (a, b) in enumerate(ranges)]
+        else:
+            planned.append((key, (deviceID, s, e, data)))
+    return split
+
+
+def _group_history_windows(planned, count):
+    "Return the planned windows as a list of windows in time order per device."
+
+    planned.sort(key=lambda item: item[0])
+    windows = [[] for i in range(count)]
+    for key, window in planned:
+        windows[key[0]].append(window)
+    return windows
+
+
+def _received_key(point):
+    "Return a key ordering data points by time, those without one last."
+
+    received = point.get('received')
+    return received is None, received or ''
+
+
+def _sort_keys(points, index, deviceID):
+    "Yield data points of a device decorated for merging by time."
+
+    for n, point in enumerate(points):
+        yield _received_key(point), index, n, deviceID, point
+
+
 class Api(object):
     """
     This class provides direct access to the relayr API endpoints.
@@ -96,15 +266,62 @@ class Api(object):
         assert a.get_public_device_model_meanings() > 0
     """
 
-    def __init__(self, token=None):
+    def __init__(self, token=None, session_pool=None, check=True, executor=None,
+                 retry=None, rate_limiter=None, cache=None, codec=None,
+                 coalesce=None):
         """
         Object construction.
 
         :param token: A token generated on the relayr platform for a combination of
             a relayr user and application.
         :type token: string
+        :param session_pool: A pool of keep-alive HTTP sessions, possibly shared
+            with other ``Api`` instances (defaults to the process-wide pool).
+        :type session_pool: :py:class:`relayr.sessions.SessionPool`
+        :param check: When to check that the API is available: ``True`` (default)
+            during construction, ``'lazy'`` right before the first request or
+            ``False`` never (see :py:meth:`check`).
+        :type check: boolean or string
+        :param executor: A pool of worker threads used by :py:meth:`submit`
+            and :py:meth:`map`, possibly shared with other ``Api`` instances
+            (by default one with ``config.API_MAX_WORKERS`` threads is created
+            on first use).
+        :type executor: ``concurrent.futures.Executor``
+        :param retry: The policy for retrying calls failing with transient
+            errors, ``False`` to disable retries (defaults to a policy
+            configured in ``relayr.config``).
+        :type retry: :py:class:`relayr.retry.RetryPolicy`
+        :param rate_limiter: A rate limiter delaying requests, possibly shared
+            with other ``Api`` instances (by default requests are not delayed).
+        :type rate_limiter: :py:class:`relayr.ratelimit.RateLimiter`
+        :param cache: A cache for responses of read-mostly endpoints, possibly
+            shared with other ``Api`` instances (by default nothing is cached).
+        :type cache: :py:class:`relayr.cache.ResponseCache`
+        :param codec: The JSON codec for request and response bodies (defaults
+            to the fastest one available).
+        :type codec: :py:class:`relayr.jsoncodec.JsonCodec`
+        :param coalesce: Flag indicating if identical concurrent ``GET``
+            requests should share one HTTP request (defaults to
+            ``config.COALESCE_REQUESTS``).
+        :type coalesce: boolean
         """
         self.token = token
+        if retry is None:
+            retry = RetryPolicy()
+        elif retry is False:
+            retry = RetryPolicy(total=0)
+        self.retry = retry
+        self.retry_stats = RetryStats()
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.codec = codec or get_codec()
+        self.session_pool = session_pool or get_default_pool()
+        if coalesce is None:
+            coalesce = config.COALESCE_REQUESTS
+        self.single_flight = SingleFlight() if coalesce else None
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._executor_lock = threading.Lock()
         self.host = config.relayrAPI
         self.useragent = config.userAgent
         self.headers = {
@@ -119,17 +336,99 @@ class Api(object):
             self.logger.info('started')
 
         # check if the API is available
-        try:
-            self.get_server_status()
-        except:
-            raise
+        self._check_pending = check == 'lazy'
+        if check is True:
+            self.check()
 
     def __del__(self):
         """Object destruction."""
         if config.LOG:
             self.logger.info('terminated')
 
-    def perform_request(self, method, url, data=None, headers=None):
+    @property
+    def executor(self):
+        "The pool of worker threads used for concurrent API calls."
+
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(config.API_MAX_WORKERS)
+        return self._executor
+
+    def submit(self, method_name, *args, **kwargs):
+        """
+        Schedule a call of an endpoint method on the worker pool.
+
+        :param method_name: The name of an endpoint method, e.g. ``get_device``.
+        :type method_name: string
+        :rtype: A ``concurrent.futures.Future`` holding the result of the call
+            or the exception it raised, e.g. a ``RelayrApiException``.
+
+        Additional arguments are passed to the endpoint method.
+
+        Example:
+
+        .. code-block:: python
+
+            f = api.submit('get_device', deviceID)
+            info = f.result()
+        """
+        func = getattr(self, method_name)
+        return self.executor.submit(func, *args, **kwargs)
+
+    def map(self, method_name, *iterables):
+        """
+        Schedule calls of an endpoint method for many arguments at once.
+
+        The endpoint method is called with arguments taken from all iterables
+        in parallel, like the builtin ``map`` function does. At most
+        as many calls as the worker pool has threads run at the same time.
+
+        :param method_name: The name of an endpoint method, e.g. ``get_device``.
+        :type method_name: string
+        :rtype: A list of ``concurrent.futures.Future`` objects in the order
+            the calls were submitted.
+
+        Example:
+
+        .. code-block:: python
+
+            futures = api.map('get_device', deviceIDs)
+            devices = [f.result() for f in futures]
+        """
+        return [self.submit(method_name, *args) for args in zip(*iterables)]
+
+    def shutdown(self, wait=True):
+        """
+        Shut down the worker pool unless it was passed in by the caller.
+
+        :param wait: Flag indicating if pending calls should be waited for.
+        :type wait: boolean
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def check(self, force=False):
+        """
+        Check if the API is available and return its server status.
+
+        Results are cached process-wide per API host for
+        ``config.SERVER_STATUS_TTL`` seconds, so this is cheap to call
+        repeatedly.
+
+        :param force: Flag indicating if a cached result should be ignored.
+        :type force: boolean
+        :rtype: A dict with certain fields describing the server status.
+        """
+        self._check_pending = False
+        status = None if force else server_status_cache.get(self.host)
+        if status is None:
+            status = self.get_server_status()
+            server_status_cache.set(self.host, status)
+        return status
+
+    def perform_request(self, method, url, data=None, headers=None, retry=None):
         """
         Perform an API call and return a JSON result as Python data structure.
 
@@ -141,30 +440,54 @@ class Api(object):
         :type data: object serializable as JSON
         :param headers: Additional HTTP request headers.
         :type headers: dictionary
+        :param retry: Opt-in (True) or opt-out (False) of retrying this call
+            on transient failures, None to retry idempotent methods only.
+        :type retry: boolean
         :rtype: string
 
         Query parameters are expected in the ``url`` parameter.
+        The request is sent over a pooled keep-alive connection taken
+        from ``self.session_pool`` and retried according to ``self.retry``.
+        Responses of read-mostly endpoints are served from ``self.cache``,
+        if set, while they are fresh and revalidated when they expire.
+        Identical ``GET`` requests sent concurrently by several threads
+        share one HTTP request and its response (or error), if
+        ``self.single_flight`` is set, each caller gets its own parsed copy.
         For returned status codes other than 2XX a ``RelayrApiException``
         is raised which contains the API call (method and URL) plus
         a ``curl`` command replicating the API call for debugging reuse
         on the command-line.
         """
+        if self._check_pending:
+            self.check()
+
         if config.LOG:
             command = build_curl_call(method, url, data, headers)
             self.logger.info("API request: " + command)
 
         json_data = 'null'
         if data is not None:
-            json_data = json.dumps(data)
-            try:
-                json_data = json_data.encode('utf-8')
-            except (UnicodeDecodeError, AttributeError):
-                # bytes/str - no need to re-encode
-                pass
-
-        func = getattr(requests, method.lower())
-        resp = func(url, data=json_data or '', headers=headers or {})
-        resp.connection.close()
+            json_data = self.codec.dumps(data)
+
+        headers = headers or {}
+        cache, entry, ttl = self.cache, None, None
+        if cache is not None and method.upper() == 'GET':
+            ttl = cache.ttl(url)
+        if ttl is not None:
+            key = cache_key(url, headers)
+            entry = cache.get(key)
+            if entry is not None:
+                if entry.is_fresh():
+                    return 200, self.codec.loads(entry.content)
+                headers = headers.copy()
+                headers.update(entry.validators())
+
+        if self.single_flight is not None and method.upper() == 'GET':
+            flight = (url, tuple(sorted(headers.items())), retry)
+            resp = self.single_flight.do(flight, self._send, method, url,
+                json_data or '', headers, retry)
+        else:
+            resp = self._send(method, url, json_data or '', headers, retry)
 
         if config.LOG:
             hd = dict(resp.headers.items())
@@ -172,21 +495,124 @@ class Api(object):
             self.logger.info("API response content: " + resp.content)
 
         status = resp.status_code
+        if status == 304 and entry is not None:
+            cache.refresh(key, ttl)
+            return 200, self.codec.loads(entry.content)
         if 200 <= status < 300:
             try:
-                js = resp.json()
-            except:
+                js = self.codec.loads(resp.content)
+            except ValueError:
                 js = None
                 # raise ValueError('Invalid JSON code(?): %r' % resp.content)
                 if config.DEBUG:
                     warnings.warn("Replaced suspicious API response (invalid JSON?) %r with 'null'!" % resp.content)
+            if ttl is not None:
+                cache.put(key, url, resp.content, resp.headers, ttl)
+            elif cache is not None and method.upper() != 'GET':
+                cache.invalidate(url)
             return status, js
         else:
-            args = (resp.json()['message'], method.upper(), url)
-            msg = "{0} - {1} {2}".format(*args)
+            self._raise_error(method, url, data, headers, resp)
+
+    def stream_request(self, method, url, data=None, headers=None, retry=None):
+        """
+        Perform an API call returning a JSON array and yield its elements.
+
+        The elements are parsed incrementally while the response is being
+        received, so the first element is available before the last one
+        has arrived and the whole array is never kept in memory.
+
+        :param method: HTTP request method, usually ``GET``.
+        :type method: string
+        :param url: Full HTTP path.
+        :type url: string
+        :param data: Data to be transmitted.
+        :type data: object serializable as JSON
+        :param headers: Additional HTTP request headers.
+        :type headers: dictionary
+        :param retry: Opt-in (True) or opt-out (False) of retrying this call
+            on transient failures, None to retry idempotent methods only.
+        :type retry: boolean
+        :rtype: A generator of Python data structures.
+
+        Errors are handled like in :py:meth:`perform_request`, but only
+        raised when iterating over the generator.
+        """
+        if self._check_pending:
+            self.check()
+
+        if config.LOG:
             command = build_curl_call(method, url, data, headers)
-            msg = "%s - %s" % (msg, command)
-            raise RelayrApiException(msg)
+            self.logger.info("API stream request: " + command)
+
+        json_data = 'null'
+        if data is not None:
+            json_data = self.codec.dumps(data)
+
+        resp = self._send(method, url, json_data, headers or {}, retry, stream=True)
+        try:
+            if not 200 <= resp.status_code < 300:
+                self._raise_error(method, url, data, headers, resp)
+            chunks = resp.iter_content(config.STREAM_CHUNK_SIZE)
+            for item in iter_json_array(chunks):
+                yield item
+        finally:
+            resp.close()
+
+    def _raise_error(self, method, url, data, headers, resp):
+        "Raise a ``RelayrApiException`` describing a failed API call."
+
+        status = resp.status_code
+        try:
+            message = self.codec.loads(resp.content)['message']
+        except (ValueError, KeyError, TypeError):
+            message = 'HTTP error {0}'.format(status)
+        args = (message, method.upper(), url)
+        msg = "{0} - {1} {2}".format(*args)
+        command = build_curl_call(method, url, data, headers)
+        msg = "%s - %s" % (msg, command)
+        raise RelayrApiException(msg, status_code=status)
+
+    def _send(self, method, url, body, headers, retry=None, stream=False):
+        """
+        Send an HTTP request and return the final response.
+
+        Connection errors and responses with certain status codes are
+        retried as permitted by ``self.retry``, waiting between attempts.
+        Every attempt waits for ``self.rate_limiter`` first, if set.
+        """
+        retries = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(self.token, method, url)
+            self.retry_stats.record_request()
+            try:
+                resp = self.session_pool.request(method, url, data=body,
+                    headers=headers, stream=stream)
+            except RETRY_EXCEPTIONS as e:
+                if not self.retry.can_retry(method, retries, retry=retry):
+                    self.retry_stats.record_failure()
+                    raise
+                reason = e.__class__.__name__
+                delay = self.retry.backoff(retries)
+            else:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.update(self.token, method, url, resp.headers)
+                status = resp.status_code
+                if status < 400:
+                    return resp
+                if not self.retry.can_retry(method, retries, status, retry):
+                    self.retry_stats.record_failure()
+                    return resp
+                reason = status
+                delay = self.retry.backoff(retries, resp.headers.get('Retry-After'))
+                resp.close()
+            if config.LOG:
+                args = (retries + 1, method.upper(), url, reason, delay)
+                self.logger.info("API retry %d: %s %s failed (%s), waiting %.2f s" % args)
+            self.retry_stats.record_retry(reason)
+            retries += 1
+            time.sleep(delay)
 
 
     # ..............................................................................
@@ -607,14 +1033,19 @@ class Api(object):
     # Applications
     # ..............................................................................
 
-    def get_public_apps(self):
+    def get_public_apps(self, stream=False):
         """
         Get a list of all public relayr applications on the relayr platform.
 
+        :param stream: flag indicating if a generator yielding the apps while
+            they are received should be returned instead of a list
+        :type stream: boolean
         :rtype: list of dicts, each representing a relayr application
         """
         # https://api.relayr.io/apps
         url = '{0}/apps'.format(self.host)
+        if stream:
+            return self.stream_request('GET', url, headers=self.headers)
         _, data = self.perform_request('GET', url, headers=self.headers)
         return data
 
@@ -753,14 +1184,19 @@ class Api(object):
     # Publishers
     # ..............................................................................
 
-    def get_public_publishers(self):
+    def get_public_publishers(self, stream=False):
         """
         Get a list of all publishers on the relayr platform.
 
+        :param stream: flag indicating if a generator yielding the publishers
+            while they are received should be returned instead of a list
+        :type stream: boolean
         :rtype: list of dicts, each representing a relayr publisher
         """
         # https://api.relayr.io/publishers
         url = '{0}/publishers'.format(self.host)
+        if stream:
+            return self.stream_request('GET', url, headers=self.headers)
         _, data = self.perform_request('GET', url, headers=self.headers)
         return data
 
@@ -895,18 +1331,23 @@ class Api(object):
         _, data = self.perform_request('POST', url, data=data, headers=self.headers)
         return data
 
-    def get_public_devices(self, meaning=''):
+    def get_public_devices(self, meaning='', stream=False):
         """
         Get list of all public devices on the relayr platform filtered by meaning.
 
         :param meaning: required meaning in the device model's ``readings`` attribute
         :type meaning: string
+        :param stream: flag indicating if a generator yielding the devices
+            while they are received should be returned instead of a list
+        :type stream: boolean
         :rtype: list of dicts, each representing a relayr device
         """
         # https://api.relayr.io/devices/public
         url = '{0}/devices/public'.format(self.host)
         if meaning:
             url += '?meaning={0}'.format(meaning)
+        if stream:
+            return self.stream_request('GET', url)
         _, data = self.perform_request('GET', url)
         return data
 
@@ -1053,12 +1494,214 @@ class Api(object):
         """
 
         start, end = get_start_end(start=start, end=end, duration=duration)
+        url = self._history_url(deviceID, start, end, pagesize, pagenum)
+        return self._get_history_page(url)
+
+    def _history_url(self, deviceID, start, end, pagesize, pagenum):
+        "Return the URL of a history page for ISO 8601 start and end values."
 
         # https://api.relayr.io/devices/%s/history/list?start=...&end=...&pagesize=...&page=...
-        url = '{0}/devices/{1}/history/list?start={2}&end={3}&pagesize={4}&page={5}'.format(self.host, deviceID, start, end, pagesize, pagenum)
+        return '{0}/devices/{1}/history/list?start={2}&end={3}&pagesize={4}&page={5}'.format(self.host, deviceID, start, end, pagesize, pagenum)
+
+    def _get_history_page(self, url):
         _, data = self.perform_request('GET', url, headers=self.headers)
         return data
 
+    def _next_history_url(self, data):
+        "Return the full URL of the page after a history page or None."
+
+        href = (((data or {}).get('_links') or {}).get('next') or {}).get('href')
+        if not href:
+            return None
+        if href.startswith('/'):
+            href = self.host + href
+        return href
+
+    def iter_device_data(self, deviceID, start=None, end=None, duration=None, pagesize=1000,
+                         workers=0):
+        """
+        Iterate over all historical data of a device in a time interval.
+
+        The pages are followed via their ``next`` links until all
+        ``totalResults`` data points have been returned. While the data points
+        of one page are consumed, the next page is fetched on the worker pool
+        (see :py:attr:`executor`), so at most two pages are held in memory.
+        No request is sent before the first data point is requested, so
+        errors are raised while iterating. Closing the generator early
+        cancels the pending page.
+
+        With ``workers`` greater than zero the number of pages is taken from
+        the ``totalResults`` of the first page and up to ``workers`` of the
+        remaining pages are fetched concurrently instead, still yielding the
+        data points in order. Data points shifted to the next page by data
+        arriving during the download are returned only once, further pages
+        are fetched if ``totalResults`` has grown meanwhile.
+
+        The parameters ``start``, ``end`` and ``duration`` are the same as for
+        :py:meth:`get_device_data`.
+
+        :param deviceID: the device UUID
+        :type deviceID: string
+        :param pagesize: the number of data points per page (up to 1000)
+        :type pagesize: integer
+        :param workers: the maximum number of pages fetched concurrently, 0 to
+            fetch one page ahead following the ``next`` links
+        :type workers: integer
+        :rtype: A generator of data points, i.e. the dicts in the ``results``
+            list of each page with ``received`` and ``readings`` keys.
+
+        Example:
+
+        .. code-block:: python
+
+            for point in api.iter_device_data(deviceID, duration='P7D'):
+                for reading in point['readings']:
+                    print(reading['meaning'], reading['value'])
+        """
+        start, end = get_start_end(start=start, end=end, duration=duration)
+        url = self._history_url(deviceID, start, end, pagesize, 1)
+        data = self._get_history_page(url)
+        if workers > 0:
+            pages = self._iter_history_pages(data, deviceID, start, end, pagesize, workers)
+            points = _dedup_history(pages)
+        else:
+            points = self._follow_history_pages(data)
+        try:
+            for point in points:
+                yield point
+        finally:
+            # cancels the pending page, also when closed early
+            points.close()
+
+    def _iter_history_pages(self, data, deviceID, start, end, pagesize, workers):
+        "Yield a first history page and fetch all further ones concurrently."
+
+        yield data
+        total = (data or {}).get('totalResults') or 0
+        pagesize = (data or {}).get('pageSize') or pagesize
+        pages = (total + pagesize - 1) // pagesize
+        urls = (self._history_url(deviceID, start, end, pagesize, n)
+            for n in range(2, pages + 1))
+        for data in readahead(urls, self._get_history_page, workers, self.executor):
+            total = max(total, (data or {}).get('totalResults') or 0)
+            yield data
+        # data arriving meanwhile may have shifted points beyond the last page
+        while pages * pagesize < total:
+            pages += 1
+            data = self._get_history_page(
+                self._history_url(deviceID, start, end, pagesize, pages))
+            total = max(total, (data or {}).get('totalResults') or 0)
+            yield data
+
+    def _follow_history_pages(self, data):
+        "Yield the data points of a history page and all pages linked from it."
+
+        count, future = 0, None
+        try:
+            while data is not None:
+                results = data.get('results') or []
+                count += len(results)
+                total = data.get('totalResults')
+                url = self._next_history_url(data)
+                if results and url and (total is None or count < total):
+                    future = self.executor.submit(self._get_history_page, url)
+                data = None
+                for point in results:
+                    yield point
+                if future is not None:
+                    data, future = future.result(), None
+        finally:
+            if future is not None:
+                future.cancel()
+
+    def iter_devices_data(self, deviceIDs, start=None, end=None, duration=None,
+                          max_points=10000, pagesize=1000, workers=4):
+        """
+        Iterate over the historical data of devices, split into time windows.
+
+        Deep pagination gets slower the further it goes, so the interval is
+        split into windows with at most ``max_points`` data points each,
+        using only shallow pages. The number of points is taken from the
+        ``totalResults`` of the first page of each window. Windows that are
+        too dense are split further, the first pages of all windows of one
+        level are fetched concurrently. Then up to ``workers`` windows per
+        device are downloaded concurrently on the worker pool (see
+        :py:attr:`executor`) and all data points are merged by their
+        ``received`` timestamps, data points without one come last.
+
+        The parameters ``start``, ``end`` and ``duration`` are the same as for
+        :py:meth:`get_device_data`.
+
+        :param deviceIDs: the device UUIDs
+        :type deviceIDs: list of strings
+        :param max_points: the maximum number of data points per window
+        :type max_points: integer
+        :param pagesize: the number of data points per page (up to 1000)
+        :type pagesize: integer
+        :param workers: the maximum number of windows per device downloaded
+            concurrently
+        :type workers: integer
+        :rtype: A generator of tuples of a device UUID and a data point.
+
+        Example:
+
+        .. code-block:: python
+
+            points = api.iter_devices_data([id1, id2], duration='P90D')
+            for deviceID, point in points:
+                print(deviceID, point['received'])
+        """
+        start, end = get_start_end(start=start, end=end, duration=duration)
+        windows = self._plan_history_windows(deviceIDs, start, end,
+            max_points, pagesize)
+        streams = []
+        for i, deviceID in enumerate(deviceIDs):
+            pages = readahead(windows[i], self._fetch_history_window,
+                workers, self.executor)
+            points = _dedup_history({'results': r} for r in pages)
+            streams.append(_sort_keys(points, i, deviceID))
+        for item in heapq.merge(*streams):
+            yield item[3], item[4]
+
+    def _plan_history_windows(self, deviceIDs, start, end, max_points, pagesize):
+        """
+        Split the interval per device into windows with at most ``max_points``
+        data points.
+
+        :rtype: A list with a list of windows per device, in time order. Each
+            window is a tuple of the device UUID, start, end and first page.
+        """
+        pending = [((i,), deviceID, start, end) for i, deviceID in enumerate(deviceIDs)]
+        planned = []
+        while pending:
+            futures = [self.executor.submit(self._get_history_page,
+                self._history_url(deviceID, s, e, pagesize, 1))
+                for key, deviceID, s, e in pending]
+            pages = [future.result() for future in futures]
+            pending = _split_history_windows(pending, pages, max_points, planned)
+        return _group_history_windows(planned, len(deviceIDs))
+
+    def _fetch_history_window(self, window):
+        "Return all data points of a window, given its first page."
+
+        deviceID, start, end, data = window
+        points = list(data.get('results') or [])
+        total = data.get('totalResults') or 0
+        pagesize = data.get('pageSize') or len(points)
+        pagenum = 1
+        while points and len(points) < total and pagenum * pagesize < total:
+            pagenum += 1
+            url = self._history_url(deviceID, start, end, pagesize, pagenum)
+            data = self._get_history_page(url) or {}
+            results = data.get('results') or []
+            if not results:
+                break
+            points += results
+            total = max(total, data.get('totalResults') or 0)
+        # the pages are merged by time, whatever order the API returns
+        points.sort(key=_received_key)
+        return points
+
     def patch_device(self, deviceID, name=None, description=None, modelID=None, public=None):
         """
         Update one or more attributes of a specific device.
@@ -1182,6 +1825,7 @@ class Api(object):
             data['transport'] = transport
         _, res = self.perform_request('DELETE', url,
                                       data=data, headers=self.headers)
+        return res
 
     def get_device_channels(self, deviceID):
         """
@@ -1243,7 +1887,7 @@ class Api(object):
         _, data = self.perform_request('POST', url, data=command, headers=self.headers)
         return data
 
-    def post_device_data(self, deviceID, data):
+    def post_device_data(self, deviceID, data, retry=False):
         """
         Send JSON formatted data to a device (eg. temperature readings).
 
@@ -1251,11 +1895,15 @@ class Api(object):
         :type deviceID: string
         :param data: the command data
         :type data: anything serializable as JSON
+        :param retry: flag indicating if the call may be retried on transient
+            failures (which might deliver the same data more than once)
+        :type retry: boolean
         :rtype: string
         """
         # https://api.relayr.io/devices/<device_id>/data
         url = '{0}/devices/{1}/data'.format(self.host, deviceID)
-        _, data = self.perform_request('POST', url, data=data, headers=self.headers)
+        _, data = self.perform_request('POST', url, data=data, headers=self.headers,
+            retry=retry)
         return data
 
     def post_device_app(self, deviceID, appID):
@@ -1444,5 +2092,5 @@ class Api(object):
         """
         # https://api.relayr.io/transmitters/<transmitterID>/devices/<deviceID>
         url = '{0}/transmitters/{1}/devices/{2}'.format(self.host, transmitterID, deviceID)
-        _, data = self.perform_request('DELETE', url, data=data, headers=self.headers)
+        _, data = self.perform_request('DELETE', url, headers=self.headers)
         return data
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+An optional cache for API responses that rarely change.
+
+A :py:class:`ResponseCache` passed to :py:class:`relayr.api.Api` keeps
+the responses of read-mostly endpoints like ``get_device_model`` for
+a configurable time-to-live per endpoint. After that time a cached entry
+is revalidated with a conditional request (``If-None-Match`` or
+``If-Modified-Since``), so an unchanged resource costs only a short
+``304 Not Modified`` response. The number of entries (and optionally the
+number of bytes) is bounded, the least recently used entries are evicted
+first. Successful ``PATCH``, ``PUT``, ``POST`` and ``DELETE`` calls remove
+cached entries of the resource they modified and of the lists containing
+it, e.g. the apps of all publishers when an app is changed.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Api
+    from relayr.cache import ResponseCache
+    cache = ResponseCache(maxsize=500, ttls={'get_app_info': 60})
+    api = Api(token='...', cache=cache)
+    api.get_device_model(modelID)  # sent to the API
+    api.get_device_model(modelID)  # served from the cache
+"""
+
+import re
+import time
+import threading
+try:
+    from collections import OrderedDict
+except ImportError:
+    # Python 2.6, needs the backport from PyPI
+    from ordereddict import OrderedDict
+
+from relayr.compat import PY2
+
+if PY2:
+    from urlparse import urlsplit
+else:
+    from urllib.parse import urlsplit
+
+
+# endpoint names, URL path patterns and default time-to-live (in seconds)
+CACHEABLE_ENDPOINTS = (
+    ('get_device_model', r'/device-models/(?!meanings$)[^/]+$', 3600),
+    ('get_public_device_models', r'/device-models$', 3600),
+    ('get_public_device_model_meanings', r'/device-models/meanings$', 3600),
+    ('get_app_info', r'/apps/[^/]+$', 300),
+    ('get_transmitter', r'/transmitters/[^/]+$', 300),
+    ('get_publisher_apps', r'/publishers/[^/]+/apps$', 300),
+)
+
+# URL path patterns of modified resources and of the cacheable lists
+# elsewhere in the API that may contain them
+CONTAINING_LISTS = (
+    (r'/apps(/[^/]+)?$', r'/publishers/[^/]+/apps$'),
+)
+
+
+class CacheEntry(object):
+    "A cached API response body with validators and expiry time."
+
+    __slots__ = ('path', 'content', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, path, content, etag, last_modified, expires):
+        self.path = path
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    def is_fresh(self):
+        "Return True if the entry can be used without revalidation."
+        return time.time() < self.expires
+
+    def validators(self):
+        "Return the headers for a conditional request revalidating this entry."
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    "A thread-safe LRU cache of API responses with time-to-live per endpoint."
+
+    def __init__(self, maxsize=1024, maxbytes=None, ttls=None,
+                 endpoints=CACHEABLE_ENDPOINTS, containing=CONTAINING_LISTS):
+        """
+        :param maxsize: Maximum number of cached responses.
+        :type maxsize: integer
+        :param maxbytes: Maximum total size of cached response bodies in bytes
+            (unbounded by default).
+        :type maxbytes: integer
+        :param ttls: Time-to-live in seconds per endpoint name, overwriting
+            the defaults in ``CACHEABLE_ENDPOINTS``.
+        :type ttls: dict
+        :param endpoints: Endpoint names, URL path patterns and default
+            time-to-live of all cacheable endpoints.
+        :type endpoints: sequence of tuples
+        :param containing: URL path patterns of resources and of the lists
+            containing them which are invalidated with the resources.
+        :type containing: sequence of tuples
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        ttls = ttls or {}
+        self.endpoints = [(name, re.compile(pattern), ttls.get(name, ttl))
+            for name, pattern, ttl in endpoints]
+        self.containing = [(re.compile(pattern), re.compile(lists))
+            for pattern, lists in containing]
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl(self, url):
+        """
+        Return the time-to-live for responses of a URL or None if not cacheable.
+
+        :param url: Full HTTP path of a ``GET`` request.
+        :type url: string
+        """
+        parts = urlsplit(url)
+        if parts.query:
+            return None
+        for name, regex, ttl in self.endpoints:
+            if regex.match(parts.path):
+                return ttl
+        return None
+
+    def get(self, key):
+        """
+        Return the cache entry for a key or None, marking it as recently used.
+
+        :param key: A key as returned by :py:func:`cache_key`.
+        :rtype: A :py:class:`CacheEntry` object or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._move_to_end(key)
+            if entry.is_fresh():
+                self.hits += 1
+            return entry
+
+    def put(self, key, url, content, headers, ttl):
+        """
+        Store a response body with validators from its headers.
+
+        :param key: A key as returned by :py:func:`cache_key`.
+        :param url: Full HTTP path of the request.
+        :type url: string
+        :param content: The raw response body.
+        :type content: bytes
+        :param headers: The response headers.
+        :type headers: dict
+        :param ttl: Time-to-live in seconds.
+        :type ttl: number
+        """
+        entry = CacheEntry(urlsplit(url).path, content, headers.get('ETag'),
+            headers.get('Last-Modified'), time.time() + ttl)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(content)
+            while self._entries and (len(self._entries) > self.maxsize or
+                    (self.maxbytes is not None and self._bytes > self.maxbytes)):
+                self._remove(next(iter(self._entries)))
+
+    def refresh(self, key, ttl):
+        "Extend the lifetime of an entry after a successful revalidation."
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.revalidations += 1
+                entry.expires = time.time() + ttl
+
+    def invalidate(self, url):
+        """
+        Remove all entries of the resource at a URL and of resources below it.
+
+        The entries of the collection containing the resource and of other
+        lists that may contain it (see ``CONTAINING_LISTS``) are removed, too.
+
+        :param url: Full HTTP path of a modifying request.
+        :type url: string
+        """
+        path = urlsplit(url).path.rstrip('/')
+        parent = path.rsplit('/', 1)[0]
+        lists = [l for pattern, l in self.containing if pattern.search(path)]
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                p = entry.path
+                if p == path or p == parent or p.startswith(path + '/') or \
+                        any(l.search(p) for l in lists):
+                    self._remove(key)
+
+    def clear(self):
+        "Remove all entries."
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.content)
+
+    def _move_to_end(self, key):
+        # OrderedDict.move_to_end() is not available on Python 2
+        self._entries[key] = self._entries.pop(key)
+
+
+def cache_key(url, headers):
+    """
+    Return the cache key for a request, distinguishing API tokens.
+
+    :param url: Full HTTP path.
+    :type url: string
+    :param headers: The request headers.
+    :type headers: dict
+    """
+    return (headers.get('Authorization'), url)
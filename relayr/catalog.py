@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+"""
+A local, indexed catalogue of devices answering queries without API calls.
+
+A :py:class:`DeviceCatalog` is filled from device lists, e.g. those of
+``Client.get_public_devices``, ``User.get_devices`` or a fleet snapshot, and
+can be refreshed incrementally with newer lists. It keeps hash indexes on
+reading meaning, model UUID, owner, transmitter and public flag and a sorted
+index on device names for prefix queries. Meanings are taken from the device
+models as far as they are known locally, the catalogue never sends requests.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Client
+    from relayr.catalog import DeviceCatalog
+    c = Client(token='...')
+    catalog = DeviceCatalog(c.get_public_devices())
+    devs = catalog.query(meaning='humidity', model=modelID, public=True)
+"""
+
+import bisect
+import threading
+
+from relayr.resources import DeviceModel
+
+
+# indexed fields, matching the keyword arguments of DeviceCatalog.query()
+INDEXES = ('meaning', 'model', 'owner', 'transmitter', 'public')
+
+# above this share of changed names the sorted name index is rebuilt in one
+# go instead of moving the entries one by one
+REBUILD_RATIO = 1.0 / 64
+
+# above this share of matching devices query results are taken from the
+# sorted name index instead of being sorted
+SCAN_RATIO = 1.0 / 16
+
+
+def _index_keys(device, transmitters, meanings_cache=None):
+    """
+    Return the index keys of a device as a dict mapping index names to tuples.
+
+    The meanings of models are cached by object identity in
+    ``meanings_cache``, if given, as many devices share a model.
+    """
+    model = device._peek('model')
+    model_id, meanings = None, ()
+    if isinstance(model, DeviceModel):
+        model_id = model.id
+        if meanings_cache is not None:
+            meanings = meanings_cache.get(id(model))
+        if not meanings:
+            readings = model._peek('readings') or ()
+            meanings = tuple(set(r.get('meaning') for r in readings))
+            if meanings_cache is not None:
+                meanings_cache[id(model)] = meanings
+    elif model is not None:
+        model_id = model
+    return {
+        'meaning': meanings,
+        'model': (model_id,),
+        'owner': (device._peek('owner'),),
+        'transmitter': tuple(transmitters),
+        'public': (device._peek('public'),),
+    }
+
+
+class DeviceCatalog(object):
+    "A thread-safe, indexed collection of devices for local queries."
+
+    def __init__(self, devices=()):
+        """
+        :param devices: Initial devices.
+        :type devices: iterable of :py:class:`relayr.resources.Device` objects
+        """
+        self._devices = {}
+        self._keys = {}
+        self._transmitters = {}
+        self._indexes = dict((name, {}) for name in INDEXES)
+        self._names = []
+        self._lock = threading.RLock()
+        self.update(devices)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, deviceID):
+        return deviceID in self._devices
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._devices.values()))
+
+    def get(self, deviceID, default=None):
+        "Return the device with some UUID or a default."
+        return self._devices.get(deviceID, default)
+
+    @classmethod
+    def from_fleet(cls, fleet):
+        """
+        Create a catalogue of all devices of a fleet snapshot.
+
+        :param fleet: A snapshot as returned by ``Client.fleet_snapshot()``.
+        :type fleet: :py:class:`relayr.fleet.FleetSnapshot`
+        """
+        catalog = cls(fleet.devices.values())
+        for tid in fleet.by_transmitter:
+            catalog.set_transmitter_devices(tid, fleet.by_transmitter[tid])
+        return catalog
+
+    def add(self, device):
+        """
+        Add a device or reindex it with its current attributes.
+
+        :param device: The device.
+        :type device: :py:class:`relayr.resources.Device`
+        """
+        with self._lock:
+            self._update_names([self._index(device)])
+
+    def _index(self, device, meanings_cache=None):
+        """
+        Index a device, unless its index keys and name are unchanged.
+
+        :rtype: A tuple of the old and the new entry of the name index, each
+            None if absent, or None if the name is unchanged.
+        """
+        self._devices[device.id] = device
+        keys = _index_keys(device, self._transmitters.get(device.id, ()),
+            meanings_cache)
+        name = (device._peek('name') or '').lower()
+        old = self._keys.get(device.id)
+        if old is not None and old[0] == keys and old[1] == name:
+            return None
+        self._unindex(device.id)
+        for index_name, values in keys.items():
+            index = self._indexes[index_name]
+            for value in values:
+                index.setdefault(value, set()).add(device.id)
+        self._keys[device.id] = (keys, name)
+        if old is not None and old[1] == name:
+            return None
+        return (old[1], device.id) if old else None, (name, device.id)
+
+    def _update_names(self, changes):
+        """
+        Apply changed entries of the name index, keeping it sorted.
+
+        :param changes: Tuples of old and new entries as returned by
+            :py:meth:`_index` and None for unchanged names.
+        :type changes: list
+        """
+        changes = [c for c in changes if c is not None]
+        if len(changes) > len(self._names) * REBUILD_RATIO:
+            self._names = sorted((entry[1], i) for i, entry in self._keys.items())
+            return
+        names = self._names
+        for old, new in changes:
+            if old is not None:
+                i = bisect.bisect_left(names, old)
+                if i < len(names) and names[i] == old:
+                    del names[i]
+            if new is not None:
+                bisect.insort(names, new)
+
+    def update(self, devices, prune=False):
+        """
+        Add or reindex many devices, e.g. from a newer device list.
+
+        :param devices: The devices.
+        :type devices: iterable of :py:class:`relayr.resources.Device` objects
+        :param prune: Flag indicating if devices not contained in ``devices``
+            should be removed.
+        :type prune: boolean
+        :rtype: A tuple of the sets of UUIDs of added and removed devices.
+        """
+        with self._lock:
+            before = set(self._devices)
+            seen = set()
+            changes = []
+            meanings_cache = {}
+            for dev in devices:
+                changes.append(self._index(dev, meanings_cache))
+                seen.add(dev.id)
+            removed = set()
+            if prune:
+                removed = before - seen
+                for deviceID in removed:
+                    changes.append(self._unindex(deviceID))
+                    self._devices.pop(deviceID, None)
+            self._update_names(changes)
+            return seen - before, removed
+
+    def remove(self, deviceID):
+        "Remove the device with some UUID, if present."
+
+        with self._lock:
+            self._update_names([self._unindex(deviceID)])
+            self._devices.pop(deviceID, None)
+
+    def _unindex(self, deviceID):
+        """
+        Remove a device from the hash indexes.
+
+        :rtype: A tuple of its entry in the name index and None to be
+            removed with :py:meth:`_update_names`, or None if not indexed.
+        """
+        entry = self._keys.pop(deviceID, None)
+        if entry is None:
+            return None
+        keys, name = entry
+        for index_name, values in keys.items():
+            index = self._indexes[index_name]
+            for value in values:
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(deviceID)
+                    if not ids:
+                        del index[value]
+        return (name, deviceID), None
+
+    def set_transmitter_devices(self, transmitterID, deviceIDs):
+        """
+        Record the devices connected to a transmitter.
+
+        Devices not in the catalogue are ignored.
+
+        :param transmitterID: The transmitter UUID.
+        :type transmitterID: string
+        :param deviceIDs: The UUIDs of all devices connected to it.
+        :type deviceIDs: iterable of strings
+        """
+        with self._lock:
+            deviceIDs = set(deviceIDs)
+            old = self._indexes['transmitter'].get(transmitterID, set())
+            changes = []
+            meanings_cache = {}
+            for deviceID in old | deviceIDs:
+                tids = set(self._transmitters.get(deviceID, ()))
+                if deviceID in deviceIDs:
+                    tids.add(transmitterID)
+                else:
+                    tids.discard(transmitterID)
+                self._transmitters[deviceID] = tuple(sorted(tids))
+                if deviceID in self._devices:
+                    changes.append(self._index(self._devices[deviceID],
+                        meanings_cache))
+            self._update_names(changes)
+
+    def query(self, meaning=None, model=None, owner=None, transmitter=None,
+              public=None, name_prefix=None):
+        """
+        Return the devices matching all given criteria, sorted by name.
+
+        :param meaning: A reading meaning, e.g. ``'temperature'``.
+        :type meaning: string
+        :param model: A device model UUID.
+        :type model: string
+        :param owner: An owner's user UUID.
+        :type owner: string
+        :param transmitter: A transmitter UUID.
+        :type transmitter: string
+        :param public: The public flag.
+        :type public: boolean
+        :param name_prefix: A prefix of the device names (case-insensitive).
+        :type name_prefix: string
+        :rtype: A list of :py:class:`relayr.resources.Device` objects.
+        """
+        criteria = {'meaning': meaning, 'model': model, 'owner': owner,
+            'transmitter': transmitter, 'public': public}
+        with self._lock:
+            sets = []
+            for name, value in criteria.items():
+                if value is not None:
+                    sets.append(self._indexes[name].get(value, set()))
+            if name_prefix is not None:
+                sets.append(self._prefix_ids(name_prefix.lower()))
+            if not sets:
+                return [self._devices[i] for name, i in self._names]
+            sets.sort(key=len)
+            ids = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+            if len(ids) > len(self._names) * SCAN_RATIO:
+                # cheaper than sorting many results
+                return [self._devices[i] for name, i in self._names if i in ids]
+            names = sorted((self._keys[i][1], i) for i in ids)
+            return [self._devices[i] for name, i in names]
+
+    def _prefix_ids(self, prefix):
+        start = bisect.bisect_left(self._names, (prefix,))
+        ids = set()
+        for name, deviceID in self._names[start:]:
+            if not name.startswith(prefix):
+                break
+            ids.add(deviceID)
+        return ids
+
+    def values(self, index):
+        """
+        Return the distinct values of an index, e.g. all known meanings.
+
+        :param index: One of ``INDEXES``.
+        :type index: string
+        :rtype: list
+        """
+        with self._lock:
+            return list(self._indexes[index])
@@ -5,10 +5,14 @@
 import platform
 
 from relayr import config
-from relayr.api import Api
+from relayr.api import Api, RETRY_EXCEPTIONS
 from relayr.version import __version__
 from relayr.exceptions import RelayrApiException
 from relayr.resources import User, App, Device, DeviceModel, Transmitter, Publisher
+from relayr.resources import IdentityMap, HYDRATE_NEVER, HYDRATE_LAZY
+from relayr.fleet import load_fleet_snapshot, refresh_fleet
+from relayr.registry import get_default_registry
+from relayr.store import token_digest
 
 
 class Client(object):
@@ -26,23 +30,121 @@ class Client(object):
         d = next(devs)
         apps = usr.get_apps()
     """
-    def __init__(self, token=None):
+
+    #: The class of the API client created by the constructor.
+    api_class = Api
+
+    def __init__(self, token=None, store=None, models=None, prewarm=None, **kwargs):
         """
         :arg token: A token generated on the relayr site for the combination of
             a user and an application.
         :type token: A string.
+        :arg store: A persistent store for resource details and lists, which
+            the client reads through (see :py:mod:`relayr.store`). With a
+            store the API is checked lazily by default, so the client can be
+            created during API outages.
+        :type store: A :py:class:`relayr.store.MetadataStore` object.
+        :arg models: The registry of device models and meanings, by default
+            the one shared by all clients of the process (see
+            :py:mod:`relayr.registry`), False for none.
+        :type models: A :py:class:`relayr.registry.ModelRegistry` object.
+        :arg prewarm: Flag indicating if all public device models should be
+            loaded into the registry now, unless done recently (defaults to
+            ``config.PREWARM_MODELS``).
+        :type prewarm: boolean
+
+        Additional keyword arguments like ``session_pool``, ``check``,
+        ``retry`` or ``rate_limiter`` are passed to :py:attr:`api_class`,
+        by default :py:class:`relayr.api.Api`.
+
+        All resource objects returned for the same UUID are identical, as long
+        as they are in use, see :py:class:`relayr.resources.IdentityMap`.
         """
-
-        self.api = Api(token=token)
-
-    def get_public_apps(self):
+        if store is not None:
+            kwargs.setdefault('check', 'lazy')
+        self.api = self.api_class(token=token, **kwargs)
+        self.resources = IdentityMap()
+        self.store = store
+        if models is None:
+            models = get_default_registry()
+        elif models is False:
+            models = None
+        self.models = models
+        if prewarm is None:
+            prewarm = config.PREWARM_MODELS
+        if prewarm and self.models is not None:
+            self.models.prewarm(self.api)
+
+    def fetch(self, kind, key, func, *args, **kwargs):
+        """
+        Call an API endpoint method, reading through the metadata store.
+
+        Without a store this is just ``func(*args)``. With a store, a fresh
+        stored payload is returned without calling the API. Otherwise the
+        result of the call is stored, or, if the API is unavailable, an
+        expired payload is returned if the store permits it. A ``404``
+        response removes the stored payload. Stored payloads are kept per
+        API token, so clients with different tokens never share them.
+
+        :param kind: The kind of payload, e.g. ``'device'``.
+        :type kind: string
+        :param key: The key of the payload, usually a resource UUID.
+        :type key: string
+        :param func: An endpoint method of ``self.api``.
+        :type func: callable
+        :param refresh: Flag indicating if the API should be called even if
+            the stored payload is fresh (keyword argument only).
+        :type refresh: boolean
+        :rtype: The (stored) API response.
+        """
+        refresh = kwargs.pop('refresh', False)
+        store = getattr(self, 'store', None)
+        if store is None:
+            return func(*args)
+        key = '%s:%s' % (token_digest(self.api.token), key)
+        entry = store.get(kind, key)
+        if not refresh and entry is not None and entry.is_fresh():
+            return entry.payload
+        try:
+            res = func(*args)
+        except RETRY_EXCEPTIONS:
+            if entry is None or not store.is_servable(entry):
+                raise
+            self._log_stale(kind, key, entry)
+            return entry.payload
+        except RelayrApiException as e:
+            if e.status_code == 404:
+                store.delete(kind, key)
+            unavailable = e.status_code is None or e.status_code == 429 or \
+                e.status_code >= 500
+            if not unavailable or entry is None or not store.is_servable(entry):
+                raise
+            self._log_stale(kind, key, entry)
+            return entry.payload
+        store.put(kind, key, res)
+        return res
+
+    def _log_stale(self, kind, key, entry):
+        if config.LOG:
+            args = (kind, key, entry.age())
+            self.api.logger.info("API unavailable, serving stored %s %s (%.0f s old)" % args)
+
+    def get_public_apps(self, hydrate=HYDRATE_LAZY, prefetch=0):
         """
         Returns a generator for all apps on the relayr platform.
 
         A generator is returned since the called API method always
         returns the entire results list and not a paginated one.
+        The list is parsed while it is received, so the first app is
+        available before the entire list is downloaded.
 
 
+        :param hydrate: The policy for fetching the details of each app,
+            see :py:meth:`relayr.resources.Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`relayr.resources.Resource.from_payloads`.
+        :type prefetch: integer
         :rtype: A generator for :py:class:`relayr.resources.App` objects.
 
         .. code-block:: python
@@ -53,10 +155,9 @@ class Client(object):
                 print('%s %s' % (app.id, app.name))
         """
 
-        for app in self.api.get_public_apps():
-            a = App(app['id'], client=self)
-            a.get_info()
-            yield a
+        res = self.api.get_public_apps(stream=True)
+        for app in App.from_payloads(res, self, hydrate, prefetch):
+            yield app
 
     def get_public_publishers(self):
         """
@@ -64,37 +165,40 @@ class Client(object):
 
         A generator is returned since the called API method always
         returns the entire results list and not a paginated one.
+        The list is parsed while it is received.
 
 
         :rtype: A generator for :py:class:`relayr.resources.Publisher` objects.
         """
 
-        for pub in self.api.get_public_publishers():
-            p = Publisher(pub['id'], client=self)
-            for k in pub:
-                setattr(p, k, pub[k])
-            # p.get_info()
-            yield p
+        for pub in self.api.get_public_publishers(stream=True):
+            yield Publisher.from_payload(pub, self, HYDRATE_NEVER)
 
-    def get_public_devices(self, meaning=''):
+    def get_public_devices(self, meaning='', hydrate=HYDRATE_LAZY, prefetch=0):
         """
         Returns a generator for all devices on the relayr platform.
 
         A generator is returned since the called API method always
         returns the entire results list and not a paginated one.
+        The list is parsed while it is received.
 
 
         :arg meaning: The *meaning* (type) of the desired devices.
         :type meaning: string
+        :param hydrate: The policy for fetching the details of each device,
+            see :py:meth:`relayr.resources.Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`relayr.resources.Resource.from_payloads`.
+        :type prefetch: integer
         :rtype: A generator for :py:class:`relayr.resources.Device` objects.
         """
 
-        for dev in self.api.get_public_devices(meaning=meaning):
-            d = Device(dev['id'], client=self)
-            d.get_info()
-            yield d
+        res = self.api.get_public_devices(meaning=meaning, stream=True)
+        for dev in Device.from_payloads(res, self, hydrate, prefetch):
+            yield dev
 
-    def get_public_device_models(self):
+    def get_public_device_models(self, hydrate=HYDRATE_LAZY, prefetch=0):
         """
         Returns a generator for all device models on the relayr platform.
 
@@ -102,13 +206,20 @@ class Client(object):
         returns the entire results list and not a paginated one.
 
 
+        :param hydrate: The policy for fetching the details of each device model,
+            see :py:meth:`relayr.resources.Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`relayr.resources.Resource.from_payloads`.
+        :type prefetch: integer
         :rtype: A generator for :py:class:`relayr.resources.DeviceModel` objects.
         """
 
-        for dm in self.api.get_public_device_models():
-            d = DeviceModel(dm['id'], client=self)
-            d.get_info()
-            yield d
+        res = self.api.get_public_device_models()
+        if self.models is not None:
+            self.models.update(res)
+        for dm in DeviceModel.from_payloads(res, self, hydrate, prefetch):
+            yield dm
 
     def get_public_device_model_meanings(self):
         """
@@ -118,7 +229,8 @@ class Client(object):
         field.
 
         A generator is returned since the called API method always
-        returns the entire results list and not a paginated one.
+        returns the entire results list and not a paginated one. The
+        meanings are kept in the client's model registry.
 
 
         :rtype: A device model meaning (as a dictionary) generator.
@@ -128,7 +240,12 @@ class Client(object):
             {'key': 'humidity', 'value': 'humidity'}
         """
 
-        for dmm in self.api.get_public_device_model_meanings():
+        func = self.api.get_public_device_model_meanings
+        if self.models is not None:
+            res = self.models.meanings(func)
+        else:
+            res = func()
+        for dmm in res:
             yield dmm
 
     def get_user(self):
@@ -137,11 +254,9 @@ class Client(object):
 
         :rtype: A :py:class:`relayr.resources.User` object.
         """
-        info = self.api.get_oauth2_user_info()
-        usr = User(info['id'], client=self)
-        for k in info:
-            setattr(usr, k, info[k])
-        return usr
+        info = self.fetch('user', 'me', self.api.get_oauth2_user_info)
+        usr = User.shared(info['id'], self)
+        return usr._update(info, complete=True)
 
     def get_app(self):
         """
@@ -150,10 +265,52 @@ class Client(object):
         :rtype: A :py:class:`relayr.resources.App` object.
         """
         info = self.api.get_oauth2_app_info()
-        app = App(info['id'], client=self)
+        app = App.shared(info['id'], self)
         app.get_info()
         return app
 
+    def fleet_snapshot(self, channels=True):
+        """
+        Returns a read-only, indexed view of all resources of the user.
+
+        The user, their transmitters, devices, bookmarks, device models and
+        device channels are loaded level by level with concurrent calls on
+        the worker pool of the API client, fetching each device model only
+        once. See :py:mod:`relayr.fleet` for details. With a metadata store
+        all calls read through it, so a snapshot can be loaded during API
+        outages.
+
+        :arg channels: Flag indicating if device channels should be loaded
+            (one request per device).
+        :type channels: boolean
+        :rtype: A :py:class:`relayr.fleet.FleetSnapshot` object. Its
+            ``requests`` attribute holds the number of HTTP requests sent
+            for loading it.
+        """
+        return load_fleet_snapshot(self, channels=channels)
+
+    def refresh_fleet(self, fleet, channels=True):
+        """
+        Returns the changes since a fleet snapshot and a refreshed snapshot.
+
+        The device and transmitter lists are loaded again and compared with
+        the devices of the snapshot. Only devices whose list entries have
+        changed are fetched in detail, models and channels are loaded only
+        for added and changed devices. See :py:mod:`relayr.fleet`. The lists
+        and changed devices are fetched even if a metadata store has fresh
+        entries for them.
+
+        :arg fleet: A snapshot returned by :py:meth:`fleet_snapshot` or an
+            earlier refresh.
+        :type fleet: A :py:class:`relayr.fleet.FleetSnapshot` object.
+        :arg channels: Flag indicating if device channels should be kept
+            and loaded for added and changed devices.
+        :type channels: boolean
+        :rtype: A :py:class:`relayr.fleet.FleetDiff` object. Its
+            ``snapshot`` attribute holds the refreshed snapshot.
+        """
+        return refresh_fleet(self, fleet, channels=channels)
+
     def get_device(self, id):
         """
         Returns the device with the specified ID.
@@ -162,4 +319,4 @@ class Client(object):
         :type id: string
         :rtype: A :py:class:`relayr.resources.Device` object.
         """
-        return Device(id=id, client=self)
+        return Device.shared(id, self)
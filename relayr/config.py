@@ -25,6 +25,19 @@ LOG = False
 LOG_DIR = os.getcwd()
 RELAYR_FOLDER = os.path.expanduser('~/.relayr')
 MQTT_CERT_URL = 'http://mqtt.relayr.io/relayr.crt'
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 10
+HTTP_POOL_BLOCK = False
+SERVER_STATUS_TTL = 60
+API_MAX_WORKERS = 8
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_MAX_BACKOFF = 30
+JSON_CODEC = ''
+STREAM_CHUNK_SIZE = 64 * 1024
+MODEL_REGISTRY_TTL = 3600
+PREWARM_MODELS = False
+COALESCE_REQUESTS = True
 
 # overwrite with environment variables if given
 relayrAPI = os.environ.get('RELAYR_API', relayrAPI)
@@ -36,6 +49,19 @@ LOG = True if os.environ.get('RELAYR_LOG', 'False') == 'True' else False
 LOG_DIR = os.environ.get('RELAYR_LOG_DIR', LOG_DIR)
 RELAYR_FOLDER = os.environ.get('RELAYR_FOLDER', RELAYR_FOLDER)
 MQTT_CERT_URL = os.environ.get('MQTT_CERT_URL', MQTT_CERT_URL)
+HTTP_POOL_CONNECTIONS = int(os.environ.get('RELAYR_HTTP_POOL_CONNECTIONS', HTTP_POOL_CONNECTIONS))
+HTTP_POOL_MAXSIZE = int(os.environ.get('RELAYR_HTTP_POOL_MAXSIZE', HTTP_POOL_MAXSIZE))
+HTTP_POOL_BLOCK = True if os.environ.get('RELAYR_HTTP_POOL_BLOCK', 'False') == 'True' else False
+SERVER_STATUS_TTL = float(os.environ.get('RELAYR_SERVER_STATUS_TTL', SERVER_STATUS_TTL))
+API_MAX_WORKERS = int(os.environ.get('RELAYR_API_MAX_WORKERS', API_MAX_WORKERS))
+RETRY_TOTAL = int(os.environ.get('RELAYR_RETRY_TOTAL', RETRY_TOTAL))
+RETRY_BACKOFF_FACTOR = float(os.environ.get('RELAYR_RETRY_BACKOFF_FACTOR', RETRY_BACKOFF_FACTOR))
+RETRY_MAX_BACKOFF = float(os.environ.get('RELAYR_RETRY_MAX_BACKOFF', RETRY_MAX_BACKOFF))
+JSON_CODEC = os.environ.get('RELAYR_JSON_CODEC', JSON_CODEC)
+STREAM_CHUNK_SIZE = int(os.environ.get('RELAYR_STREAM_CHUNK_SIZE', STREAM_CHUNK_SIZE))
+MODEL_REGISTRY_TTL = float(os.environ.get('RELAYR_MODEL_REGISTRY_TTL', MODEL_REGISTRY_TTL))
+PREWARM_MODELS = True if os.environ.get('RELAYR_PREWARM_MODELS', 'False') == 'True' else False
+COALESCE_REQUESTS = False if os.environ.get('RELAYR_COALESCE_REQUESTS', 'True') == 'False' else True
 
 # derived variable, HTTP user-agent string
 userAgent = userAgentString.format(
@@ -15,8 +15,15 @@ At the moment two exception classes are provided:
 class RelayrApiException(Exception):
     """
     RelayrApiException
+
+    The HTTP status code of a failed API call is available as attribute
+    ``status_code`` (None if not known).
     """
 
+    def __init__(self, message='', status_code=None):
+        super(RelayrApiException, self).__init__(message)
+        self.status_code = status_code
+
 class RelayrException(Exception):
     """
     RelayrException
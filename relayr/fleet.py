@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bulk-loaded, indexed views of all resources of a user.
+
+:py:meth:`relayr.client.Client.fleet_snapshot` loads the user, their
+transmitters, devices, bookmarked devices, device models and (optionally)
+device channels level by level, sending the calls of each level
+concurrently on the worker pool of the API client. Device models shared by
+many devices are fetched only once. The result is a
+:py:class:`FleetSnapshot` with indexes by UUID, transmitter, model and
+reading meaning, holding copies of the resources which do not change when
+the shared resources of the client are updated.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Client
+    c = Client(token='...')
+    fleet = c.fleet_snapshot()
+    for dev in fleet.devices_with_meaning('temperature'):
+        print(dev.name, [t.name for t in fleet.transmitters_of_device(dev.id)])
+    print('%d requests' % fleet.requests)
+
+:py:meth:`relayr.client.Client.refresh_fleet` reloads the lists of a
+snapshot and returns a :py:class:`FleetDiff` with the added, removed and
+changed devices and a new snapshot, leaving the old one unchanged. Only
+devices whose list entries differ from those in the old snapshot are
+fetched in detail, with models and channels reused for all others, so
+unchanged devices cost no extra requests:
+
+.. code-block:: python
+
+    diff = c.refresh_fleet(fleet)
+    for deviceID in diff.changed_ids():
+        reprocess(diff.snapshot.devices.get(deviceID))
+    fleet = diff.snapshot
+"""
+
+from collections import namedtuple
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    # Python 2, where the mappings are not protected against modification
+    MappingProxyType = dict
+
+from relayr.resources import Resource, User, Device, DeviceModel, Transmitter
+from relayr.resources import HYDRATE_NEVER
+
+
+_SnapshotBase = namedtuple('_SnapshotBase', ['user', 'transmitters',
+    'devices', 'models', 'bookmarks', 'channels', 'by_transmitter',
+    'by_model', 'by_meaning', 'requests'])
+
+
+class FleetSnapshot(_SnapshotBase):
+    """
+    A read-only view of all resources of a user at one point in time.
+
+    Attributes:
+
+    - ``user``: the :py:class:`relayr.resources.User`
+    - ``transmitters``, ``devices``, ``models``: read-only mappings of UUIDs
+      to :py:class:`relayr.resources.Transmitter`,
+      :py:class:`relayr.resources.Device` and
+      :py:class:`relayr.resources.DeviceModel` objects
+    - ``bookmarks``: a tuple of the UUIDs of bookmarked devices
+    - ``channels``: a read-only mapping of device UUIDs to tuples of channel
+      dicts (empty if channels were not loaded)
+    - ``by_transmitter``, ``by_model``, ``by_meaning``: read-only mappings of
+      transmitter UUIDs, model UUIDs and reading meanings to tuples of
+      device UUIDs
+    - ``requests``: the number of HTTP requests used to load the snapshot
+
+    The resource objects are copies of the shared objects of the client (see
+    :py:class:`relayr.resources.IdentityMap`) made when the snapshot was
+    loaded, with the devices of the snapshot sharing one copy of each model.
+    They never fetch missing attributes on access.
+    """
+
+    __slots__ = ()
+
+    def _lookup(self, index, key):
+        return tuple(self.devices[i] for i in index.get(key, ()))
+
+    def devices_of_transmitter(self, transmitterID):
+        "Return a tuple of the devices connected to a transmitter."
+        return self._lookup(self.by_transmitter, transmitterID)
+
+    def devices_of_model(self, modelID):
+        "Return a tuple of the devices of a device model."
+        return self._lookup(self.by_model, modelID)
+
+    def devices_with_meaning(self, meaning):
+        "Return a tuple of the devices with a reading of some meaning."
+        return self._lookup(self.by_meaning, meaning)
+
+    def transmitters_of_device(self, deviceID):
+        "Return a tuple of the transmitters a device is connected to."
+        return tuple(self.transmitters[tid]
+            for tid, ids in self.by_transmitter.items() if deviceID in ids)
+
+    def bookmarked_devices(self):
+        "Return a tuple of the bookmarked devices."
+        return tuple(self.devices[i] for i in self.bookmarks)
+
+
+_DiffBase = namedtuple('_DiffBase', ['added', 'removed', 'changed', 'models',
+    'snapshot', 'requests'])
+
+
+class FleetDiff(_DiffBase):
+    """
+    The differences between a fleet snapshot and a refreshed one.
+
+    Attributes:
+
+    - ``added``, ``removed``: frozensets of the UUIDs of added and removed
+      devices
+    - ``changed``: a read-only mapping of the UUIDs of changed devices to
+      dicts mapping field names to tuples of the old and the new value
+    - ``models``: a read-only mapping of the UUIDs of devices whose model
+      changed to tuples of the old and the new model UUID
+    - ``snapshot``: the refreshed :py:class:`FleetSnapshot`
+    - ``requests``: the number of HTTP requests used for the refresh
+    """
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    __nonzero__ = __bool__
+
+    def changed_ids(self):
+        "Return a frozenset of the UUIDs of all added or changed devices."
+        return self.added | frozenset(self.changed)
+
+
+# kinds of metadata store entries of the endpoint methods called here, all
+# taking the UUID used as key as their only argument
+_STORE_KINDS = {
+    'get_oauth2_user_info': 'user',
+    'get_user_transmitters': 'user_transmitters',
+    'get_user_devices': 'user_devices',
+    'get_user_devices_bookmarks': 'user_bookmarks',
+    'get_transmitter_devices': 'transmitter_devices',
+    'get_device': 'device',
+    'get_device_model': 'device_model',
+    'get_device_channels': 'device_channels',
+}
+
+
+def _gather(client, calls, sent, refresh=False):
+    """
+    Call endpoint methods concurrently and return their results in order.
+
+    The calls read through the client's metadata store (see
+    :py:meth:`relayr.client.Client.fetch`, with ``refresh``), the names of
+    the endpoint methods actually called are appended to ``sent``.
+    """
+    api = client.api
+
+    def call(name, args):
+        func = getattr(api, name)
+
+        def send(*values):
+            sent.append(name)
+            return func(*values)
+
+        key = args[0] if args else 'me'
+        return client.fetch(_STORE_KINDS[name], key, send, *args, refresh=refresh)
+
+    futures = [api.executor.submit(call, name, args) for name, args in calls]
+    return [f.result() for f in futures]
+
+
+def _detach(obj, copies):
+    """
+    Return a copy of a resource which does not fetch details on access.
+
+    Resources in fields (the model of a device) are copied, too, once per
+    class and UUID in ``copies``.
+    """
+    key = (obj.__class__, obj.id)
+    copy = copies.get(key)
+    if copy is None:
+        copy = copies[key] = obj.__class__(obj.id, client=obj.client)
+        fields = obj._known_fields()
+        for k, v in fields.items():
+            if isinstance(v, Resource):
+                fields[k] = _detach(v, copies)
+        # the base method stores the copied models unchanged
+        Resource._update(copy, fields, complete=True)
+    return copy
+
+
+def _freeze(index):
+    return MappingProxyType(dict((k, tuple(v)) for k, v in index.items()))
+
+
+def _load_details(client, devices, channels, channel_map, sent, calls=(),
+                  known=None):
+    """
+    Fetch the missing models and the channels of devices concurrently.
+
+    Models known in the client's model registry or in ``known`` (a mapping
+    of UUIDs to models of an earlier snapshot) are not fetched, fetched
+    models are added to the registry.
+
+    Further calls can be sent along, their results are returned.
+    """
+    known = known or {}
+    models = {}
+    for dev in devices.values():
+        model = dev._peek('model')
+        if not isinstance(model, DeviceModel) or model._from_registry():
+            continue
+        if model.id in known:
+            model._update(known[model.id]._known_fields(), complete=True)
+        if model.missing_fields():
+            models[model.id] = model
+    models = list(models.values())
+    ids = list(devices) if channels else []
+    calls = list(calls)
+    calls += [('get_device_model', (m.id,)) for m in models]
+    calls += [('get_device_channels', (did,)) for did in ids]
+    results = _gather(client, calls, sent)
+    extra = len(calls) - len(models) - len(ids)
+    for model, res in zip(models, results[extra:]):
+        model._update(res, complete=True)
+        if getattr(model.client, 'models', None) is not None:
+            model.client.models.put(res, model.client.api.token)
+    for did, res in zip(ids, results[extra + len(models):]):
+        channel_map[did] = tuple((res or {}).get('channels', ()))
+    return results[:extra]
+
+
+def _load_lists(client, userID, sent, refresh=False):
+    """
+    Load the transmitter, device and bookmark lists of a user and the device
+    lists of all transmitters.
+
+    :rtype: A tuple of the three user lists and a dict mapping transmitter
+        UUIDs to device lists.
+    """
+    trans_list, dev_list, bookmark_list = _gather(client, [
+        ('get_user_transmitters', (userID,)),
+        ('get_user_devices', (userID,)),
+        ('get_user_devices_bookmarks', (userID,))], sent, refresh)
+    tids = [t['id'] for t in trans_list]
+    results = _gather(client, [('get_transmitter_devices', (tid,))
+        for tid in tids], sent, refresh)
+    return trans_list, dev_list, bookmark_list, dict(zip(tids, results))
+
+
+def _device_payloads(lists):
+    "Return a dict mapping device UUIDs to their first payload in all lists."
+
+    trans_list, dev_list, bookmark_list, trans_devices = lists
+    payloads = {}
+    for res in [dev_list, bookmark_list] + list(trans_devices.values()):
+        for p in res:
+            payloads.setdefault(p['id'], p)
+    return payloads
+
+
+def _build_snapshot(client, user, lists, channels, channel_map, detail_ids,
+                    sent, previous=None, updates=None):
+    """
+    Create the resources in lists, fetch missing details and build a snapshot.
+
+    Models and (if ``channels`` is true) channels are fetched for the devices
+    in ``detail_ids`` only, ``channel_map`` holds the channels of the others.
+    The devices of a ``previous`` snapshot not in ``detail_ids`` are copied
+    from there, ``updates`` maps UUIDs to complete device payloads.
+    ``sent`` holds the names of the endpoint methods called so far.
+    """
+    trans_list, dev_list, bookmark_list, trans_devices = lists
+    transmitters = dict((t.id, t) for t in
+        Transmitter.from_payloads(trans_list, client, HYDRATE_NEVER))
+    devices = {}
+    by_transmitter = {}
+    for dev in Device.from_payloads(dev_list + bookmark_list, client, HYDRATE_NEVER):
+        devices.setdefault(dev.id, dev)
+    for tid in transmitters:
+        res = trans_devices.get(tid, ())
+        ids = by_transmitter[tid] = []
+        for dev in Device.from_payloads(res, client, HYDRATE_NEVER):
+            devices.setdefault(dev.id, dev)
+            ids.append(dev.id)
+    bookmarks = tuple(d['id'] for d in bookmark_list)
+    for did, res in (updates or {}).items():
+        if did in devices:
+            devices[did]._update(res, complete=True)
+
+    channel_map = dict((k, v) for k, v in channel_map.items() if k in devices)
+    details = dict((k, v) for k, v in devices.items() if k in detail_ids)
+    known = previous.models if previous is not None else None
+    _load_details(client, details, channels, channel_map, sent, known=known)
+    if previous is not None:
+        for did in devices:
+            if did not in detail_ids and did in previous.devices:
+                devices[did] = previous.devices[did]
+
+    models = {}
+    by_model, by_meaning = {}, {}
+    for dev in devices.values():
+        model = dev._peek('model')
+        if not isinstance(model, DeviceModel):
+            continue
+        models.setdefault(model.id, model)
+        by_model.setdefault(model.id, []).append(dev.id)
+        meanings = set(r.get('meaning') for r in model._peek('readings') or ())
+        for meaning in meanings:
+            by_meaning.setdefault(meaning, []).append(dev.id)
+
+    copies = {}
+    detach = lambda objs: dict((k, _detach(v, copies)) for k, v in objs.items())
+    return FleetSnapshot(
+        user=_detach(user, copies),
+        transmitters=MappingProxyType(detach(transmitters)),
+        devices=MappingProxyType(detach(devices)),
+        models=MappingProxyType(detach(models)),
+        bookmarks=bookmarks,
+        channels=MappingProxyType(channel_map),
+        by_transmitter=_freeze(by_transmitter),
+        by_model=_freeze(by_model),
+        by_meaning=_freeze(by_meaning),
+        requests=len(sent))
+
+
+def load_fleet_snapshot(client, channels=True):
+    """
+    Load all resources of the user owning the client's API token.
+
+    See :py:meth:`relayr.client.Client.fleet_snapshot`.
+
+    :rtype: A :py:class:`FleetSnapshot` object.
+    """
+    sent = []
+    info = _gather(client, [('get_oauth2_user_info', ())], sent)[0]
+    user = User.shared(info['id'], client)._update(info, complete=True)
+    lists = _load_lists(client, user.id, sent)
+    detail_ids = _device_payloads(lists)
+    return _build_snapshot(client, user, lists, channels, {}, detail_ids, sent)
+
+
+def refresh_fleet(client, fleet, channels=True):
+    """
+    Reload the resources of a snapshot and compare them with it.
+
+    See :py:meth:`relayr.client.Client.refresh_fleet`.
+
+    :rtype: A :py:class:`FleetDiff` object.
+    """
+    sent = []
+    lists = _load_lists(client, fleet.user.id, sent, refresh=True)
+    payloads = _device_payloads(lists)
+    added = frozenset(payloads) - frozenset(fleet.devices)
+    removed = frozenset(fleet.devices) - frozenset(payloads)
+
+    # cheap pass: only devices whose list entries differ are fetched
+    candidates = [fleet.devices[did] for did in payloads
+        if did in fleet.devices and fleet.devices[did].diff(payloads[did])]
+    results = _gather(client, [('get_device', (d.id,)) for d in candidates],
+        sent, refresh=True)
+    changed, models = {}, {}
+    updates = dict((d.id, res) for d, res in zip(candidates, results))
+    for dev, res in zip(candidates, results):
+        changes = dev.diff(res)
+        if changes:
+            changed[dev.id] = changes
+        if 'model' in changes:
+            models[dev.id] = changes['model']
+
+    detail_ids = added | frozenset(changed)
+    channel_map = dict(fleet.channels) if channels else {}
+    snapshot = _build_snapshot(client, fleet.user, lists, channels,
+        channel_map, detail_ids, sent, fleet, updates)
+    return FleetDiff(
+        added=added,
+        removed=removed,
+        changed=MappingProxyType(changed),
+        models=MappingProxyType(models),
+        snapshot=snapshot,
+        requests=snapshot.requests)
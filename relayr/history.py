@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""
+Columnar NumPy arrays of historical device data.
+
+History pages contain nested data points (``results[].readings[]`` with
+``meaning``, ``recorded`` and ``value``). :py:func:`readings_to_arrays`
+converts them into one :py:class:`ReadingArrays` tuple per meaning with
+a ``datetime64[ms]`` array of the recording times and an array of the
+values: ``float64`` for scalar readings and a structured array with one
+``float64`` column per component for vector readings like
+``acceleration`` and ``angularSpeed`` (``x``, ``y`` and ``z``). The data
+points are converted in page-sized chunks with one array operation per
+column and chunk, the timestamps with
+:py:func:`relayr.utils.timestamps.to_epoch_ms_array`. This module needs
+NumPy_ (``pip install numpy``).
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Client
+    c = Client(token='...')
+    dev = c.get_device(deviceID)
+    arrays = dev.get_data_arrays(duration='P1D')
+    acc = arrays['acceleration']
+    print(acc.recorded[0], acc.values['x'].mean())
+
+.. _NumPy: http://www.numpy.org/
+"""
+
+from collections import namedtuple
+from itertools import islice
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from relayr.exceptions import RelayrException
+from relayr.utils.timestamps import to_epoch_ms_array
+
+
+class ReadingArrays(namedtuple('ReadingArrays', ['recorded', 'values', 'unit'])):
+    """
+    The readings of one meaning as arrays.
+
+    Attributes:
+
+    - ``recorded``: a ``datetime64[ms]`` array of the recording times (UTC),
+      ``NaT`` if missing
+    - ``values``: a ``float64`` array, a structured array with a ``float64``
+      field per vector component or, for non-numeric values and mixtures of
+      scalar and vector values, an object array
+    - ``unit``: the unit of the reading as described by the device model or
+      None if unknown
+    """
+
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.recorded)
+
+
+def _require_numpy():
+    if numpy is None:
+        raise RelayrException('Reading arrays need NumPy (pip install numpy).')
+
+
+def _timestamps(stamps):
+    "Return a ``datetime64[ms]`` array (UTC) for ISO 8601 timestamps."
+    return to_epoch_ms_array(stamps).astype('datetime64[ms]')
+
+
+def _objects(values):
+    "Return an object array of values, without converting sequences or dicts."
+
+    arr = numpy.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def _values(values, fields=None):
+    """
+    Return an array of reading values.
+
+    Dicts are converted into a structured array with the given fields
+    (defaults to the sorted keys of the first dict), missing components
+    and values are NaN. Values which are neither all numbers nor all
+    dicts of numbers are kept in an object array.
+    """
+    if fields is None:
+        first = next((v for v in values if v is not None), None)
+        if isinstance(first, dict):
+            fields = sorted(first)
+    if fields:
+        if not all(v is None or isinstance(v, dict) for v in values):
+            return _objects(values)
+        arr = numpy.empty(len(values), dtype=[(f, 'f8') for f in fields])
+        try:
+            for f in fields:
+                arr[f] = [numpy.nan if v is None or v.get(f) is None else v[f]
+                    for v in values]
+        except (TypeError, ValueError):
+            return _objects(values)
+        return arr
+    try:
+        return numpy.array([numpy.nan if v is None else v for v in values], dtype='f8')
+    except (TypeError, ValueError):
+        return _objects(values)
+
+
+def _convert_chunk(points, fields):
+    "Return a dict mapping meanings to timestamp and value arrays of a chunk."
+
+    columns = {}
+    for point in points:
+        for reading in point.get('readings') or ():
+            column = columns.get(reading.get('meaning'))
+            if column is None:
+                column = columns[reading.get('meaning')] = ([], [])
+            column[0].append(reading.get('recorded') or point.get('received'))
+            column[1].append(reading.get('value'))
+    arrays = {}
+    for meaning, (stamps, values) in columns.items():
+        values = _values(values, fields.get(meaning))
+        if values.dtype.names:
+            fields.setdefault(meaning, values.dtype.names)
+        arrays[meaning] = (_timestamps(stamps), values)
+    return arrays
+
+
+def _as_objects(arr):
+    "Return an object array of an array, with structured rows as dicts."
+
+    if not arr.dtype.names:
+        return arr.astype(object)
+    names = arr.dtype.names
+    return _objects([dict(zip(names, row)) for row in arr.tolist()])
+
+
+def _concatenate(arrays):
+    if len(arrays) == 1:
+        return arrays[0]
+    if len(set(a.dtype for a in arrays)) > 1:
+        # e.g. vector values in some chunks, strings in others
+        arrays = [_as_objects(a) for a in arrays]
+    return numpy.concatenate(arrays)
+
+
+def readings_to_arrays(points, chunksize=1000, units=None):
+    """
+    Convert historical data points into arrays per reading meaning.
+
+    :param points: Data points as contained in the ``results`` of history
+        pages, e.g. from :py:meth:`relayr.resources.Device.iter_data`.
+    :type points: iterable of dicts
+    :param chunksize: The number of data points converted at once.
+    :type chunksize: integer
+    :param units: The units of the readings by meaning.
+    :type units: dict
+    :rtype: A dict mapping meanings to :py:class:`ReadingArrays` objects.
+    """
+    _require_numpy()
+    units = units or {}
+    points = iter(points)
+    fields = {}
+    chunks = {}
+    while True:
+        chunk = list(islice(points, chunksize))
+        if not chunk:
+            break
+        for meaning, arrays in _convert_chunk(chunk, fields).items():
+            chunks.setdefault(meaning, []).append(arrays)
+    result = {}
+    for meaning, arrays in chunks.items():
+        recorded = _concatenate([a[0] for a in arrays])
+        values = _concatenate([a[1] for a in arrays])
+        result[meaning] = ReadingArrays(recorded, values, units.get(meaning))
+    return result
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+JSON codecs for encoding request bodies and decoding API responses.
+
+The API layer uses the fastest codec available: orjson_ or ujson_ when
+installed, the standard library ``json`` module otherwise. A codec can also
+be chosen explicitly with the ``RELAYR_JSON_CODEC`` environment variable
+or the ``codec`` parameter of :py:class:`relayr.api.Api`. All codecs decode
+responses straight from the raw bytes received.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Api
+    from relayr.jsoncodec import get_codec
+    api = Api(token='...', codec=get_codec('json'))
+
+.. _orjson: https://pypi.python.org/pypi/orjson/
+.. _ujson: https://pypi.python.org/pypi/ujson/
+"""
+
+import sys
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+from relayr import config
+from relayr.exceptions import RelayrException
+
+
+# json.loads() accepts bytes only since Python 3.6
+_STDLIB_LOADS_BYTES = sys.version_info[:2] >= (3, 6)
+
+
+class JsonCodec(object):
+    "A JSON codec based on the standard library ``json`` module."
+
+    name = 'json'
+
+    def __repr__(self):
+        return "%s()" % self.__class__.__name__
+
+    @classmethod
+    def available(cls):
+        "Return True if the codec can be used."
+        return True
+
+    def dumps(self, obj):
+        """
+        Encode a Python data structure as JSON.
+
+        :rtype: bytes
+        """
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        """
+        Decode JSON from raw bytes.
+
+        :param data: UTF-8 encoded JSON.
+        :type data: bytes
+        :rtype: A Python data structure.
+
+        Raises ``ValueError`` for invalid JSON.
+        """
+        if _STDLIB_LOADS_BYTES:
+            return json.loads(data)
+        return json.loads(data.decode('utf-8'))
+
+
+class OrjsonCodec(JsonCodec):
+    "A JSON codec based on the orjson package."
+
+    name = 'orjson'
+
+    @classmethod
+    def available(cls):
+        return orjson is not None
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    "A JSON codec based on the ujson package."
+
+    name = 'ujson'
+
+    @classmethod
+    def available(cls):
+        return ujson is not None
+
+    def dumps(self, obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+# all codecs, fastest first
+CODECS = (OrjsonCodec, UjsonCodec, JsonCodec)
+
+
+def available_codecs():
+    """
+    Return the names of all codecs which can be used, fastest first.
+
+    :rtype: list of strings
+    """
+    return [cls.name for cls in CODECS if cls.available()]
+
+
+def get_codec(name=None):
+    """
+    Return a codec by name or the fastest available one.
+
+    :param name: The codec name, ``'orjson'``, ``'ujson'`` or ``'json'``
+        (defaults to ``config.JSON_CODEC`` or, if that is empty, to the
+        fastest available codec).
+    :type name: string
+    :rtype: A :py:class:`JsonCodec` object.
+
+    Raises ``RelayrException`` for unknown or unavailable codecs.
+    """
+    name = name or config.JSON_CODEC
+    for cls in CODECS:
+        if not cls.available():
+            continue
+        if not name or cls.name == name:
+            return cls()
+    raise RelayrException('JSON codec not available: %r' % name)
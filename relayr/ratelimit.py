@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+Client-side rate limiting of API calls with token buckets.
+
+A :py:class:`RateLimiter` passed to :py:class:`relayr.api.Api` delays
+requests so that they do not exceed a configured rate, instead of running
+into throttled (429) responses. Requests are counted in separate buckets
+per API token and per class of endpoints (``read``, ``write`` and
+``history`` by default). The buckets live in memory and are shared by all
+threads using the limiter, or, with ``shared=True``, in small files under
+``config.RELAYR_FOLDER`` and are shared by all processes on the machine.
+
+When the API sends ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset``
+response headers the buckets are adjusted to them.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Client
+    from relayr.ratelimit import RateLimiter
+    limiter = RateLimiter(limits={'read': (20, 40), 'history': (2, 2)}, shared=True)
+    c = Client(token='...', rate_limiter=limiter)
+"""
+
+import os
+import time
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from relayr import config
+from relayr.exceptions import RelayrException
+
+
+def endpoint_class(method, url):
+    """
+    Return the name of the class of endpoints an API call belongs to.
+
+    :param method: HTTP request method, ``GET``, ``POST``, etc.
+    :type method: string
+    :param url: Full HTTP path.
+    :type url: string
+    :rtype: ``'history'``, ``'write'`` or ``'read'``
+    """
+    if '/history/' in url:
+        return 'history'
+    if method.upper() not in ('GET', 'HEAD', 'OPTIONS'):
+        return 'write'
+    return 'read'
+
+
+class TokenBucket(object):
+    """
+    A thread-safe token bucket refilled at a constant rate.
+
+    :param rate: Number of tokens added per second.
+    :type rate: number
+    :param capacity: Maximum number of tokens, i.e. the allowed burst size
+        (defaults to ``rate``).
+    :type capacity: number
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._stamp = time.time()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        args = (self.__class__.__name__, self.rate, self.capacity)
+        return "%s(rate=%r, capacity=%r)" % args
+
+    def _transaction(self, func):
+        "Call ``func(tokens, now)`` on the current state and store the new one."
+
+        with self._lock:
+            now = time.time()
+            tokens, result = func(self._refill(self._tokens, self._stamp, now), now)
+            self._tokens, self._stamp = tokens, now
+        return result
+
+    def _refill(self, tokens, stamp, now):
+        return min(self.capacity, tokens + (now - stamp) * self.rate)
+
+    def take(self, tokens=1):
+        """
+        Take tokens if available and return the seconds to wait otherwise.
+
+        :rtype: float, zero if the tokens were taken
+        """
+        def func(available, now):
+            if available >= tokens:
+                return available - tokens, 0.0
+            return available, (tokens - available) / self.rate
+        return self._transaction(func)
+
+    def acquire(self, tokens=1):
+        "Take tokens, waiting until they are available."
+
+        while True:
+            wait = self.take(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def adjust(self, remaining, reset=None):
+        """
+        Limit the available tokens to the number of requests the server allows.
+
+        :param remaining: Number of requests remaining in the current window.
+        :type remaining: number
+        :param reset: Number of seconds until the window is reset.
+        :type reset: number
+        """
+        def func(available, now):
+            limit = remaining
+            if remaining < 1 and reset:
+                # let the bucket refill to one token exactly at reset time
+                limit = 1 - reset * self.rate
+            return min(available, limit), None
+        self._transaction(func)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    A token bucket stored in a file and shared by all processes using it.
+
+    The state is read and written under an exclusive file lock (POSIX only).
+
+    :param path: Path of the file storing the bucket state.
+    :type path: string
+    """
+
+    def __init__(self, path, rate, capacity=None):
+        if fcntl is None:
+            raise RelayrException('Shared rate limiting needs fcntl (POSIX only).')
+        super(FileTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def _transaction(self, func):
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                now = time.time()
+                state = os.read(fd, 64).decode('ascii').split()
+                if len(state) == 2:
+                    tokens = self._refill(float(state[0]), float(state[1]), now)
+                else:
+                    tokens = self.capacity
+                tokens, result = func(tokens, now)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, ('%r %r' % (tokens, now)).encode('ascii'))
+            finally:
+                os.close(fd)
+        return result
+
+
+class RateLimiter(object):
+    """
+    A rate limiter for API calls with one token bucket per API token and
+    class of endpoints.
+    """
+
+    def __init__(self, rate=10, capacity=None, limits=None, per_token=True,
+                 shared=False, folder=None, classify=endpoint_class):
+        """
+        :param rate: Default number of requests per second for each bucket.
+        :type rate: number
+        :param capacity: Default burst size for each bucket (defaults to ``rate``).
+        :type capacity: number
+        :param limits: Rates and capacities for specific classes of endpoints,
+            e.g. ``{'history': (2, 5)}``.
+        :type limits: dict mapping strings to tuples of two numbers
+        :param per_token: Flag indicating if each API token gets its own buckets.
+        :type per_token: boolean
+        :param shared: Flag indicating if buckets are shared between processes.
+        :type shared: boolean
+        :param folder: Folder for the files of shared buckets (defaults to
+            ``ratelimit`` inside ``config.RELAYR_FOLDER``).
+        :type folder: string
+        :param classify: Function mapping the method and URL of an API call to
+            a class of endpoints (defaults to :py:func:`endpoint_class`).
+        :type classify: callable
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.limits = dict(limits or {})
+        self.per_token = per_token
+        self.shared = shared
+        self.folder = folder or os.path.join(os.path.expanduser(config.RELAYR_FOLDER), 'ratelimit')
+        self.classify = classify
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, token, method, url):
+        """
+        Return the bucket for an API call, creating it on first use.
+
+        :rtype: A :py:class:`TokenBucket` object.
+        """
+        cls = self.classify(method, url)
+        key = (token if self.per_token else None, cls)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, capacity = self.limits.get(cls, (self.rate, self.capacity))
+                if self.shared:
+                    name = '%s-%s' % (_token_digest(key[0]), cls)
+                    path = os.path.join(self.folder, name)
+                    bucket = FileTokenBucket(path, rate, capacity)
+                else:
+                    bucket = TokenBucket(rate, capacity)
+                self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, token, method, url):
+        "Wait until an API call may be sent."
+
+        self.bucket(token, method, url).acquire()
+
+    def update(self, token, method, url, headers):
+        """
+        Adjust the bucket for an API call to rate limit response headers.
+
+        :param headers: HTTP response headers, possibly including
+            ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset``.
+        :type headers: dict
+        """
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        reset = headers.get('X-RateLimit-Reset')
+        try:
+            remaining = float(remaining)
+            reset = float(reset) if reset is not None else None
+        except ValueError:
+            return
+        if reset is not None and reset > 1e9:
+            # an epoch timestamp, not a number of seconds
+            reset = max(0.0, reset - time.time())
+        self.bucket(token, method, url).adjust(remaining, reset)
+
+
+def _token_digest(token):
+    "Return a short digest of an API token usable as part of a filename."
+
+    if token is None:
+        return 'any'
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+A process-wide registry of device models and reading meanings.
+
+There are only few device models and meanings on the relayr platform, but
+they are needed over and over: for every ``Device.get_info()``, fleet
+snapshot and for interpreting readings received from streams or the
+history API. A :py:class:`ModelRegistry` keeps the model payloads and the
+meanings for ``config.MODEL_REGISTRY_TTL`` seconds and is shared by all
+clients of a process (see :py:func:`get_default_registry`). It can be
+filled with a single request for all public device models, e.g. at client
+startup with ``Client(prewarm=True)`` or ``RELAYR_PREWARM_MODELS=True``.
+
+Models fetched one by one with an API token may be private, so they are
+kept per token (like the entries of a :py:class:`relayr.store.MetadataStore`)
+and served only to clients with the same token. Public models are served
+to all clients.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Client
+    c = Client(token='...', prewarm=True)
+    dev = c.get_device(deviceID).get_info()
+    print(dev.model.readings)  # served from the registry
+    reading = c.models.reading(dev.model.id, 'temperature', c.api.token)
+    print(reading['unit'])
+"""
+
+import time
+import threading
+
+from relayr import config
+from relayr.store import token_digest
+
+
+class ModelRegistry(object):
+    "A thread-safe registry of device model payloads and meanings."
+
+    def __init__(self, ttl=None):
+        """
+        :param ttl: Number of seconds for which models and meanings are used
+            without fetching them again (defaults to
+            ``config.MODEL_REGISTRY_TTL``, None for no expiry).
+        :type ttl: number
+        """
+        if ttl is None:
+            ttl = config.MODEL_REGISTRY_TTL
+        self.ttl = ttl
+        self._models = {}
+        self._meanings = None
+        self._prewarmed = None
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def __repr__(self):
+        return "%s(models=%d)" % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, modelID):
+        # public models only
+        return self.get(modelID) is not None
+
+    def _is_fresh(self, fetched):
+        return fetched is not None and (self.ttl is None or
+            time.time() - fetched < self.ttl)
+
+    def _key(self, modelID, token):
+        "Return the key of a model, public ones without a token."
+
+        if token is None:
+            return modelID
+        return token_digest(token), modelID
+
+    def _get(self, key):
+        entry = self._models.get(key)
+        if entry is None or not self._is_fresh(entry[1]):
+            return None
+        return entry[0]
+
+    def get(self, modelID, token=None):
+        """
+        Return the payload of a device model, if known and not expired.
+
+        :param modelID: The device model UUID.
+        :type modelID: string
+        :param token: The API token of the client asking, None for public
+            models only.
+        :type token: string
+        :rtype: dict or None
+        """
+        payload = self._get(modelID)
+        if payload is None and token is not None:
+            payload = self._get(self._key(modelID, token))
+        return payload
+
+    def put(self, payload, token=None):
+        """
+        Add or replace a device model.
+
+        :param payload: The complete device model as returned by the API.
+        :type payload: dict
+        :param token: The API token the model was fetched with, None if it
+            is public.
+        :type token: string
+        """
+        with self._lock:
+            self._models[self._key(payload['id'], token)] = (payload, time.time())
+
+    def update(self, payloads):
+        """
+        Add or replace many public device models.
+
+        :param payloads: Complete device models as returned by the API.
+        :type payloads: iterable of dicts
+        """
+        now = time.time()
+        with self._lock:
+            for payload in payloads:
+                self._models[payload['id']] = (payload, now)
+
+    def load(self, modelID, func, token=None):
+        """
+        Return the payload of a device model, fetching it if needed.
+
+        Concurrent loads of the same model with the same token call ``func``
+        only once.
+
+        :param modelID: The device model UUID.
+        :type modelID: string
+        :param func: A function without arguments returning the device model
+            payload, e.g. ``lambda: api.get_device_model(modelID)``.
+        :type func: callable
+        :param token: The API token used by ``func``, see :py:meth:`put`.
+        :type token: string
+        :rtype: dict
+        """
+        payload = self.get(modelID, token)
+        if payload is not None:
+            return payload
+        key = self._key(modelID, token)
+        with self._lock:
+            lock = self._loading.setdefault(key, threading.Lock())
+        with lock:
+            payload = self.get(modelID, token)
+            if payload is None:
+                payload = func()
+                self.put(payload, token)
+        with self._lock:
+            self._loading.pop(key, None)
+        return payload
+
+    def meanings(self, func):
+        """
+        Return the list of device model meanings, fetching it if needed.
+
+        :param func: A function without arguments returning the meanings,
+            e.g. ``api.get_public_device_model_meanings``.
+        :type func: callable
+        :rtype: list of dicts
+        """
+        entry = self._meanings
+        if entry is not None and self._is_fresh(entry[1]):
+            return entry[0]
+        res = list(func())
+        self._meanings = (res, time.time())
+        return res
+
+    def readings(self, modelID, token=None):
+        """
+        Return the reading descriptions of a known device model by meaning.
+
+        This is meant for decoding stream and history data, it never sends
+        requests.
+
+        :param modelID: The device model UUID.
+        :type modelID: string
+        :param token: The API token of the client asking, see :py:meth:`get`.
+        :type token: string
+        :rtype: A dict mapping meanings to reading dicts with keys like
+            ``unit``, ``minimum``, ``maximum`` and ``precision`` (empty if
+            the model is unknown).
+        """
+        payload = self.get(modelID, token) or {}
+        return dict((r.get('meaning'), r) for r in payload.get('readings') or ())
+
+    def reading(self, modelID, meaning, token=None):
+        "Return the description of one reading of a known model or None."
+        return self.readings(modelID, token).get(meaning)
+
+    def prewarm(self, api):
+        """
+        Load all public device models with one request, unless done recently.
+
+        :param api: The API client used for the request.
+        :type api: A :py:class:`relayr.api.Api` object.
+        :rtype: The number of device models in the registry.
+        """
+        if not self._is_fresh(self._prewarmed):
+            self.update(api.get_public_device_models())
+            self._prewarmed = time.time()
+        return len(self)
+
+    def clear(self):
+        "Remove all models and meanings."
+
+        with self._lock:
+            self._models.clear()
+            self._meanings = None
+            self._prewarmed = None
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry():
+    """
+    Return the process-wide model registry, creating it on first use.
+
+    :rtype: A :py:class:`ModelRegistry` object.
+    """
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = ModelRegistry()
+    return _default_registry
@@ -7,54 +7,447 @@ Resources may be entities such as users, publishers, applications,
 devices, device models and transmitters.
 """
 
+import weakref
 import warnings
+import threading
 
 from relayr import exceptions
 from relayr.dataconnection import MqttStream as Connection
+from relayr.history import readings_to_arrays
+from relayr.store import StoredPayload
+from relayr.utils.concurrency import readahead
 
 
-class User(object):
-    "A Relayr user."
+# Policies for fetching the details of resources created from list payloads:
+# never (use only the list payload), on first access of a missing attribute,
+# if some expected fields are missing in the list payload, or always (one
+# request per resource).
+HYDRATE_NEVER = 'never'
+HYDRATE_LAZY = 'lazy'
+HYDRATE_MISSING = 'missing'
+HYDRATE_ALWAYS = 'always'
+HYDRATE_POLICIES = (HYDRATE_NEVER, HYDRATE_LAZY, HYDRATE_MISSING, HYDRATE_ALWAYS)
+
+# locks for lazy loading, striped over all resources instead of one per object
+_LOAD_LOCKS = [threading.RLock() for i in range(64)]
+
+_MISSING = object()
+
+# value of ``Resource._loaded`` for details read from a metadata store,
+# which lack the secret fields
+_RESTORED = object()
+
+
+class Resource(object):
+    """
+    Base class of all relayr resources.
+
+    Resources are lazy: the first access of an attribute which is not yet
+    known fetches the resource details with ``get_info()``, once and
+    thread-safely. Attributes already known, e.g. from a list payload, never
+    cause a request. Note that ``hasattr()`` of an unknown attribute causes
+    a request, too, while :py:meth:`missing_fields` does not. If fetching
+    the details fails, an ``AttributeError`` is raised with the original
+    error as its ``__cause__``.
+
+    To keep large numbers of resources small, the known fields of each kind
+    of resource are stored in ``__slots__``, any other fields in an overflow
+    dictionary created on demand. Both are accessed as attributes.
+
+    Details read from a metadata store lack the ``secret_fields``, so the
+    first access of a missing secret field fetches them from the API again.
+    """
+
+    __slots__ = ('id', 'client', '_loaded', '_extra', '__weakref__')
+
+    #: Fields expected to be present after fetching the resource details.
+    fields = ()
+
+    #: Flag indicating if unknown attributes are fetched on first access.
+    lazy = True
+
+    #: Flag indicating if the details can be fetched with ``get_info()``.
+    hydratable = True
+
+    #: Fields never kept in a metadata store, if ``get_info()`` accepts
+    #: ``refresh=True`` for bypassing it.
+    secret_fields = ()
 
     def __init__(self, id=None, client=None):
         self.id = id
         self.client = client
+        self._loaded = False
+        self._extra = None
 
     def __repr__(self):
         return "%s(id=%r)" % (self.__class__.__name__, self.id)
 
+    def __getattr__(self, name):
+        # only called for attributes not found in the usual places
+        if not name.startswith('_'):
+            value = self._peek_extra(name)
+            if value is _MISSING and self._can_load(name):
+                try:
+                    self._load(name)
+                except Exception as e:
+                    # keep the hasattr() and getattr() with default contract
+                    err = AttributeError("%r object has no attribute %r, "
+                        "fetching details failed: %s" %
+                        (self.__class__.__name__, name, e))
+                    err.__cause__ = e
+                    raise err
+                value = self._peek(name, _MISSING)
+            if value is not _MISSING:
+                return value
+        raise AttributeError("%r object has no attribute %r" %
+            (self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:
+            # not a slot
+            if self._extra is None:
+                object.__setattr__(self, '_extra', {})
+            self._extra[name] = value
+
+    def __delattr__(self, name):
+        try:
+            object.__delattr__(self, name)
+        except AttributeError:
+            if self._peek_extra(name) is _MISSING:
+                raise
+            del self._extra[name]
+
+    def _peek_extra(self, name):
+        extra = self._extra
+        if extra is None:
+            return _MISSING
+        return extra.get(name, _MISSING)
+
+    def _peek(self, name, default=None):
+        "Return an attribute value if known, without fetching details."
+
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            value = self._peek_extra(name)
+            return default if value is _MISSING else value
+
+    def _can_load(self, name=None):
+        if not (self.lazy and self.hydratable and self.client is not None):
+            return False
+        if self._loaded is _RESTORED:
+            return name in self.secret_fields
+        return not self._loaded
+
+    def _load_lock(self):
+        return _LOAD_LOCKS[(id(self) >> 4) % len(_LOAD_LOCKS)]
+
+    def _load(self, name=None):
+        "Fetch the resource details unless another thread did so already."
+
+        with self._load_lock():
+            if not self._loaded:
+                self.get_info()
+                if not self._loaded:
+                    self._loaded = True
+            if self._loaded is _RESTORED and name in self.secret_fields and \
+                    self._peek(name, _MISSING) is _MISSING:
+                self.get_info(refresh=True)
+
+    @classmethod
+    def from_payload(cls, payload, client, hydrate=HYDRATE_LAZY, id_key='id'):
+        """
+        Create a resource from a JSON payload, e.g. an element of a list.
+
+        :param payload: The fields describing the resource.
+        :type payload: dict
+        :param client: The client used to fetch details.
+        :type client: A :py:class:`relayr.client.Client` object.
+        :param hydrate: The policy for fetching the resource details,
+            ``'never'``, ``'lazy'`` (on first access of a missing attribute),
+            ``'missing'`` (if expected fields are missing in the payload)
+            or ``'always'``.
+        :type hydrate: string
+        :param id_key: The name of the field containing the resource's UUID.
+        :type id_key: string
+        """
+        obj = cls.shared(payload[id_key], client, payload)
+        return obj.hydrate(hydrate)
+
+    @classmethod
+    def from_payloads(cls, payloads, client, hydrate=HYDRATE_LAZY, prefetch=0,
+                      id_key='id', fields=None, **kwargs):
+        """
+        Create resources from a list of JSON payloads, optionally reading ahead.
+
+        With ``prefetch`` greater than zero, the details of the next
+        ``prefetch`` resources are fetched concurrently on the worker pool of
+        the client's API (see :py:attr:`relayr.api.Api.executor`) while
+        earlier ones are consumed. The resources are still yielded in order
+        and in that case the ``'lazy'`` policy is treated like ``'missing'``.
+
+        :param payloads: The fields describing each resource.
+        :type payloads: iterable of dicts
+        :param prefetch: Maximum number of detail fetches in flight.
+        :type prefetch: integer
+        :rtype: A generator of resources.
+
+        The other parameters are the same as for :py:meth:`from_payload` and
+        :py:meth:`hydrate`, additional keyword arguments are passed to
+        ``get_info()``.
+        """
+        objs = (cls.shared(p[id_key], client, p) for p in payloads)
+        executor = None
+        if prefetch > 0:
+            executor = client.api.executor
+            if hydrate == HYDRATE_LAZY:
+                hydrate = HYDRATE_MISSING
+        func = lambda obj: obj.hydrate(hydrate, fields, **kwargs)
+        return readahead(objs, func, prefetch, executor)
+
+    @classmethod
+    def shared(cls, id, client, payload=None):
+        """
+        Return the resource object shared by all users of a client.
+
+        The object is taken from the client's identity map (if any) and
+        created only if it does not exist yet.
+
+        :param id: The resource's UUID.
+        :type id: string
+        :param client: The client used to fetch details.
+        :type client: A :py:class:`relayr.client.Client` object.
+        :param payload: Fields to merge into the object.
+        :type payload: dict
+        """
+        resources = getattr(client, 'resources', None)
+        if resources is None:
+            obj = cls(id, client=client)
+            return obj._update(payload or {})
+        return resources.get(cls, id, client, payload)
+
+    def _update(self, payload, complete=False):
+        """
+        Store the fields of a JSON payload as instance attributes.
+
+        :param complete: Flag indicating if the payload contains all details,
+            so missing attributes need not be fetched later.
+        :type complete: boolean
+        """
+        for k, v in payload.items():
+            setattr(self, k, v)
+        if complete:
+            self._set_loaded(payload)
+        return self
+
+    def _set_loaded(self, payload):
+        "Mark the details as loaded, possibly without the secret fields."
+
+        if isinstance(payload, StoredPayload):
+            self._loaded = _RESTORED
+        else:
+            self._loaded = True
+
+    def diff(self, payload):
+        """
+        Compare a payload with the fields known locally.
+
+        Nothing is fetched, fields not known yet are compared as None.
+
+        :param payload: The fields describing the resource, e.g. a newer
+            API response.
+        :type payload: dict
+        :rtype: A dict mapping the names of changed fields to tuples of the
+            old and the new value.
+        """
+        changes = {}
+        for k, v in payload.items():
+            old = self._diff_value(k, self._peek(k))
+            new = self._diff_value(k, v)
+            if old != new:
+                changes[k] = (old, new)
+        return changes
+
+    def _diff_value(self, name, value):
+        "Return the value of a field as compared by :py:meth:`diff`."
+        return value
+
+    def _known_fields(self):
+        "Return a dict of all fields known locally, without fetching details."
+
+        known = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name.startswith('_') or name in ('id', 'client'):
+                    continue
+                value = self._peek(name, _MISSING)
+                if value is not _MISSING:
+                    known[name] = value
+        known.update(self._extra or {})
+        return known
+
+    def missing_fields(self, fields=None):
+        """
+        Return the names of expected fields which are not yet known.
+
+        :param fields: The expected field names (defaults to ``self.fields``).
+        :type fields: sequence of strings
+        :rtype: list of strings
+        """
+        if fields is None:
+            fields = self.fields
+        return [f for f in fields if self._peek(f, _MISSING) is _MISSING]
+
+    def hydrate(self, policy=HYDRATE_MISSING, fields=None, **kwargs):
+        """
+        Fetch the resource details depending on a policy.
+
+        :param policy: ``'never'``, ``'lazy'`` (nothing now, on first access
+            of a missing attribute later), ``'missing'`` (if some expected
+            fields are missing) or ``'always'``.
+        :type policy: string
+        :param fields: The expected field names (defaults to ``self.fields``).
+        :type fields: sequence of strings
+        :rtype: self
+
+        Additional keyword arguments are passed to ``get_info()``.
+        """
+        if self._needs_info(policy, fields):
+            with self._load_lock():
+                # other threads may have fetched the details meanwhile
+                if self._needs_info(policy, fields):
+                    self.get_info(**kwargs)
+        return self
+
+    def _needs_info(self, policy, fields=None):
+        "Return True if the hydrate policy requires fetching the details."
+
+        if policy not in HYDRATE_POLICIES:
+            raise ValueError('Unknown hydrate policy: %r' % policy)
+        if not self.hydratable:
+            return False
+        return policy == HYDRATE_ALWAYS or (policy == HYDRATE_MISSING and
+            bool(self.missing_fields(fields)))
+
+    def get_info(self):
+        "Retrieve the resource details and store them as instance attributes."
+        raise NotImplementedError
+
+
+class IdentityMap(object):
+    """
+    A thread-safe mapping of resource classes and UUIDs to shared resource
+    objects.
+
+    Objects are held by weak references, so they are dropped when not used
+    anywhere else.
+    """
+
+    def __init__(self):
+        # one mapping per class, avoiding a key tuple per object
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(objects) for objects in self._objects.values())
+
+    def get(self, cls, id, client, payload=None):
+        """
+        Return the object for a resource class and UUID, creating it if needed.
+
+        :param payload: Fields to merge into the object.
+        :type payload: dict
+        """
+        with self._lock:
+            objects = self._objects.get(cls)
+            if objects is None:
+                objects = self._objects[cls] = weakref.WeakValueDictionary()
+            obj = objects.get(id)
+            if obj is None:
+                obj = cls(id, client=client)
+                objects[id] = obj
+        if payload:
+            obj._update(payload)
+        return obj
+
+
+class User(Resource):
+    "A Relayr user."
+
+    __slots__ = ('name', 'email')
+
+    fields = ('name', 'email')
+
+    def get_info(self):
+        """
+        Retrieves user info and stores it as instance attributes.
+
+        Only the info of the user owning the client's API token is available.
+
+        :rtype: self.
+        """
+        res = self.client.api.get_oauth2_user_info()
+        if res.get('id') != self.id:
+            raise exceptions.RelayrException(
+                'No info available for user %r.' % self.id)
+        return self._update(res, complete=True)
+
     def get_publishers(self):
         "Return a generator of the publishers of the user."
 
         for pub_json in self.client.api.get_user_publishers(self.id):
-            p = Publisher(pub_json['id'], client=self.client)
-            for k in pub_json:
-                setattr(p, k, pub_json[k])
-            yield p
-
-    def get_apps(self):
-        "Returns a generator of the apps of the user."
-
-        for app_json in self.client.api.get_user_apps(self.id):
-            ## TODO: change 'app' field to 'id' in API?
-            app = App(app_json['app'], client=self.client)
-            app.get_info()
-            yield app
+            yield Publisher.from_payload(pub_json, self.client, HYDRATE_NEVER)
 
-    def get_transmitters(self):
-        "Returns a generator of the transmitters of the user."
+    def get_apps(self, hydrate=HYDRATE_LAZY, prefetch=0):
+        """
+        Returns a generator of the apps of the user.
+
+        :param hydrate: The policy for fetching the details of each app,
+            see :py:meth:`Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`Resource.from_payloads`.
+        :type prefetch: integer
+        """
+        res = self.client.fetch('user_apps', self.id,
+            self.client.api.get_user_apps, self.id)
+        ## TODO: change 'app' field to 'id' in API?
+        for app in App.from_payloads(res, self.client, hydrate, prefetch,
+                                     id_key='app'):
+            yield app
 
-        for trans_json in self.client.api.get_user_transmitters(self.id):
-            trans = Transmitter(trans_json['id'], client=self.client)
-            trans.get_info()
+    def get_transmitters(self, hydrate=HYDRATE_LAZY, prefetch=0):
+        """
+        Returns a generator of the transmitters of the user.
+
+        :param hydrate: The policy for fetching the details of each transmitter,
+            see :py:meth:`Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`Resource.from_payloads`.
+        :type prefetch: integer
+        """
+        res = self.client.fetch('user_transmitters', self.id,
+            self.client.api.get_user_transmitters, self.id)
+        for trans in Transmitter.from_payloads(res, self.client, hydrate, prefetch):
             yield trans
 
-    def get_devices(self):
-        "Returns a generator of the devices of the user."
-
-        for dev_json in self.client.api.get_user_devices(self.id):
-            dev = Device(dev_json['id'], client=self.client)
-            dev.get_info()
+    def get_devices(self, hydrate=HYDRATE_LAZY, prefetch=0):
+        """
+        Returns a generator of the devices of the user.
+
+        :param hydrate: The policy for fetching the details of each device,
+            see :py:meth:`Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`Resource.from_payloads`.
+        :type prefetch: integer
+        """
+        res = self.client.fetch('user_devices', self.id,
+            self.client.api.get_user_devices, self.id)
+        for dev in Device.from_payloads(res, self.client, hydrate, prefetch):
             yield dev
 
     def update(self, name=None, email=None):
@@ -73,10 +466,10 @@ class User(object):
         res = self.client.api.post_user_wunderbar(self.id)
         for k, v in res.items():
             if 'model' in v:
-                item = Device(res[k]['id'], client=self.client)
+                item = Device.shared(res[k]['id'], self.client)
                 item.get_info()
             else:
-                item = Transmitter(res[k]['id'], client=self.client)
+                item = Transmitter.shared(res[k]['id'], self.client)
                 item.get_info()
             yield item
 
@@ -87,19 +480,21 @@ class User(object):
         res = self.client.api.post_users_destroy(self.id)
         return res
 
-    def get_bookmarked_devices(self):
+    def get_bookmarked_devices(self, hydrate=HYDRATE_LAZY, prefetch=0):
         """
         Retrieves a list of bookmarked devices.
 
+        :param hydrate: The policy for fetching the details of each device,
+            see :py:meth:`Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`Resource.from_payloads`.
+        :type prefetch: integer
         :rtype: list of device objects
         """
         res = self.client.api.get_user_devices_bookmarks(self.id)
-        for dev in res:
-            d = Device(dev['id'], client=self.client)
-            for k, v in dev.items():
-                setattr(d, k, v)
-            d.get_info()
-            yield d
+        for dev in Device.from_payloads(res, self.client, hydrate, prefetch):
+            yield dev
 
     def bookmark_device(self, device):
         res = self.client.api.post_user_devices_bookmark(self.id, device.id)
@@ -109,7 +504,7 @@ class User(object):
         return res
 
 
-class Publisher(object):
+class Publisher(Resource):
     """
     A relayr publisher.
 
@@ -118,14 +513,13 @@ class Publisher(object):
     applications it has published on the relayr platform.
     """
 
-    def __init__(self, id=None, client=None):
-        self.id = id
-        self.client = client
+    __slots__ = ('name', 'owner')
 
-    def __repr__(self):
-        return "%s(id=%r)" % (self.__class__.__name__, self.id)
+    # there is no API endpoint for the details of a single publisher
+    lazy = False
+    hydratable = False
 
-    def get_apps(self, extended=False):
+    def get_apps(self, extended=False, hydrate=HYDRATE_LAZY, prefetch=0):
         """
         Get list of apps for this publisher.
 
@@ -137,16 +531,23 @@ class Publisher(object):
 
         :param extended: Flag indicating if the info should be extended.
         :type extended: booloean
+        :param hydrate: The policy for fetching the details of each app,
+            see :py:meth:`Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`Resource.from_payloads`.
+        :type prefetch: integer
         :rtype: A list of :py:class:`relayr.resources.App` objects.
         """
 
         func = self.client.api.get_publisher_apps
+        fields = App.fields
         if extended:
             func = self.client.api.get_publisher_apps_extended
+            fields = App.extended_fields
         res = func(self.id)
-        for a in res:
-            app = App(a['id'], client=self.client)
-            app.get_info(extended=extended)
+        for app in App.from_payloads(res, self.client, hydrate, prefetch,
+                                     fields=fields, extended=extended):
             yield app
 
 
@@ -157,7 +558,7 @@ class Publisher(object):
         :param name: the user email to be set
         :type name: string
         """
-        res = self.api.patch_publisher(self.id, name=name)
+        res = self.client.api.patch_publisher(self.id, name=name)
         for k in res:
             setattr(self, k, res[k])
         return self
@@ -177,10 +578,10 @@ class Publisher(object):
         """
         Deletes the publisher from the relayr platform.
         """
-        res = self.api.delete_publisher(self.id)
+        res = self.client.api.delete_publisher(self.id)
 
 
-class App(object):
+class App(Resource):
     """
     A relayr application.
     
@@ -188,13 +589,12 @@ class App(object):
     registered to and deleted from the relayr platform. it can be connected 
     to and disconnected from devices.
     """
-    
-    def __init__(self, id=None, client=None):
-        self.id = id
-        self.client = client
 
-    def __repr__(self):
-        return "%s(id=%r)" % (self.__class__.__name__, self.id)
+    __slots__ = ('name', 'description', 'publisher', 'clientId',
+        'clientSecret', 'redirectUri')
+
+    fields = ('name', 'description')
+    extended_fields = fields + ('publisher', 'clientId', 'redirectUri')
 
     def get_info(self, extended=False):
         """
@@ -211,13 +611,13 @@ class App(object):
         :rtype: A dict with certain fields.
         """
 
-        func = self.client.api.get_app_info
         if extended:
-            func = self.client.api.get_app_info_extended
-        res = func(self.id)
-        for k in res:
-            setattr(self, k, res[k])
-        return self
+            # not stored, since it contains the client secret
+            res = self.client.api.get_app_info_extended(self.id)
+        else:
+            res = self.client.fetch('app', self.id,
+                self.client.api.get_app_info, self.id)
+        return self._update(res, complete=True)
 
     def update(self, description=None, name=None, redirectUri=None):
         """
@@ -240,7 +640,7 @@ class App(object):
         """
         Deletes the app from the relayr platform.
         """
-        res = self.api.delete_publisher(self.id)
+        res = self.client.api.delete_app(self.id)
 
     def register(self, name, publisher):
         """
@@ -254,33 +654,99 @@ class App(object):
         raise NotImplementedError
 
 
-class Device(object):
+class Device(Resource):
     """
     A relayr device.
     """
 
-    def __init__(self, id=None, client=None):
-        self.id = id
-        self.client = client
+    __slots__ = ('name', 'description', 'owner', 'model', 'public',
+        'firmwareVersion')
 
-    def __repr__(self):
-        return "%s(id=%r)" % (self.__class__.__name__, self.id)
+    fields = ('name', 'owner', 'model', 'public')
+
+    def _update(self, payload, complete=False):
+        """
+        Store the fields of a JSON payload as instance attributes.
+
+        The ``model`` field is stored as a lazy
+        :py:class:`relayr.resources.DeviceModel` object, containing all
+        model fields included in the payload, e.g. the ``readings``, and
+        those known in the client's model registry.
+        """
+        for k, v in payload.items():
+            if k == 'model' and v is not None:
+                model_class = self._model_class()
+                if isinstance(v, dict):
+                    v = model_class.shared(v['id'], self.client, v)
+                else:
+                    v = model_class.shared(v, self.client)
+                v._from_registry()
+            setattr(self, k, v)
+        if complete:
+            self._set_loaded(payload)
+        return self
+
+    def _model_class(self):
+        "Return the class used for the ``model`` attribute."
+        return DeviceModel
+
+    def _diff_value(self, name, value):
+        "Compare models by UUID only."
+
+        if name != 'model':
+            return value
+        if isinstance(value, DeviceModel):
+            return value.id
+        if isinstance(value, dict):
+            return value.get('id')
+        return value
+
+    def hydrate(self, policy=HYDRATE_MISSING, fields=None, **kwargs):
+        """
+        Fetch the device details and those of its model depending on a policy.
+
+        See :py:meth:`Resource.hydrate`. With the policies ``'missing'`` and
+        ``'always'`` the model details are fetched if some of its fields are
+        missing.
+        """
+        super(Device, self).hydrate(policy, fields, **kwargs)
+        model = self._peek('model')
+        eager = policy in (HYDRATE_MISSING, HYDRATE_ALWAYS)
+        if eager and isinstance(model, DeviceModel):
+            model.hydrate(HYDRATE_MISSING)
+        return self
 
     def get_info(self):
         """
         Retrieves device info and stores it as instance attributes.
 
+        The device model details not contained in the device info are
+        taken from the client's model registry or retrieved on first access.
+
         :rtype: self.
         """
 
-        res = self.client.api.get_device(self.id)
-        for k in res:
-            if k == 'model':
-                self.model = DeviceModel(res[k]['id'], client=self.client)
-                self.model.get_info()
-            else:
-                setattr(self, k, res[k])
-        return self
+        res = self.client.fetch('device', self.id,
+            self.client.api.get_device, self.id)
+        return self._update(res, complete=True)
+
+    def refresh(self):
+        """
+        Fetch the device info again and return what has changed.
+
+        Unlike :py:meth:`get_info` this always calls the API, also if the
+        client has a fresh entry in its metadata store. A change of the
+        device model is reported with the old and new model UUIDs.
+
+        :rtype: A dict mapping the names of changed fields to tuples of the
+            old and the new value, empty if nothing has changed.
+        """
+        res = self.client.fetch('device', self.id,
+            self.client.api.get_device, self.id, refresh=True)
+        with self._load_lock():
+            changes = self.diff(res)
+            self._update(res, complete=True)
+        return changes
 
     def update(self, description=None, name=None, modelID=None, public=None):
         """
@@ -303,15 +769,20 @@ class Device(object):
             setattr(self, k, res[k])
         return self
 
-    def get_connected_apps(self):
+    def get_connected_apps(self, hydrate=HYDRATE_LAZY, prefetch=0):
         """
         Retrieves all apps connected to the device.
-        
+
+        :param hydrate: The policy for fetching the details of each app,
+            see :py:meth:`Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`Resource.from_payloads`.
+        :type prefetch: integer
         :rtype: A list of apps.
         """
-        for app_json in self.client.api.get_device_apps(self.id):
-            app = App(id=app_json['id'], client=self.client)
-            app.get_info()
+        res = self.client.api.get_device_apps(self.id)
+        for app in App.from_payloads(res, self.client, hydrate, prefetch):
             yield app
 
     def send_command(self, command):
@@ -326,14 +797,17 @@ class Device(object):
         res = self.client.api.post_device_command(self.id, command)
         return res
 
-    def send_data(self, data):
+    def send_data(self, data, retry=False):
         """
         Sends a data package to the device.
 
         :param data: the data to be sent
         :type data: dict
+        :param retry: flag indicating if sending may be retried on transient
+            failures (which might deliver the same data more than once)
+        :type retry: boolean
         """
-        res = self.client.api.post_device_data(self.id, data)
+        res = self.client.api.post_device_data(self.id, data, retry=retry)
         return res
 
     def send_config(self, data):
@@ -392,6 +866,70 @@ class Device(object):
         res = self.client.api.get_device_data(self.id, start=start, end=end, duration=duration, pagesize=pagesize, pagenum=pagenum)
         return res
 
+    def iter_data(self, start=None, end=None, duration=None, pagesize=1000, workers=0,
+                  max_points=None):
+        """
+        Iterate over all historical data recorded in a time interval.
+
+        All pages are followed, the next page is fetched in the background
+        while the current one is consumed, see
+        :py:meth:`relayr.api.Api.iter_device_data`.
+
+        :param start: datetime value
+        :type start: ISO 8601 string or ``datetime.datetime`` instance or None
+        :param end: datetime value
+        :type end: ISO 8601 string or ``datetime.datetime`` instance or None
+        :param duration: time duration
+        :type duration: ISO 8601 duration string or ``datetime.timedelta`` instance or None
+        :param pagesize: the number of data points per page (up to 1000)
+        :type pagesize: integer
+        :param workers: the maximum number of pages (or with ``max_points``
+            windows) fetched concurrently, 0 to fetch one page ahead only
+        :type workers: integer
+        :param max_points: if given, the interval is split into time windows
+            with at most this many data points, which are fetched
+            concurrently, see :py:meth:`relayr.api.Api.iter_devices_data`
+        :type max_points: integer
+        :rtype: A generator of data points with ``received`` and ``readings``.
+        """
+        api = self.client.api
+        if max_points:
+            points = api.iter_devices_data([self.id], start=start, end=end,
+                duration=duration, max_points=max_points, pagesize=pagesize,
+                workers=workers or 4)
+            return (point for deviceID, point in points)
+        return api.iter_device_data(self.id, start=start, end=end,
+            duration=duration, pagesize=pagesize, workers=workers)
+
+    def get_data_arrays(self, start=None, end=None, duration=None, pagesize=1000,
+                        workers=0, max_points=None):
+        """
+        Get the historical data recorded in a time interval as NumPy arrays.
+
+        The data points are fetched as by :py:meth:`iter_data` (with the same
+        parameters) and converted page by page into a timestamp and a value
+        array per reading meaning, see :py:mod:`relayr.history`. The units
+        are taken from the client's model registry, if the model is known
+        there. Needs NumPy.
+
+        :rtype: A dict mapping meanings to
+            :py:class:`relayr.history.ReadingArrays` objects.
+        """
+        points = self.iter_data(start=start, end=end, duration=duration,
+            pagesize=pagesize, workers=workers, max_points=max_points)
+        return readings_to_arrays(points, pagesize, self._reading_units())
+
+    def _reading_units(self):
+        "Return the units of the readings by meaning, as far as known."
+
+        units = {}
+        model = self._peek('model')
+        models = getattr(self.client, 'models', None)
+        if isinstance(model, DeviceModel) and models is not None:
+            readings = models.readings(model.id, self.client.api.token)
+            units = dict((k, r.get('unit')) for k, r in readings.items())
+        return units
+
     # new methods for transport channels
 
     def create_channel(self, transport):
@@ -413,49 +951,67 @@ class Device(object):
         return res
 
 
-class DeviceModel(object):
+class DeviceModel(Resource):
     """
     relayr device model.
     """
-    
-    def __init__(self, id=None, client=None):
-        self.id = id
-        self.client = client
 
-    def __repr__(self):
-        return "%s(id=%r)" % (self.__class__.__name__, self.id)
+    __slots__ = ('name', 'description', 'manufacturer', 'readings',
+        'commands', 'firmwareVersions')
+
+    fields = ('name', 'manufacturer', 'readings')
 
     def get_info(self):
         """
         Returns device model info and stores it as instance attributes.
+
+        The info is taken from the client's model registry, if possible
+        (see :py:mod:`relayr.registry`).
         
         :rtype: self.
         """
-        res = self.client.api.get_device_model(self.id)
-        for k, v in res.items():
-            setattr(self, k, v)
-        return self
+        fetch = lambda: self.client.fetch('device_model', self.id,
+            self.client.api.get_device_model, self.id)
+        models = getattr(self.client, 'models', None)
+        if models is not None:
+            res = models.load(self.id, fetch, self.client.api.token)
+        else:
+            res = fetch()
+        return self._update(res, complete=True)
+
+    def _from_registry(self):
+        """
+        Take missing fields from the client's model registry, if known there.
+
+        :rtype: True if the model is complete now.
+        """
+        models = getattr(self.client, 'models', None)
+        if self.missing_fields() and models is not None:
+            res = models.get(self.id, self.client.api.token)
+            if res is not None:
+                self._update(res, complete=True)
+        return not self.missing_fields()
 
 
-class Transmitter(object):
+class Transmitter(Resource):
     "A relayr transmitter, The Master Module, for example."
-    
-    def __init__(self, id=None, client=None):
-        self.id = id
-        self.client = client
 
-    def __repr__(self):
-        args = (self.__class__.__name__, self.id)
-        return "%s(id=%r)" % args
+    __slots__ = ('name', 'owner', 'secret', 'integrationType')
 
-    def get_info(self):
+    fields = ('name', 'owner')
+    secret_fields = ('secret',)
+
+    def get_info(self, refresh=False):
         """
         Retrieves transmitter info.
+
+        :param refresh: Flag indicating if the API should be called even if
+            the client's metadata store has a fresh entry.
+        :type refresh: boolean
         """
-        res = self.client.api.get_transmitter(self.id)
-        for k, v in res.items():
-            setattr(self, k, v)
-        return self
+        res = self.client.fetch('transmitter', self.id,
+            self.client.api.get_transmitter, self.id, refresh=refresh)
+        return self._update(res, complete=True)
 
     def delete(self):
         """
@@ -476,14 +1032,19 @@ class Transmitter(object):
             setattr(self, k, v)
         return self
 
-    def get_connected_devices(self):
+    def get_connected_devices(self, hydrate=HYDRATE_LAZY, prefetch=0):
         """
         Returns a list of devices connected to the specific transmitter.
-        
+
+        :param hydrate: The policy for fetching the details of each device,
+            see :py:meth:`Resource.from_payload`.
+        :type hydrate: string
+        :param prefetch: Number of detail fetches kept in flight on the API
+            worker pool, see :py:meth:`Resource.from_payloads`.
+        :type prefetch: integer
         :rtype: A list of devices.
         """
-        res = self.client.api.get_transmitter_devices(self.id)
-        for d in res:
-            dev = Device(d['id'], client=self.client)
-            dev.get_info()
+        res = self.client.fetch('transmitter_devices', self.id,
+            self.client.api.get_transmitter_devices, self.id)
+        for dev in Device.from_payloads(res, self.client, hydrate, prefetch):
             yield dev
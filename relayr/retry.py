@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""
+Retry policies for API calls failing with transient errors.
+
+A :py:class:`RetryPolicy` decides if and when a failed API call is repeated
+by :py:meth:`relayr.api.Api.perform_request`. By default only idempotent
+HTTP methods (``GET``, ``PUT``, ``DELETE``, ...) are retried, on connection
+errors and on responses with status codes like 429 or 503, waiting with
+exponential backoff and random jitter between attempts or as long as
+requested by a ``Retry-After`` response header.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Api
+    from relayr.retry import RetryPolicy
+    api = Api(token='...', retry=RetryPolicy(total=5, backoff_factor=1))
+    api.post_device_data(deviceID, data, retry=True)  # opt-in for POST
+    print(api.retry_stats.as_dict())
+"""
+
+import time
+import random
+import threading
+import email.utils
+
+from relayr import config
+
+
+class RetryPolicy(object):
+    "A policy describing which failed API calls are retried and when."
+
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+    RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, total=None, backoff_factor=None, max_backoff=None,
+                 jitter=True, status_codes=None, methods=None,
+                 respect_retry_after=True):
+        """
+        :param total: Maximum number of retries per call (defaults to
+            ``config.RETRY_TOTAL``).
+        :type total: integer
+        :param backoff_factor: Base delay in seconds, doubled after each
+            retry (defaults to ``config.RETRY_BACKOFF_FACTOR``).
+        :type backoff_factor: number
+        :param max_backoff: Maximum delay in seconds between two attempts,
+            also for delays requested by the server (defaults to
+            ``config.RETRY_MAX_BACKOFF``).
+        :type max_backoff: number
+        :param jitter: Flag indicating if delays are randomized between
+            zero and the computed backoff ("full jitter").
+        :type jitter: boolean
+        :param status_codes: HTTP status codes that cause a retry.
+        :type status_codes: set of integers
+        :param methods: HTTP methods that are retried without opt-in.
+        :type methods: set of strings
+        :param respect_retry_after: Flag indicating if a ``Retry-After``
+            response header determines the delay.
+        :type respect_retry_after: boolean
+        """
+        if total is None:
+            total = config.RETRY_TOTAL
+        if backoff_factor is None:
+            backoff_factor = config.RETRY_BACKOFF_FACTOR
+        if max_backoff is None:
+            max_backoff = config.RETRY_MAX_BACKOFF
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = frozenset(status_codes or self.RETRY_STATUS_CODES)
+        self.methods = frozenset(m.upper() for m in (methods or self.IDEMPOTENT_METHODS))
+        self.respect_retry_after = respect_retry_after
+
+    def __repr__(self):
+        args = (self.__class__.__name__, self.total, self.backoff_factor, self.max_backoff)
+        return "%s(total=%r, backoff_factor=%r, max_backoff=%r)" % args
+
+    def can_retry(self, method, retries, status=None, retry=None):
+        """
+        Return True if a failed call should be repeated.
+
+        :param method: HTTP request method, ``GET``, ``POST``, etc.
+        :type method: string
+        :param retries: Number of retries already made for this call.
+        :type retries: integer
+        :param status: HTTP status code of the failed call or None
+            for a connection error.
+        :type status: integer
+        :param retry: Opt-in (True) or opt-out (False) of retries for this
+            call, None to decide by the HTTP method.
+        :type retry: boolean
+        """
+        if retry is False or retries >= self.total:
+            return False
+        if retry is None and method.upper() not in self.methods:
+            return False
+        return status is None or status in self.status_codes
+
+    def backoff(self, retries, retry_after=None):
+        """
+        Return the number of seconds to wait before the next attempt.
+
+        :param retries: Number of retries already made for this call.
+        :type retries: integer
+        :param retry_after: Value of a ``Retry-After`` response header.
+        :type retry_after: string
+        :rtype: float
+        """
+        if self.respect_retry_after and retry_after:
+            seconds = parse_retry_after(retry_after)
+            if seconds is not None:
+                return min(seconds, self.max_backoff)
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** retries))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class RetryStats(object):
+    "Thread-safe counters of attempts, retries and failures of API calls."
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        "Set all counters to zero."
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.failures = 0
+            self.reasons = {}
+
+    def record_request(self):
+        "Count one HTTP request being sent."
+        with self._lock:
+            self.requests += 1
+
+    def record_retry(self, reason):
+        "Count one retry caused by a status code or exception name."
+        with self._lock:
+            self.retries += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def record_failure(self):
+        "Count one call failing after all retries."
+        with self._lock:
+            self.failures += 1
+
+    def as_dict(self):
+        "Return a snapshot of all counters as a dict."
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'failures': self.failures,
+                'reasons': dict(self.reasons),
+            }
+
+
+def parse_retry_after(value):
+    """
+    Return the number of seconds given in a ``Retry-After`` header value.
+
+    The value can be a number of seconds or an HTTP date. None is returned
+    for unparsable values, zero for dates in the past.
+
+    :param value: A ``Retry-After`` header value.
+    :type value: string
+    :rtype: float or None
+    """
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(parsed) - time.time())
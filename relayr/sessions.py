@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pooled keep-alive HTTP sessions used by the API layer.
+
+A :py:class:`SessionPool` keeps TCP/TLS connections to the relayr API open
+between calls, so that only the first request to a host pays for the
+handshake. One pool can be shared between many
+:py:class:`relayr.api.Api` and :py:class:`relayr.client.Client` instances,
+and by default all of them share the process-wide pool returned by
+:py:func:`get_default_pool`.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Client
+    from relayr.sessions import SessionPool
+    pool = SessionPool(pool_maxsize=32)
+    c1 = Client(token='...', session_pool=pool)
+    c2 = Client(token='...', session_pool=pool)
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from relayr import config
+
+
+class SessionPool(object):
+    """
+    A thread-safe pool of keep-alive HTTP sessions.
+
+    All sessions handed out by the pool share one connection adapter, i.e.
+    one set of per-host connection pools. Each thread gets its own session
+    object (sessions are not safe to be used concurrently), while the
+    underlying connections are reused by all threads.
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None,
+                 pool_block=None, factory=None):
+        """
+        :param pool_connections: Number of hosts to keep connection pools for.
+        :type pool_connections: integer
+        :param pool_maxsize: Maximum number of connections kept per host.
+        :type pool_maxsize: integer
+        :param pool_block: Flag indicating if a request should wait for
+            a free connection when ``pool_maxsize`` connections to a host
+            are in use (instead of opening a throw-away connection).
+        :type pool_block: boolean
+        :param factory: Callable returning a new session object, mainly
+            useful for testing (defaults to a ``requests.Session`` using
+            the pool's shared adapter).
+        :type factory: callable
+        """
+        if pool_connections is None:
+            pool_connections = config.HTTP_POOL_CONNECTIONS
+        if pool_maxsize is None:
+            pool_maxsize = config.HTTP_POOL_MAXSIZE
+        if pool_block is None:
+            pool_block = config.HTTP_POOL_BLOCK
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self._factory = factory or self._create_session
+        self._local = threading.local()
+
+    def __repr__(self):
+        args = (self.__class__.__name__, self.pool_connections,
+            self.pool_maxsize, self.pool_block)
+        return "%s(pool_connections=%r, pool_maxsize=%r, pool_block=%r)" % args
+
+    def _create_session(self):
+        "Return a new session using the shared connection adapter."
+
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return session
+
+    @property
+    def session(self):
+        "The session object to be used by the calling thread."
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._factory()
+        return session
+
+    def request(self, method, url, **kwargs):
+        """
+        Perform an HTTP request using a pooled connection.
+
+        :param method: HTTP request method, ``GET``, ``POST``, etc.
+        :type method: string
+        :param url: Full HTTP path.
+        :type url: string
+        :rtype: A ``requests.Response`` object.
+
+        Additional keyword arguments are passed to ``requests.Session.request``.
+        """
+        return self.session.request(method.upper(), url, **kwargs)
+
+    def close(self):
+        """
+        Close all connections kept open by this pool.
+
+        The pool stays usable, new connections are opened on demand.
+        """
+        self.adapter.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """
+    Return the process-wide session pool, creating it on first use.
+
+    :rtype: A :py:class:`SessionPool` object.
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = SessionPool()
+    return _default_pool
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+A persistent metadata store for warm restarts and API outages.
+
+A :py:class:`MetadataStore` passed to :py:class:`relayr.client.Client`
+keeps the details of devices, device models, apps and transmitters and
+the device, transmitter and app lists of users in an SQLite database,
+by default ``metadata.sqlite`` inside ``config.RELAYR_FOLDER``. Every entry
+records when it was fetched and for how long it is considered fresh. The
+client reads through the store: fresh entries are served without API
+calls, also after a restart, expired ones are fetched again. If the API
+is unavailable (connection errors, timeouts, ``429`` and ``5XX``
+responses) expired entries are served for up to ``max_stale`` more seconds
+instead of failing.
+
+The database file is readable by its owner only. Fields holding secrets,
+like the ``secret`` of transmitters, are never stored, and the client
+keeps the entries of different API tokens apart.
+
+Example:
+
+.. code-block:: python
+
+    from relayr import Client
+    from relayr.store import MetadataStore
+    store = MetadataStore(ttls={'device': 600})
+    c = Client(token='...', store=store)
+    dev = c.get_device(deviceID)
+    print(dev.name)  # fetched from the API or the store
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+from relayr import config
+
+
+# default time-to-live (in seconds) per kind of entry
+DEFAULT_TTLS = {
+    'user': 3600,
+    'device': 300,
+    'device_model': 24 * 3600,
+    'app': 3600,
+    'transmitter': 300,
+    'user_devices': 300,
+    'user_transmitters': 300,
+    'user_apps': 3600,
+    'transmitter_devices': 300,
+    'user_bookmarks': 300,
+    'device_channels': 300,
+}
+
+# fields removed from payloads before they are stored
+SECRET_FIELDS = frozenset(['secret', 'clientSecret', 'password', 'token',
+    'credentials'])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS metadata (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    ttl REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+)
+'''
+
+
+def token_digest(token):
+    """
+    Return a digest of an API token, used to keep the entries of different
+    tokens apart without storing the tokens.
+
+    :param token: The API token or None for anonymous access.
+    :type token: string
+    :rtype: string
+    """
+    return hashlib.sha256((token or '').encode('utf-8')).hexdigest()[:32]
+
+
+def strip_secrets(payload):
+    "Return a copy of a payload without the ``SECRET_FIELDS`` at any depth."
+
+    if isinstance(payload, dict):
+        return dict((k, strip_secrets(v)) for k, v in payload.items()
+            if k not in SECRET_FIELDS)
+    if isinstance(payload, list):
+        return [strip_secrets(v) for v in payload]
+    return payload
+
+
+class StoredPayload(dict):
+    """
+    A payload read from the store, lacking the ``SECRET_FIELDS`` the API
+    may have returned.
+    """
+
+    __slots__ = ()
+
+
+class StoreEntry(object):
+    "A stored payload with the time it was fetched and its time-to-live."
+
+    __slots__ = ('payload', 'fetched', 'ttl')
+
+    def __init__(self, payload, fetched, ttl):
+        self.payload = payload
+        self.fetched = fetched
+        self.ttl = ttl
+
+    def age(self):
+        "Return the number of seconds since the payload was fetched."
+        return time.time() - self.fetched
+
+    def is_fresh(self):
+        "Return True if the entry can be used without fetching it again."
+        return self.age() < self.ttl
+
+
+class MetadataStore(object):
+    "A thread- and process-safe SQLite store of API metadata."
+
+    def __init__(self, path=None, ttls=None, max_stale=24 * 3600):
+        """
+        :param path: Path of the SQLite database file (defaults to
+            ``metadata.sqlite`` inside ``config.RELAYR_FOLDER``).
+        :type path: string
+        :param ttls: Time-to-live in seconds per kind of entry, overwriting
+            the defaults in ``DEFAULT_TTLS``.
+        :type ttls: dict
+        :param max_stale: Maximum number of seconds after expiry for which an
+            entry is served while the API is unavailable (None for no limit).
+        :type max_stale: number
+        """
+        if path is None:
+            folder = os.path.expanduser(config.RELAYR_FOLDER)
+            path = os.path.join(folder, 'metadata.sqlite')
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            # readable by the owner only, also if created by an older version
+            os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+            os.chmod(path, 0o600)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+
+    def __repr__(self):
+        return "%s(path=%r)" % (self.__class__.__name__, self.path)
+
+    def ttl(self, kind):
+        "Return the time-to-live in seconds for a kind of entry."
+        return self.ttls.get(kind, 300)
+
+    def get(self, kind, key):
+        """
+        Return the stored entry for a kind and key or None.
+
+        :param kind: The kind of entry, e.g. ``'device'``.
+        :type kind: string
+        :param key: The key, usually a resource UUID.
+        :type key: string
+        :rtype: A :py:class:`StoreEntry` object or None. Its payload is a
+            :py:class:`StoredPayload` if it is a dict.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT payload, fetched, ttl FROM metadata '
+                'WHERE kind = ? AND key = ?', (kind, key)).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[0])
+        if isinstance(payload, dict):
+            payload = StoredPayload(payload)
+        return StoreEntry(payload, row[1], row[2])
+
+    def put(self, kind, key, payload, ttl=None):
+        """
+        Store a payload fetched just now, without its secret fields.
+
+        :param payload: A JSON-serializable API response.
+        :param ttl: Time-to-live in seconds (defaults to :py:meth:`ttl`).
+        :type ttl: number
+        """
+        if ttl is None:
+            ttl = self.ttl(kind)
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO metadata '
+                '(kind, key, payload, fetched, ttl) VALUES (?, ?, ?, ?, ?)',
+                (kind, key, json.dumps(strip_secrets(payload)), time.time(), ttl))
+            self._conn.commit()
+
+    def delete(self, kind, key):
+        "Remove the entry for a kind and key, if any."
+
+        with self._lock:
+            self._conn.execute('DELETE FROM metadata WHERE kind = ? AND key = ?',
+                (kind, key))
+            self._conn.commit()
+
+    def clear(self, kind=None):
+        "Remove all entries, or all entries of one kind."
+
+        with self._lock:
+            if kind is None:
+                self._conn.execute('DELETE FROM metadata')
+            else:
+                self._conn.execute('DELETE FROM metadata WHERE kind = ?', (kind,))
+            self._conn.commit()
+
+    def is_servable(self, entry):
+        "Return True if an expired entry may be served during an API outage."
+
+        if self.max_stale is None:
+            return True
+        return entry.age() < entry.ttl + self.max_stale
+
+    def close(self):
+        "Close the database connection."
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helpers for running API calls concurrently on a worker pool and for
+coalescing identical concurrent calls.
+"""
+
+import threading
+from collections import deque
+
+
+def readahead(items, func, window, executor):
+    """
+    Yield ``func(item)`` for all items in order, computed ahead on a pool.
+
+    Up to ``window`` calls are kept in flight on the executor while the
+    consumer handles earlier results, so at most ``window`` results are
+    held in memory, no matter how many items there are. Exceptions raised
+    by ``func`` are raised when the respective result is reached. Calls not
+    yet started are cancelled when the generator is closed early.
+
+    :param items: The arguments for ``func``.
+    :type items: iterable
+    :param func: The function to call for each item.
+    :type func: callable
+    :param window: Maximum number of calls in flight, if less than one
+        ``func`` is called sequentially without the executor.
+    :type window: integer
+    :param executor: The worker pool.
+    :type executor: A ``concurrent.futures.Executor`` object.
+    :rtype: A generator of the results of ``func``.
+
+    Example:
+
+    .. code-block:: python
+
+        infos = readahead(deviceIDs, api.get_device, 8, api.executor)
+        for info in infos:
+            print(info['name'])
+    """
+    if window < 1:
+        for item in items:
+            yield func(item)
+        return
+
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _Call(object):
+    "A call in flight, its result or exception."
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent identical calls into one.
+
+    While a call for some key is in flight, further calls with the same key
+    wait for it and get its result (or its exception) instead of calling
+    the function again. Calls started after it has finished call the
+    function again, nothing is cached.
+
+    Example:
+
+    .. code-block:: python
+
+        flight = SingleFlight()
+        # in many threads at once, sending only one request
+        info = flight.do(modelID, api.get_device_model, modelID)
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def __len__(self):
+        "Return the number of calls in flight."
+        return len(self._calls)
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Call a function unless a call with the same key is in flight.
+
+        :param key: A hashable key identifying identical calls.
+        :param func: The function to call with the remaining arguments.
+        :type func: callable
+        :rtype: The result of the call, possibly shared with other callers.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Incremental parsing of JSON arrays received in chunks.
+"""
+
+import re
+import json
+import codecs
+from itertools import chain
+
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(chunks):
+    """
+    Yield the elements of a top-level JSON array as soon as they are complete.
+
+    Only the elements not yet yielded and the incomplete rest of the current
+    chunk are kept in memory, no matter how long the array is.
+
+    :param chunks: UTF-8 encoded parts of a JSON document containing an array.
+    :type chunks: iterable of bytes
+    :rtype: A generator of Python data structures.
+
+    Raises ``ValueError`` for invalid or incomplete JSON and for documents
+    not containing an array.
+
+    Example:
+
+    .. code-block:: python
+
+        >>> list(iter_json_array([b'[{"id": 1}, {"i', b'd": 2}]']))
+        [{'id': 1}, {'id': 2}]
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    # what may come next: '[', a value or ']' (first), a value, ',' or ']'
+    buf, pos, expect = '', 0, '['
+    for chunk in chain(chunks, [None]):
+        final = chunk is None
+        buf = buf[pos:] + text_decoder.decode(chunk or b'', final=final)
+        pos = 0
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            char = buf[pos]
+            if expect == '[':
+                if char != '[':
+                    raise ValueError('Expected a JSON array, got %r' % buf[pos:pos+20])
+                expect = 'first'
+                pos += 1
+            elif expect == ',':
+                if char == ']':
+                    return
+                if char != ',':
+                    raise ValueError("Expected ',' or ']' in JSON array, got %r" %
+                        buf[pos:pos+20])
+                expect = 'value'
+                pos += 1
+            elif char == ']' and expect == 'first':
+                return
+            elif char in ',]':
+                raise ValueError('Expected a value in JSON array, got %r' %
+                    buf[pos:pos+20])
+            else:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    break
+                if end >= len(buf) and not final:
+                    # e.g. a number which might continue in the next chunk
+                    break
+                yield obj
+                expect = ','
+                pos = end
+    raise ValueError('Incomplete JSON array')
@@ -10,6 +10,7 @@ import datetime
 import isodate
 
 from relayr.compat import PY3
+from relayr.utils.timestamps import parse_datetime
 
 
 if PY3:
@@ -39,9 +40,9 @@ def get_start_end(start=None, end=None, duration=None):
 
     # convert iso datetime and duration values to datetime or timedelta
     if type(start) in (str, unicode):
-        start = isodate.parse_datetime(start)
+        start = parse_datetime(start)
     if type(end) in (str, unicode):
-        end = isodate.parse_datetime(end)
+        end = parse_datetime(end)
     if type(duration) in (str, unicode):
         duration = isodate.parse_duration(duration)
 
@@ -58,6 +59,46 @@ def get_start_end(start=None, end=None, duration=None):
     return start, end
 
 
+def _parse_datetime(value):
+    if type(value) in (str, unicode):
+        return parse_datetime(value)
+    return value
+
+
+def _format_datetime(dt):
+    "Return an ISO 8601 datetime string with milliseconds."
+
+    ms = '%03d' % (dt.microsecond // 1000)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.') + ms + isodate.tz_isoformat(dt)
+
+
+def split_range(start, end, parts=2):
+    """
+    Split a datetime interval into adjacent sub-intervals of equal length.
+
+    The boundaries are rounded to milliseconds, the end of each
+    sub-interval is the start of the next one.
+
+    :param start: datetime value, e.g. as returned by :py:func:`get_start_end`
+    :type start: ISO 8601 string or ``datetime.datetime`` instance
+    :param end: datetime value
+    :type end: ISO 8601 string or ``datetime.datetime`` instance
+    :param parts: the number of sub-intervals
+    :type parts: integer
+    :rtype: list of ``parts`` tuples of two ISO 8601 strings (fewer if the
+        interval is shorter than ``parts`` milliseconds).
+    """
+    start, end = _parse_datetime(start), _parse_datetime(end)
+    assert start < end and parts > 0
+    delta = end - start
+    total = (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+    parts = max(1, min(parts, total))
+    bounds = [start + datetime.timedelta(milliseconds=total * i // parts)
+        for i in range(parts)] + [end]
+    bounds = [_format_datetime(dt) for dt in bounds]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
 if __name__ == '__main__':
     dt = datetime.datetime.now()
     td = datetime.timedelta(days=1)
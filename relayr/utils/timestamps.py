@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fast parsing of ISO 8601 timestamps as used by the relayr API.
+
+The API formats all timestamps (e.g. ``received`` and ``recorded`` of
+readings) as ``YYYY-MM-DDTHH:MM:SS.sssZ``. This format, and the same
+without milliseconds or without the ``Z``, is parsed by slicing the
+string, much faster than by a general ISO 8601 parser. All other
+timestamps, e.g. with time zone offsets, are parsed with ``isodate``.
+Timestamps without a time zone are taken as UTC when converted to epoch
+milliseconds. :py:func:`to_epoch_ms_array` converts many timestamps at
+once, with array operations if NumPy is installed.
+
+Example:
+
+.. code-block:: python
+
+    from relayr.utils.timestamps import parse_datetime, to_epoch_ms_array
+    parse_datetime('2015-03-06T10:49:11.998Z')
+    to_epoch_ms_array(['2015-03-06T10:49:11.998Z', '2015-03-06T10:49:12Z'])
+
+See ``benchmarks/timestamps.py`` for a comparison with ``isodate``.
+"""
+
+import datetime
+
+import isodate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=isodate.UTC)
+_EPOCH_STAMP = '1970-01-01T00:00:00.000Z'
+
+# positions of the separators in YYYY-MM-DDTHH:MM:SS.sssZ
+_SEPARATORS = ((4, '-'), (7, '-'), (10, 'T'), (13, ':'), (16, ':'))
+
+# int64 value of NumPy's NaT (not a time), used for missing timestamps
+_NAT = -2 ** 63
+
+# days per month in common years, indexed by month
+_MONTH_DAYS = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _is_leap(y):
+    return y % 4 == 0 and (y % 100 != 0 or y % 400 == 0)
+
+
+def _fields(s):
+    """
+    Return the fields of a timestamp in the API format or None.
+
+    :rtype: A tuple of year, month, day, hour, minute, second, millisecond
+        and a flag indicating a ``Z`` suffix.
+    """
+    n = len(s)
+    utc = s[-1:] == 'Z'
+    if utc:
+        n -= 1
+    if n == 23:
+        if s[19] != '.':
+            return None
+    elif n != 19:
+        return None
+    if s[4] != '-' or s[7] != '-' or s[10] != 'T' or s[13] != ':' or s[16] != ':':
+        return None
+    try:
+        f = (int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]),
+            int(s[14:16]), int(s[17:19]), int(s[20:23]) if n == 23 else 0, utc)
+    except ValueError:
+        return None
+    if not (1 <= f[1] <= 12 and f[3] < 24 and f[4] < 60 and f[5] < 60):
+        return None
+    if not 1 <= f[2] <= _MONTH_DAYS[f[1]] + (f[1] == 2 and _is_leap(f[0])):
+        return None
+    return f
+
+
+def parse_datetime(s):
+    """
+    Parse an ISO 8601 timestamp.
+
+    :param s: The timestamp.
+    :type s: string
+    :rtype: A ``datetime.datetime`` object, in UTC (``isodate.UTC``) for
+        timestamps ending with ``Z`` and without time zone if the timestamp
+        has none, like ``isodate.parse_datetime`` returns it.
+    """
+    f = _fields(s)
+    if f is None:
+        return isodate.parse_datetime(s)
+    tz = isodate.UTC if f[7] else None
+    return datetime.datetime(f[0], f[1], f[2], f[3], f[4], f[5], f[6] * 1000, tz)
+
+
+def _days_from_civil(y, m, d):
+    "Return the number of days since 1970-01-01 of a proleptic Gregorian date."
+
+    y -= m <= 2
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def to_epoch_ms(s):
+    """
+    Convert an ISO 8601 timestamp into milliseconds since the epoch.
+
+    :param s: The timestamp (taken as UTC without time zone).
+    :type s: string
+    :rtype: integer
+    """
+    f = _fields(s)
+    if f is None:
+        dt = isodate.parse_datetime(s)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=isodate.UTC)
+        delta = dt - _EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+    days = _days_from_civil(f[0], f[1], f[2])
+    return ((days * 24 + f[3]) * 60 + f[4]) * 60000 + f[5] * 1000 + f[6]
+
+
+def _epoch_ms_numpy(strings):
+    "Convert timestamps with array operations, falling back per timestamp."
+
+    result = numpy.empty(len(strings), dtype='int64')
+    joined = '\n'.join(strings)
+    if len(joined) == 25 * len(strings) - 1 and joined.count('\n') == len(strings) - 1:
+        # all timestamps have 24 characters, no array of strings needed
+        buf = numpy.frombuffer((joined + '\n').encode('ascii'), dtype='u1')
+        chars = buf.reshape(len(strings), 25)[:, :24]
+    else:
+        arr = numpy.array(strings, dtype='S')
+        width = max(arr.itemsize, 24)
+        arr = arr.astype('S%d' % width)
+        chars = arr.view('u1').reshape(len(arr), width)[:, :24]
+        # shorter timestamps are padded with zero bytes, longer ones would
+        # look like the API format otherwise
+        chars = chars.copy()
+        chars[numpy.char.str_len(arr) != 24, 23] = 0
+    # one contiguous row of digits per character position
+    digits = (chars.T - 48).astype('u1')
+    fast = (digits[[0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 22]] <= 9).all(axis=0)
+    for i, c in _SEPARATORS + ((19, '.'), (23, 'Z')):
+        fast &= chars[:, i] == ord(c)
+    d = digits.astype('i8')
+    if not fast.all():
+        d = d[:, fast]
+    num = lambda i, n: sum(d[i + k] * 10 ** (n - 1 - k) for k in range(n))
+    y, m, day = num(0, 4), num(5, 2), num(8, 2)
+    hour, minute, sec = num(11, 2), num(14, 2), num(17, 2)
+    leap = (y % 4 == 0) & ((y % 100 != 0) | (y % 400 == 0))
+    month_days = numpy.array(_MONTH_DAYS).take(numpy.clip(m, 0, 12))
+    valid = (m >= 1) & (m <= 12) & (day >= 1) & \
+        (day <= month_days + (leap & (m == 2))) & \
+        (hour < 24) & (minute < 60) & (sec < 60)
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + numpy.where(m > 2, -3, 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+    ms = ((days * 24 + hour) * 60 + minute) * 60000 + sec * 1000 + num(20, 3)
+    index = numpy.flatnonzero(fast)
+    result[index[valid]] = ms[valid]
+    fast[index[~valid]] = False
+    for i in numpy.flatnonzero(~fast):
+        result[i] = to_epoch_ms(strings[i])
+    return result
+
+
+def to_epoch_ms_array(strings):
+    """
+    Convert many ISO 8601 timestamps into milliseconds since the epoch.
+
+    With NumPy, timestamps in the API format ``YYYY-MM-DDTHH:MM:SS.sssZ``
+    are converted with array operations on their characters, all others
+    one by one with :py:func:`to_epoch_ms`. Missing timestamps (None) are
+    converted into the value of ``NaT`` in ``datetime64`` arrays.
+
+    :param strings: The timestamps (taken as UTC without time zone) or None.
+    :type strings: sequence of strings
+    :rtype: An ``int64`` NumPy array if NumPy is installed, else a list of
+        integers and None.
+    """
+    strings = list(strings)
+    if numpy is None:
+        return [None if s is None else to_epoch_ms(s) for s in strings]
+    if not strings:
+        return numpy.empty(0, dtype='int64')
+    missing = [i for i, s in enumerate(strings) if s is None]
+    if missing:
+        strings = [_EPOCH_STAMP if s is None else s for s in strings]
+    try:
+        result = _epoch_ms_numpy(strings)
+    except UnicodeEncodeError:
+        result = numpy.array([to_epoch_ms(s) for s in strings], dtype='int64')
+    result[missing] = _NAT
+    return result
@@ -38,6 +38,10 @@ with open('requirements.txt') as f:
 if sys.version_info[:3] < (2, 7, 9):
     install_requires += ['pyopenssl', 'ndg-httpsclient', 'pyasn1']
 
+# OrderedDict backport for Python 2.6
+if sys.version_info[:2] < (2, 7):
+    install_requires.append('ordereddict')
+
 # Add pexpect only if not running on Windows (not strictly needed
 # except for the *very* exerimental file ble.py).
 if platform.system() != 'Windows':
@@ -9,6 +9,12 @@ import sys
 import pytest
 
 
+# the asyncio tests use async generators, not available before Python 3.6
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_aio.py')
+
+
 ## TODO: maybe use importlib.import_module
 
 @pytest.fixture(scope='module')
@@ -26,3 +32,11 @@ def fix_registered():
     import fixture_registered
     del sys.path[0]
     return fixture_registered
+
+@pytest.fixture(scope='module')
+def fix_fakeapi():
+    "Return fixture for accessing a fake API backend without network access."
+    sys.path.insert(0, os.path.dirname(__file__))
+    import fixture_fakeapi
+    del sys.path[0]
+    return fixture_fakeapi
@@ -0,0 +1,103 @@
+"""
+A fake relayr API backend used for testing the client without network access.
+
+The ``FakeServer`` maps ``(method, path)`` pairs to canned responses and
+records all requests it receives. Pass ``server.session`` as the ``factory``
+of a ``relayr.sessions.SessionPool`` to route an ``Api`` object to it.
+"""
+
+import json
+import threading
+
+from relayr.compat import PY2
+
+if PY2:
+    from urlparse import urlsplit
+else:
+    from urllib.parse import urlsplit
+
+
+class FakeResponse(object):
+    "A minimal stand-in for ``requests.Response``."
+
+    def __init__(self, status_code=200, payload=None, headers=None, content=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        if content is None:
+            content = json.dumps(payload).encode('utf-8')
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i+chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    "A session sending all requests to a ``FakeServer``."
+
+    def __init__(self, server):
+        self.server = server
+
+    def request(self, method, url, **kwargs):
+        return self.server.handle(method, url, **kwargs)
+
+
+class FakeServer(object):
+    "A fake relayr API with canned responses and a request log."
+
+    def __init__(self, routes=None):
+        self.routes = {('GET', '/server-status'): {'database': 'ok'}}
+        self.routes.update(routes or {})
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def session(self):
+        "Session factory for ``relayr.sessions.SessionPool``."
+        return FakeSession(self)
+
+    def count(self, method=None, path=None):
+        "Return the number of received requests matching method and path."
+        return len([r for r in self.requests
+            if method in (None, r[0]) and path in (None, r[1])])
+
+    def handle(self, method, url, **kwargs):
+        parts = urlsplit(url)
+        with self.lock:
+            self.requests.append((method, parts.path, parts.query, kwargs))
+        route = self.routes.get((method, parts.path))
+        if route is None:
+            return FakeResponse(404, {'message': 'Not found'})
+        if callable(route):
+            route = route(method, url, **kwargs)
+        if isinstance(route, FakeResponse):
+            return route
+        return FakeResponse(200, route)
+
+
+def make_api(routes=None, token='token', **kwargs):
+    "Return a tuple of a fake server and an ``Api`` object connected to it."
+
+    from relayr.api import Api
+    from relayr.sessions import SessionPool
+    server = FakeServer(routes)
+    api = Api(token=token, session_pool=SessionPool(factory=server.session), **kwargs)
+    return server, api
+
+
+def make_client(routes=None, token='token', **kwargs):
+    "Return a tuple of a fake server and a ``Client`` object connected to it."
+
+    from relayr.client import Client
+    from relayr.sessions import SessionPool
+    from relayr.registry import get_default_registry
+    # start without models from other fake servers
+    get_default_registry().clear()
+    server = FakeServer(routes)
+    client = Client(token=token, session_pool=SessionPool(factory=server.session), **kwargs)
+    return server, client
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of the asynchronous API client in ``relayr.aio``.
+
+These tests need Python 3.6+ and aiohttp and run against a fake API backend
+provided by the fixture file ``fixture_fakeapi.py`` without network access.
+"""
+
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+START = '2015-03-01T00:00:00'
+
+
+class FakeAioResponse(object):
+    "A minimal stand-in for ``aiohttp.ClientResponse``."
+
+    def __init__(self, resp):
+        self.status = resp.status_code
+        self.headers = resp.headers
+        self._content = resp.content
+
+    async def read(self):
+        return self._content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakeAioSession(object):
+    "An ``aiohttp.ClientSession`` stand-in sending requests to a fake server."
+
+    def __init__(self, server):
+        self.server = server
+
+    def request(self, method, url, **kwargs):
+        return FakeAioResponse(self.server.handle(method, url, **kwargs))
+
+    async def close(self):
+        pass
+
+
+def history_route(points):
+    "Return a route serving history pages of data points with next links."
+
+    from urllib.parse import urlsplit, parse_qs
+    def route(method, url, **kwargs):
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        page = int(query['page'][0])
+        size = int((query.get('pagesize') or query.get('pageSize'))[0])
+        selected = points
+        if 'start' in query:
+            start, end = query['start'][0][:19], query['end'][0][:19]
+            selected = [p for p in points if start <= p['received'][:19] <= end]
+        links = {}
+        if page * size < len(selected):
+            links['next'] = {'href': '%s?page=%d&pageSize=%d' % (
+                parts.path, page + 1, size)}
+        return {'pageSize': size, 'page': page, 'totalResults': len(selected),
+            'results': selected[(page - 1) * size:page * size], '_links': links}
+    return route
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestAsyncApi(object):
+    "Test asynchronous API endpoints."
+
+    def test_endpoints_are_awaitable(self, fix_fakeapi):
+        "Test endpoint methods return awaitables resolving to the payload."
+        from relayr.aio import AsyncApi
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/devices/1'): {'id': '1', 'name': 'a'},
+            ('GET', '/devices/2'): {'id': '2', 'name': 'b'}})
+        api = AsyncApi(token='token', session=FakeAioSession(server), check=False)
+
+        async def main():
+            return await asyncio.gather(api.get_device('1'), api.get_device('2'))
+
+        res = run(main())
+        assert [d['name'] for d in res] == ['a', 'b']
+        assert server.count('GET', '/server-status') == 0
+
+    def test_error(self, fix_fakeapi):
+        "Test non-2XX responses raise RelayrApiException."
+        from relayr.aio import AsyncApi
+        from relayr.exceptions import RelayrApiException
+        server = fix_fakeapi.FakeServer()
+        api = AsyncApi(token='token', session=FakeAioSession(server), check=False)
+        with pytest.raises(RelayrApiException):
+            run(api.get_device('missing'))
+
+    def test_stream(self, fix_fakeapi):
+        "Test streaming endpoints return async generators."
+        from relayr.aio import AsyncApi
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/devices/public'): [{'id': '1'}, {'id': '2'}]})
+        api = AsyncApi(token='token', session=FakeAioSession(server), check=False)
+
+        async def main():
+            return [d async for d in api.get_public_devices(stream=True)]
+
+        assert [d['id'] for d in run(main())] == ['1', '2']
+
+
+class TestAsyncClient(object):
+    "Test asynchronous client and resources."
+
+    def test_async_generators(self, fix_fakeapi):
+        "Test collection methods are async generators of async resources."
+        from relayr.aio import AsyncClient, AsyncDevice, AsyncDeviceModel
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/oauth2/user-info'): {'id': 'u1', 'name': 'joe'},
+            ('GET', '/users/u1/devices'): [{'id': 'd1'}],
+            ('GET', '/devices/d1'): {'id': 'd1', 'name': 'dev', 'model': {'id': 'm1'}},
+            ('GET', '/device-models/m1'): {'id': 'm1', 'readings': []}})
+        c = AsyncClient(token='token', session=FakeAioSession(server), check=False)
+
+        async def main():
+            usr = await c.get_user()
+            return [d async for d in usr.get_devices()]
+
+        devs = run(main())
+        assert len(devs) == 1
+        assert isinstance(devs[0], AsyncDevice)
+        assert devs[0].name == 'dev'
+        assert isinstance(devs[0].model, AsyncDeviceModel)
+        assert devs[0].model.readings == []
+
+    def test_client_state(self, fix_fakeapi):
+        "Test the async client has the state of a client, but no fleets."
+        from relayr.aio import AsyncClient, AsyncApi
+        from relayr.registry import ModelRegistry
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/device-models'): [{'id': 'm1', 'readings': []}]})
+        models = ModelRegistry()
+        c = AsyncClient(token='token', session=FakeAioSession(server), check=False,
+            models=models)
+        assert isinstance(c.api, AsyncApi)
+        assert c.store is None and c.models is models and len(c.resources) == 0
+
+        async def main():
+            return [dm async for dm in c.get_public_device_models(hydrate='never')]
+
+        assert [dm.id for dm in run(main())] == ['m1']
+        assert 'm1' in models
+
+    def test_fleet_snapshot(self, fix_fakeapi):
+        "Test fleet snapshots are loaded by a synchronous client in a thread."
+        from relayr.aio import AsyncClient
+        server, fleet_client = fix_fakeapi.make_client({
+            ('GET', '/oauth2/user-info'): {'id': 'u1', 'name': 'joe'},
+            ('GET', '/users/u1/transmitters'): [],
+            ('GET', '/users/u1/devices'): [{'id': 'd1', 'name': 'dev',
+                'owner': 'u1', 'public': False}],
+            ('GET', '/users/u1/devices/bookmarks'): []}, check=False)
+        c = AsyncClient(token='token', session=FakeAioSession(server),
+            check=False, fleet_client=fleet_client)
+
+        async def main():
+            fleet = await c.fleet_snapshot(channels=False)
+            diff = await c.refresh_fleet(fleet, channels=False)
+            return fleet, diff
+
+        fleet, diff = run(main())
+        assert fleet.user.name == 'joe' and list(fleet.devices) == ['d1']
+        assert not diff.changed_ids() and list(diff.snapshot.devices) == ['d1']
+        fleet_client.api.shutdown()
+
+    def test_user_info(self, fix_fakeapi):
+        "Test hydrating users awaits the user info."
+        from relayr.aio import AsyncClient, AsyncUser
+        from relayr.exceptions import RelayrException
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/oauth2/user-info'): {'id': 'u1', 'name': 'joe',
+                'email': 'joe@example.com'}})
+        c = AsyncClient(token='token', session=FakeAioSession(server), check=False)
+        usr = run(AsyncUser.shared('u1', c).hydrate('always'))
+        assert usr.name == 'joe'
+        assert run(AsyncUser.shared('u2', c).hydrate('never')).id == 'u2'
+        with pytest.raises(RelayrException):
+            run(AsyncUser.shared('u2', c).hydrate())
+        assert server.count('GET', '/oauth2/user-info') == 2
+
+    def test_modifying_methods(self, fix_fakeapi):
+        "Test methods changing resources await their requests."
+        from relayr.aio import AsyncClient, AsyncUser, AsyncApp, AsyncPublisher
+        server = fix_fakeapi.FakeServer({
+            ('POST', '/users/u1/devices/d1/bookmarks'): {},
+            ('DELETE', '/users/u1/devices/d1/bookmarks'): {},
+            ('PATCH', '/publishers/p1'): {'name': 'pub'},
+            ('DELETE', '/publishers/p1'): {},
+            ('DELETE', '/apps/a1'): {}})
+        c = AsyncClient(token='token', session=FakeAioSession(server), check=False)
+        usr = AsyncUser('u1', client=c)
+        pub = AsyncPublisher('p1', client=c)
+        app = AsyncApp('a1', client=c)
+
+        async def main():
+            await usr.bookmark_device(c.get_device('d1'))
+            await usr.delete_device_bookmark(c.get_device('d1'))
+            assert (await pub.update(name='pub')).name == 'pub'
+            assert await pub.delete() is pub
+            assert await app.delete() is app
+
+        run(main())
+        assert [r[:2] for r in server.requests] == [
+            ('POST', '/users/u1/devices/d1/bookmarks'),
+            ('DELETE', '/users/u1/devices/d1/bookmarks'),
+            ('PATCH', '/publishers/p1'), ('DELETE', '/publishers/p1'),
+            ('DELETE', '/apps/a1')]
+
+    def test_history(self, fix_fakeapi):
+        "Test iterating over historical data and refreshing devices."
+        from relayr.aio import AsyncClient
+        points = [{'received': '2015-03-01T00:00:%02d.000Z' % i, 'readings': [
+            {'meaning': 'temperature', 'recorded': '2015-03-01T00:00:%02d.000Z' % i,
+             'value': i}]} for i in range(25)]
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/devices/d1'): {'id': 'd1', 'name': 'a'},
+            ('GET', '/devices/d1/history/list'): history_route(points)})
+        c = AsyncClient(token='token', session=FakeAioSession(server), check=False)
+        dev = c.get_device('d1')
+
+        async def main():
+            await dev.get_info()
+            server.routes[('GET', '/devices/d1')] = {'id': 'd1', 'name': 'b'}
+            changes = await dev.refresh()
+            res = []
+            for workers in (0, 3):
+                res.append([p async for p in dev.iter_data(start=START,
+                    duration='P1D', pagesize=10, workers=workers)])
+            return changes, res
+
+        changes, res = run(main())
+        assert changes == {'name': ('a', 'b')} and dev.name == 'b'
+        assert res == [points, points]
+        assert server.count('GET', '/devices/d1/history/list') == 6
+
+    def test_history_windows(self, fix_fakeapi):
+        "Test historical data of many devices fetched in time windows."
+        from relayr.aio import AsyncClient
+        points = [{'received': '2015-03-01T00:00:%02d.000Z' % i, 'readings': []}
+            for i in range(40)]
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/devices/d1/history/list'): history_route(points[0::2]),
+            ('GET', '/devices/d2/history/list'): history_route(points[1::2])})
+        c = AsyncClient(token='token', session=FakeAioSession(server), check=False)
+
+        async def main():
+            merged = [item async for item in c.api.iter_devices_data(['d1', 'd2'],
+                start=START, end='2015-03-01T00:00:40', max_points=5, pagesize=5)]
+            single = [p async for p in c.get_device('d1').iter_data(start=START,
+                end='2015-03-01T00:00:40', max_points=5, pagesize=5)]
+            return merged, single
+
+        merged, single = run(main())
+        assert [p for d, p in merged] == points
+        assert [d for d, p in merged[:4]] == ['d1', 'd2', 'd1', 'd2']
+        assert single == points[0::2]
+        urls = [r[2] for r in server.requests if r[1].endswith('/history/list')]
+        assert not [u for u in urls if 'page=2' in u]
+
+    def test_history_arrays(self, fix_fakeapi):
+        "Test historical data as NumPy arrays."
+        pytest.importorskip('numpy')
+        from relayr.aio import AsyncClient
+        points = [{'received': '2015-03-01T00:00:00.000Z', 'readings': [
+            {'meaning': 'temperature', 'recorded': '2015-03-01T00:00:00.000Z',
+             'value': 20}]}]
+        server = fix_fakeapi.FakeServer({
+            ('GET', '/devices/d1/history/list'): history_route(points)})
+        c = AsyncClient(token='token', session=FakeAioSession(server), check=False)
+        dev = c.get_device('d1')
+        arrays = run(dev.get_data_arrays(start=START, duration='P1D'))
+        assert arrays['temperature'].values.tolist() == [20]
@@ -57,6 +57,60 @@ class TestDatetimeIntervals(object):
         assert s == '2015-04-01T00:00:00'
         assert e == dtiso1
 
+    def test_split_range(self):
+        "Test splitting datetime intervals into sub-intervals."
+
+        from datetime import datetime
+        from relayr.utils.misc import split_range
+
+        ranges = split_range('2015-03-01T00:00:00Z', '2015-03-04T00:00:00Z', 3)
+        assert ranges == [
+            ('2015-03-01T00:00:00.000Z', '2015-03-02T00:00:00.000Z'),
+            ('2015-03-02T00:00:00.000Z', '2015-03-03T00:00:00.000Z'),
+            ('2015-03-03T00:00:00.000Z', '2015-03-04T00:00:00.000Z')]
+        ranges = split_range(datetime(2015, 3, 1), datetime(2015, 3, 1, 0, 0, 1), 2)
+        assert ranges[0][1] == ranges[1][0] == '2015-03-01T00:00:00.500'
+        assert len(split_range(datetime(2015, 3, 1, 0, 0, 0, 0),
+            datetime(2015, 3, 1, 0, 0, 0, 2000), 5)) == 2
+
+    def test_timestamps(self):
+        "Test the fast path and the fallback of timestamp parsing."
+
+        import isodate
+        from relayr.utils.timestamps import parse_datetime, to_epoch_ms
+        from relayr.utils.timestamps import to_epoch_ms_array
+
+        stamps = ['2015-03-06T10:49:11.998Z', '2015-03-06T10:49:11Z',
+            '2015-03-06T10:49:11', '2015-03-06T11:49:11.998+01:00',
+            '1969-12-31T23:59:59.999Z', '2000-02-29T23:00:00.000Z',
+            '2015-03-06T10:49:11.998Zjunk'[:24]]
+        for s in stamps:
+            assert parse_datetime(s) == isodate.parse_datetime(s)
+        assert to_epoch_ms(stamps[0]) == 1425638951998
+        assert to_epoch_ms(stamps[1]) == to_epoch_ms(stamps[2]) == 1425638951000
+        assert to_epoch_ms(stamps[3]) == 1425638951998
+        assert to_epoch_ms(stamps[4]) == -1
+        assert to_epoch_ms(stamps[5]) == 951865200000
+        assert list(to_epoch_ms_array(stamps)) == [to_epoch_ms(s) for s in stamps]
+        assert list(to_epoch_ms_array([])) == []
+        res = list(to_epoch_ms_array([stamps[0], None, stamps[3]]))
+        assert res[0] == res[2] == 1425638951998 and res[1] in (None, -2 ** 63)
+        with pytest.raises(ValueError):
+            to_epoch_ms_array(['2015-13-06T10:49:11.998Z'])
+        for s in ['2015-02-30T10:49:11.998Z', '2015-04-31T10:49:11.998Z',
+                  '2015-02-29T10:49:11.998Z', '1900-02-29T10:49:11.998Z']:
+            with pytest.raises(ValueError):
+                parse_datetime(s)
+            with pytest.raises(ValueError):
+                to_epoch_ms(s)
+            with pytest.raises(ValueError):
+                to_epoch_ms_array([stamps[0], s])
+        leap = ['2000-02-29T10:49:11.998Z', '2016-02-29T10:49:11.998Z',
+            '2015-01-31T10:49:11.998Z', '2015-12-31T10:49:11.998Z']
+        assert list(to_epoch_ms_array(leap)) == [to_epoch_ms(s) for s in leap]
+        assert [parse_datetime(s) for s in leap] == \
+            [isodate.parse_datetime(s) for s in leap]
+
 
 class TestInstallation(object):
     "Test installation aspects."
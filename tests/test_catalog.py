@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of the local device catalogue in ``relayr.catalog``.
+
+They need no network access.
+"""
+
+
+def make_devices():
+    from relayr.resources import Device
+    temp = {'id': 'm1', 'readings': [{'meaning': 'temperature'},
+        {'meaning': 'humidity'}]}
+    light = {'id': 'm2', 'readings': [{'meaning': 'luminosity'}]}
+    payloads = [
+        {'id': 'd1', 'name': 'Kitchen', 'owner': 'u1', 'public': True, 'model': temp},
+        {'id': 'd2', 'name': 'kitchen light', 'owner': 'u1', 'public': False, 'model': light},
+        {'id': 'd3', 'name': 'Garden', 'owner': 'u2', 'public': True, 'model': temp},
+        {'id': 'd4', 'name': 'Garage', 'owner': 'u2', 'public': True, 'model': 'm3'},
+    ]
+    return [Device.from_payload(p, None, 'never') for p in payloads]
+
+
+class TestDeviceCatalog(object):
+    "Test local queries on a device catalogue."
+
+    def test_query(self):
+        "Test queries combining several indexes."
+        from relayr.catalog import DeviceCatalog
+        catalog = DeviceCatalog(make_devices())
+        ids = lambda devs: [d.id for d in devs]
+        assert len(catalog) == 4
+        assert ids(catalog.query()) == ['d4', 'd3', 'd1', 'd2']
+        assert ids(catalog.query(meaning='humidity', public=True)) == ['d3', 'd1']
+        assert ids(catalog.query(meaning='humidity', model='m1', owner='u1')) == ['d1']
+        assert ids(catalog.query(model='m3')) == ['d4']
+        assert ids(catalog.query(name_prefix='kitchen')) == ['d1', 'd2']
+        assert ids(catalog.query(name_prefix='Ga', public=True)) == ['d4', 'd3']
+        assert ids(catalog.query(meaning='pressure')) == []
+        assert sorted(catalog.values('meaning')) == ['humidity', 'luminosity', 'temperature']
+
+    def test_transmitters(self):
+        "Test the transmitter index."
+        from relayr.catalog import DeviceCatalog
+        catalog = DeviceCatalog(make_devices())
+        catalog.set_transmitter_devices('t1', ['d1', 'd2', 'd9'])
+        assert [d.id for d in catalog.query(transmitter='t1')] == ['d1', 'd2']
+        catalog.set_transmitter_devices('t1', ['d2'])
+        assert [d.id for d in catalog.query(transmitter='t1')] == ['d2']
+
+    def test_incremental_update(self):
+        "Test reindexing changed devices and pruning removed ones."
+        from relayr.catalog import DeviceCatalog
+        devs = make_devices()
+        catalog = DeviceCatalog(devs)
+        devs[0].name = 'Cellar'
+        devs[0].public = False
+        added, removed = catalog.update(devs[:3], prune=True)
+        assert added == set() and removed == set(['d4'])
+        assert 'd4' not in catalog
+        assert [d.id for d in catalog.query(public=True)] == ['d3']
+        assert [d.id for d in catalog.query(name_prefix='cel')] == ['d1']
+        assert catalog.query(name_prefix='kitchen')[0].id == 'd2'
+
+    def test_many_devices(self):
+        "Test updates and queries keep the name order with many devices."
+        from relayr.catalog import DeviceCatalog
+        from relayr.resources import Device
+        model = {'id': 'm1', 'readings': [{'meaning': 'noise'}]}
+        devs = [Device.from_payload({'id': 'd%d' % i, 'name': 'dev %d' % (i * 7 % 100),
+            'public': i % 2 == 0, 'model': model}, None, 'never') for i in range(100)]
+        catalog = DeviceCatalog(devs)
+        by_name = lambda devs: sorted(devs, key=lambda d: (d.name.lower(), d.id))
+        assert catalog.update(devs, prune=True) == (set(), set())
+        assert catalog.query() == by_name(devs)
+        for dev in devs[:30]:
+            dev.name = 'renamed %d' % int(dev.id[1:])
+        catalog.update(devs)
+        assert catalog.query() == by_name(devs)
+        devs[50].name = 'a'
+        catalog.update(devs[1:], prune=True)
+        assert catalog.query() == by_name(devs[1:])
+        assert catalog.query(public=True) == by_name(devs[2::2])
+        assert catalog.query(public=True, name_prefix='dev 1') == \
+            by_name(d for d in devs[2::2] if d.name.startswith('dev 1'))
+        assert catalog.query(name_prefix='a') == [devs[50]]
+        devs[60].name = 'b'
+        catalog.add(devs[60])
+        catalog.remove('d70')
+        rest = [d for d in devs[1:] if d.id != 'd70']
+        assert catalog.query() == by_name(rest)
+
+    def test_from_fleet(self, fix_fakeapi):
+        "Test building a catalogue from a fleet snapshot."
+        from relayr.catalog import DeviceCatalog
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/oauth2/user-info'): {'id': 'u1'},
+            ('GET', '/users/u1/transmitters'): [{'id': 't1'}],
+            ('GET', '/users/u1/devices'): [{'id': 'd1', 'name': 'a',
+                'model': {'id': 'm1', 'name': 'M', 'manufacturer': 'x',
+                    'readings': [{'meaning': 'noise'}]}}],
+            ('GET', '/users/u1/devices/bookmarks'): [],
+            ('GET', '/transmitters/t1/devices'): [{'id': 'd1'}]}, check=False)
+        catalog = DeviceCatalog.from_fleet(c.fleet_snapshot(channels=False))
+        assert [d.id for d in catalog.query(meaning='noise', transmitter='t1')] == ['d1']
+        c.api.shutdown()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of fleet snapshots in ``relayr.fleet``.
+
+They run against a fake API backend provided by the fixture file
+``fixture_fakeapi.py`` and need no network access.
+"""
+
+import pytest
+
+
+TEMP = {'id': 'm1', 'name': 'Thermometer', 'manufacturer': 'relayr',
+    'readings': [{'meaning': 'temperature'}, {'meaning': 'humidity'}]}
+LIGHT = {'id': 'm2', 'name': 'Light', 'manufacturer': 'relayr',
+    'readings': [{'meaning': 'luminosity'}]}
+
+
+def fleet_routes():
+    devices = [{'id': 'd%d' % i, 'name': 'dev %d' % i, 'model': 'm1'}
+        for i in range(4)]
+    devices.append({'id': 'd4', 'name': 'dev 4', 'model': LIGHT})
+    routes = {
+        ('GET', '/oauth2/user-info'): {'id': 'u1', 'name': 'joe', 'email': 'j@x'},
+        ('GET', '/users/u1/transmitters'): [{'id': 't1', 'name': 'master'}],
+        ('GET', '/users/u1/devices'): devices,
+        ('GET', '/users/u1/devices/bookmarks'): [{'id': 'd1', 'name': 'dev 1'}],
+        ('GET', '/transmitters/t1/devices'): [{'id': 'd0'}, {'id': 'd1'},
+            {'id': 'd9', 'name': 'foreign', 'model': 'm3'}],
+        ('GET', '/device-models/m1'): TEMP,
+        ('GET', '/device-models/m3'): dict(LIGHT, id='m3'),
+    }
+    for i in list(range(5)) + [9]:
+        routes[('GET', '/devices/d%d/channels' % i)] = {'deviceId': 'd%d' % i,
+            'channels': [{'channelId': 'c%d' % i, 'transport': 'mqtt'}]}
+    return routes
+
+
+class TestFleetSnapshot(object):
+    "Test loading all resources of a user at once."
+
+    def test_snapshot(self, fix_fakeapi):
+        "Test the snapshot contents and indexes."
+        server, c = fix_fakeapi.make_client(fleet_routes(), check=False)
+        fleet = c.fleet_snapshot()
+        assert fleet.user.name == 'joe'
+        assert sorted(fleet.devices) == ['d0', 'd1', 'd2', 'd3', 'd4', 'd9']
+        assert sorted(fleet.models) == ['m1', 'm2', 'm3']
+        assert [d.id for d in fleet.devices_of_transmitter('t1')] == ['d0', 'd1', 'd9']
+        assert [t.id for t in fleet.transmitters_of_device('d9')] == ['t1']
+        assert sorted(d.id for d in fleet.devices_with_meaning('humidity')) == \
+            ['d0', 'd1', 'd2', 'd3']
+        assert sorted(d.id for d in fleet.devices_with_meaning('luminosity')) == \
+            ['d4', 'd9']
+        assert [d.id for d in fleet.devices_of_model('m2')] == ['d4']
+        assert [d.id for d in fleet.bookmarked_devices()] == ['d1']
+        assert fleet.channels['d9'][0]['channelId'] == 'c9'
+        assert fleet.devices['d0'].model is fleet.devices['d1'].model
+
+    def test_requests(self, fix_fakeapi):
+        "Test shared models are fetched once and requests are counted."
+        server, c = fix_fakeapi.make_client(fleet_routes(), check=False)
+        fleet = c.fleet_snapshot()
+        assert server.count('GET', '/device-models/m1') == 1
+        assert server.count('GET', '/device-models/m2') == 0
+        # user, 3 lists, 1 transmitter, 2 models, 6 channels
+        assert fleet.requests == len(server.requests) == 13
+        fleet = c.fleet_snapshot(channels=False)
+        assert fleet.channels == {}
+        assert fleet.requests == 5
+        c.api.shutdown()
+
+    def test_immutable(self, fix_fakeapi):
+        "Test the snapshot cannot be modified."
+        import sys
+        server, c = fix_fakeapi.make_client(fleet_routes(), check=False)
+        fleet = c.fleet_snapshot(channels=False)
+        with pytest.raises(AttributeError):
+            fleet.user = None
+        if sys.version_info[0] > 2:
+            with pytest.raises(TypeError):
+                fleet.devices['x'] = None
+
+    def test_detached(self, fix_fakeapi):
+        "Test the snapshot holds copies which are not loaded on access."
+        server, c = fix_fakeapi.make_client(fleet_routes(), check=False)
+        fleet = c.fleet_snapshot(channels=False)
+        dev = fleet.devices['d0']
+        shared = c.get_device('d0')
+        assert dev is not shared
+        shared.name = 'changed'
+        assert dev.name == 'dev 0'
+        assert dev.model is fleet.models['m1']
+        count = len(server.requests)
+        with pytest.raises(AttributeError):
+            dev.description
+        assert len(server.requests) == count
+
+    def test_requests_other_threads(self, fix_fakeapi):
+        "Test requests sent meanwhile by other code are not counted."
+        routes = fleet_routes()
+        info = routes[('GET', '/oauth2/user-info')]
+
+        def user_info(method, url, **kwargs):
+            for i in range(10):
+                c.api.retry_stats.record_request()
+            return info
+
+        routes[('GET', '/oauth2/user-info')] = user_info
+        server, c = fix_fakeapi.make_client(routes, check=False)
+        fleet = c.fleet_snapshot(channels=False)
+        # user, 3 lists, 1 transmitter, 2 models
+        assert fleet.requests == len(server.requests) == 7
+
+
+class TestFleetRefresh(object):
+    "Test refreshing a fleet snapshot incrementally."
+
+    def test_unchanged(self, fix_fakeapi):
+        "Test refreshing an unchanged fleet fetches only the lists."
+        server, c = fix_fakeapi.make_client(fleet_routes(), check=False)
+        fleet = c.fleet_snapshot()
+        diff = c.refresh_fleet(fleet)
+        assert not diff
+        assert diff.changed_ids() == frozenset()
+        # 3 lists, 1 transmitter
+        assert diff.requests == 4
+        assert sorted(diff.snapshot.devices) == sorted(fleet.devices)
+        assert diff.snapshot.channels == fleet.channels
+        assert diff.snapshot.by_meaning == fleet.by_meaning
+
+    def test_changes(self, fix_fakeapi):
+        "Test added, removed and changed devices and model changes."
+        server, c = fix_fakeapi.make_client(fleet_routes(), check=False)
+        fleet = c.fleet_snapshot()
+        devices = server.routes[('GET', '/users/u1/devices')]
+        devices = [d for d in devices if d['id'] != 'd4']
+        devices[2] = {'id': 'd2', 'name': 'renamed', 'model': 'm1'}
+        devices[3] = {'id': 'd3', 'name': 'dev 3', 'model': LIGHT}
+        devices.append({'id': 'd5', 'name': 'dev 5', 'model': 'm1'})
+        server.routes[('GET', '/users/u1/devices')] = devices
+        server.routes[('GET', '/devices/d2')] = dict(devices[2], public=True)
+        server.routes[('GET', '/devices/d3')] = devices[3]
+        server.routes[('GET', '/devices/d5/channels')] = {'channels': []}
+        diff = c.refresh_fleet(fleet)
+        assert diff.added == frozenset(['d5'])
+        assert diff.removed == frozenset(['d4'])
+        assert diff.changed['d2'] == {'name': ('dev 2', 'renamed'),
+            'public': (None, True)}
+        assert diff.changed['d3'] == {'model': ('m1', 'm2')}
+        assert dict(diff.models) == {'d3': ('m1', 'm2')}
+        assert diff.changed_ids() == frozenset(['d2', 'd3', 'd5'])
+        # 3 lists, 1 transmitter, 2 devices, 3 channels
+        assert diff.requests == 9
+        assert server.count('GET', '/devices/d0') == 0
+        assert server.count('GET', '/device-models/m1') == 1
+        snap = diff.snapshot
+        assert 'd4' not in snap.devices
+        assert snap.devices['d2'].name == 'renamed'
+        assert sorted(d.id for d in snap.devices_of_model('m2')) == ['d3']
+        assert snap.channels['d0'] == fleet.channels['d0']
+        assert snap.channels['d5'] == ()
+
+    def test_old_snapshot_unchanged(self, fix_fakeapi):
+        "Test refreshing leaves the devices of the old snapshot unchanged."
+        server, c = fix_fakeapi.make_client(fleet_routes(), check=False)
+        fleet = c.fleet_snapshot(channels=False)
+        devices = server.routes[('GET', '/users/u1/devices')]
+        devices[0] = {'id': 'd0', 'name': 'renamed', 'model': LIGHT}
+        server.routes[('GET', '/devices/d0')] = dict(devices[0], public=True)
+        diff = c.refresh_fleet(fleet, channels=False)
+        assert diff.changed_ids() == frozenset(['d0'])
+        old, new = fleet.devices['d0'], diff.snapshot.devices['d0']
+        assert old is not new
+        assert (old.name, old.model.id, old._peek('public')) == ('dev 0', 'm1', None)
+        assert (new.name, new.model.id, new.public) == ('renamed', 'm2', True)
+        assert fleet.devices_of_model('m1')[0] is old
+        assert diff.snapshot.devices['d1'] is not fleet.devices['d1']
+
+    def test_device_refresh(self, fix_fakeapi):
+        "Test refreshing a single device."
+        routes = {('GET', '/devices/d1'): {'id': 'd1', 'name': 'a', 'model': 'm1'}}
+        server, c = fix_fakeapi.make_client(routes, check=False)
+        dev = c.get_device('d1').get_info()
+        assert dev.refresh() == {}
+        server.routes[('GET', '/devices/d1')] = {'id': 'd1', 'name': 'b',
+            'model': {'id': 'm2'}}
+        assert dev.refresh() == {'name': ('a', 'b'), 'model': ('m1', 'm2')}
+        assert dev.model.id == 'm2'
+        assert server.count('GET', '/devices/d1') == 3
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of accessing historical device data.
+
+They run against a fake API backend provided by the fixture file
+``fixture_fakeapi.py`` and need no network access.
+"""
+
+import pytest
+
+
+START = '2015-03-01T00:00:00'
+END = '2015-04-01T00:00:00'
+
+
+def make_points(count):
+    "Return ``count`` data points, one per second from March 1st, 2015."
+
+    points = []
+    for i in range(count):
+        stamp = '2015-03-01T%02d:%02d:%02d.000Z' % (i // 3600, i // 60 % 60, i % 60)
+        points.append({'received': stamp, 'readings': [
+            {'meaning': 'temperature', 'recorded': stamp, 'value': 20 + i % 10}]})
+    return points
+
+
+def normalize(stamp):
+    "Return a UTC timestamp string with milliseconds and without zone."
+
+    stamp = stamp.rstrip('Z')
+    if len(stamp) == 19:
+        stamp += '.000'
+    return stamp
+
+
+def history_route(points, delay=0):
+    "Return a route serving history pages of data points like the API."
+
+    from relayr.compat import PY2
+    if PY2:
+        from urlparse import urlsplit, parse_qs
+    else:
+        from urllib.parse import urlsplit, parse_qs
+    def route(method, url, **kwargs):
+        import time
+        time.sleep(delay)
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        page = int(query['page'][0])
+        size = int((query.get('pagesize') or query.get('pageSize'))[0])
+        start, end = normalize(query['start'][0]), normalize(query['end'][0])
+        selected = [p for p in points if start <= normalize(p['received']) <= end]
+        results = selected[(page - 1) * size:page * size]
+        links = {'self': {'href': '%s?%s' % (parts.path, parts.query)}}
+        if page * size < len(selected):
+            links['next'] = {'href': '%s?page=%d&pageSize=%d&start=%s&end=%s' % (
+                parts.path, page + 1, size, query['start'][0], query['end'][0])}
+        return {'start': query['start'][0], 'end': query['end'][0],
+            'pageSize': size, 'page': page, 'totalResults': len(selected),
+            'results': results, '_links': links}
+    return route
+
+
+class TestHistoryIterator(object):
+    "Test iterating over all pages of historical data."
+
+    def test_iter_data(self, fix_fakeapi):
+        "Test all data points are returned in order."
+        points = make_points(25)
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/d1/history/list'): history_route(points)},
+            check=False)
+        dev = c.get_device('d1')
+        assert list(dev.iter_data(start=START, end=END, pagesize=10)) == points
+        assert server.count('GET', '/devices/d1/history/list') == 3
+        c.api.shutdown()
+
+    def test_empty(self, fix_fakeapi):
+        "Test an interval without data."
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/devices/d1/history/list'): history_route([])}, check=False)
+        assert list(api.iter_device_data('d1', start=START, end=END)) == []
+        assert server.count('GET', '/devices/d1/history/list') == 1
+
+    def test_lazy(self, fix_fakeapi):
+        "Test nothing is requested before the first data point."
+        from relayr.exceptions import RelayrApiException
+        server, api = fix_fakeapi.make_api(check=False)
+        it = api.iter_device_data('d1', start=START, end=END)
+        assert len(server.requests) == 0
+        with pytest.raises(RelayrApiException):
+            next(it)
+
+    def test_prefetch(self, fix_fakeapi):
+        "Test the next page is requested before the current one is consumed."
+        points = make_points(30)
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/devices/d1/history/list'): history_route(points)},
+            check=False)
+        it = api.iter_device_data('d1', start=START, end=END, pagesize=10)
+        assert next(it) == points[0]
+        api.executor.shutdown(wait=True)
+        assert server.count('GET', '/devices/d1/history/list') == 2
+        it.close()
+
+
+class TestParallelHistory(object):
+    "Test fetching the pages of historical data concurrently."
+
+    def test_parallel(self, fix_fakeapi):
+        "Test all pages are fetched concurrently and returned in order."
+        import time
+        points = make_points(95)
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/d1/history/list'): history_route(points, 0.05)},
+            check=False)
+        t0 = time.time()
+        res = list(c.get_device('d1').iter_data(start=START, end=END,
+            pagesize=10, workers=10))
+        assert res == points
+        assert server.count('GET', '/devices/d1/history/list') == 10
+        # one page, then nine at once
+        assert time.time() - t0 < 0.3
+        c.api.shutdown()
+
+    def test_shifted(self, fix_fakeapi):
+        "Test points shifted by new data are returned once."
+        points = make_points(30)
+        route = history_route(points)
+        calls = []
+        def shifting(method, url, **kwargs):
+            res = route(method, url, **kwargs)
+            calls.append(url)
+            if len(calls) == 1:
+                # newest first, a new point arrives after the first page
+                points.insert(0, {'received': '2015-03-02T00:00:00.000Z', 'readings': []})
+            return res
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/devices/d1/history/list'): shifting}, check=False)
+        expected = points[:]
+        res = list(api.iter_device_data('d1', start=START, end=END,
+            pagesize=10, workers=2))
+        # the new point came too late, the last one is shifted to a 4th page
+        assert res == expected
+        assert server.count('GET', '/devices/d1/history/list') == 4
+        api.shutdown()
+
+    def test_identical_points(self, fix_fakeapi):
+        "Test identical data points within and across pages are all kept."
+        import copy
+        points = make_points(20)
+        # the same reading twice in one page and at the end of the first page
+        points[3] = copy.deepcopy(points[2])
+        points[10] = copy.deepcopy(points[9])
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/devices/d1/history/list'): history_route(points)},
+            check=False)
+        res = list(api.iter_device_data('d1', start=START, end=END,
+            pagesize=10, workers=2))
+        assert res == points
+        res = list(api.iter_devices_data(['d1'], start=START, end=END,
+            max_points=8, pagesize=5))
+        assert [p for d, p in res] == points
+        api.shutdown()
+
+
+class TestShardedHistory(object):
+    "Test fetching historical data in time windows."
+
+    def test_windows(self, fix_fakeapi):
+        "Test dense intervals are split and merged in order."
+        points = make_points(100)
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/d1/history/list'): history_route(points)},
+            check=False)
+        res = list(c.get_device('d1').iter_data(start='2015-03-01T00:00:00Z',
+            end='2015-03-01T00:01:40Z', pagesize=10, max_points=30))
+        assert res == points
+        urls = [r[2] for r in server.requests if r[1].endswith('/history/list')]
+        # no window is deeper than 3 pages
+        assert not [u for u in urls if 'page=4' in u]
+        c.api.shutdown()
+
+    def test_many_devices(self, fix_fakeapi):
+        "Test the data of many devices is merged by time."
+        points = make_points(60)
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/devices/d1/history/list'): history_route(points[0::2]),
+            ('GET', '/devices/d2/history/list'): history_route(points[1::2])},
+            check=False)
+        res = list(api.iter_devices_data(['d1', 'd2'], start=START, end=END,
+            max_points=10, pagesize=5))
+        assert [p for d, p in res] == points
+        assert [d for d, p in res[:4]] == ['d1', 'd2', 'd1', 'd2']
+        api.shutdown()
+
+    def test_unordered_pages(self, fix_fakeapi):
+        "Test descending pages and points without timestamps are merged."
+        points = make_points(30)
+        missing = {'received': None, 'readings': []}
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/devices/d1/history/list'): history_route(points[0::2][::-1]),
+            ('GET', '/devices/d2/history/list'): {'pageSize': 10, 'page': 1,
+                'totalResults': 3, 'results': [points[5], missing, points[1]]}},
+            check=False)
+        res = list(api.iter_devices_data(['d1', 'd2'], start=START, end=END,
+            max_points=5, pagesize=5))
+        expected = sorted(points[0::2] + [points[1], points[5]],
+            key=lambda p: p['received'])
+        assert [p for d, p in res] == expected + [missing]
+        api.shutdown()
+
+
+class TestReadingArrays(object):
+    "Test converting historical data into NumPy arrays."
+
+    def test_arrays(self, fix_fakeapi):
+        "Test scalar and vector readings per meaning."
+        numpy = pytest.importorskip('numpy')
+        points = make_points(25)
+        for i, p in enumerate(points):
+            p['readings'].append({'meaning': 'acceleration',
+                'recorded': p['received'], 'value': {'x': i, 'y': 0.5, 'z': -1}})
+        points[3]['readings'][1]['value'] = None
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/d1'): {'id': 'd1', 'model': 'm1'},
+            ('GET', '/device-models/m1'): {'id': 'm1', 'readings': [
+                {'meaning': 'temperature', 'unit': 'celsius'}]},
+            ('GET', '/devices/d1/history/list'): history_route(points)},
+            check=False)
+        dev = c.get_device('d1')
+        dev.model.get_info()
+        arrays = dev.get_data_arrays(start=START, end=END, pagesize=10)
+        temp = arrays['temperature']
+        assert len(temp) == 25 and temp.unit == 'celsius'
+        assert temp.recorded.dtype == numpy.dtype('datetime64[ms]')
+        assert str(temp.recorded[11]) == '2015-03-01T00:00:11.000'
+        assert temp.values.dtype == numpy.float64
+        assert temp.values.tolist()[:3] == [20, 21, 22]
+        acc = arrays['acceleration']
+        assert acc.values.dtype.names == ('x', 'y', 'z')
+        assert acc.values['x'][24] == 24
+        assert numpy.isnan(acc.values['x'][3])
+        assert acc.unit is None
+        c.api.shutdown()
+
+    def test_missing_timestamps(self):
+        "Test readings without timestamps are kept with NaT."
+        numpy = pytest.importorskip('numpy')
+        from relayr.history import readings_to_arrays
+        stamp = '2015-03-01T00:00:00.000Z'
+        points = [{'received': stamp, 'readings': [{'meaning': 'temperature',
+            'recorded': stamp, 'value': 20}]},
+            {'received': None, 'readings': [{'meaning': 'temperature',
+            'value': None}]},
+            {'readings': [{'meaning': 'temperature', 'value': 22}]}]
+        temp = readings_to_arrays(points)['temperature']
+        assert str(temp.recorded[0]) == '2015-03-01T00:00:00.000'
+        assert numpy.isnat(temp.recorded[1:]).all()
+        assert numpy.isnan(temp.values[1]) and temp.values[2] == 22
+
+    def test_non_numeric(self):
+        "Test non-numeric values are kept as objects."
+        pytest.importorskip('numpy')
+        from relayr.history import readings_to_arrays
+        points = [{'received': '2015-03-01T00:00:00.000Z', 'readings': [
+            {'meaning': 'color', 'recorded': '2015-03-01T00:00:00.000Z',
+             'value': 'red'}]}]
+        arrays = readings_to_arrays(points)
+        assert arrays['color'].values.tolist() == ['red']
+
+    def test_mixed_values(self):
+        "Test values changing between vectors and scalars become objects."
+        pytest.importorskip('numpy')
+        from relayr.history import readings_to_arrays
+        stamp = '2015-03-01T00:00:00.000Z'
+        values = [{'x': 1, 'y': 2}, {'x': 3, 'y': 4}, 5.0, {'x': 'a', 'y': 6},
+            None, {'x': 7, 'y': 8}, 'red']
+        points = [{'received': stamp, 'readings': [{'meaning': 'm',
+            'recorded': stamp, 'value': v}]} for v in values]
+        for chunksize in (1, 2, 3, len(values)):
+            arrays = readings_to_arrays(points, chunksize=chunksize)
+            res = arrays['m'].values
+            assert len(res) == len(values) and res.dtype == object
+            assert res[1] == {'x': 3, 'y': 4}
+            assert res[2] == 5.0 and res[3] == {'x': 'a', 'y': 6}
+            assert res[6] == 'red'
+        arrays = readings_to_arrays(points[:2] + points[5:6], chunksize=1)
+        assert arrays['m'].values['y'].tolist() == [2, 4, 8]
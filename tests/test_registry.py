@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of the device model registry in ``relayr.registry``.
+
+They run against a fake API backend provided by the fixture file
+``fixture_fakeapi.py`` and need no network access.
+"""
+
+import pytest
+
+
+TEMP = {'id': 'm1', 'name': 'Thermometer', 'manufacturer': 'relayr',
+    'readings': [{'meaning': 'temperature', 'unit': 'celsius'}]}
+LIGHT = {'id': 'm2', 'name': 'Light', 'manufacturer': 'relayr',
+    'readings': [{'meaning': 'luminosity', 'unit': 'lux'}]}
+
+
+def registry_routes():
+    return {
+        ('GET', '/device-models'): [TEMP, LIGHT],
+        ('GET', '/device-models/m1'): TEMP,
+        ('GET', '/device-models/meanings'): [{'key': 'temperature',
+            'value': 'temperature'}],
+        ('GET', '/devices/d1'): {'id': 'd1', 'name': 'dev', 'model': 'm1'},
+        ('GET', '/devices/d2'): {'id': 'd2', 'name': 'dev', 'model': 'm1'},
+    }
+
+
+class TestModelRegistry(object):
+    "Test the process-wide registry of device models and meanings."
+
+    def test_prewarm(self, fix_fakeapi):
+        "Test prewarming once for all clients of a process."
+        from relayr.client import Client
+        from relayr.sessions import SessionPool
+        server, c = fix_fakeapi.make_client(registry_routes(), prewarm=True)
+        pool = SessionPool(factory=server.session)
+        c2 = Client(token='token', session_pool=pool, prewarm=True)
+        assert c2.models is c.models
+        assert len(c.models) == 2
+        assert server.count('GET', '/device-models') == 1
+        dev = c2.get_device('d1').get_info()
+        assert dev.model.readings[0]['unit'] == 'celsius'
+        assert server.count('GET', '/device-models/m1') == 0
+        assert c.models.reading('m2', 'luminosity')['unit'] == 'lux'
+        assert c.models.readings('m3') == {}
+
+    def test_load_once(self, fix_fakeapi):
+        "Test models are fetched once for all devices and clients."
+        from relayr.client import Client
+        from relayr.sessions import SessionPool
+        server, c = fix_fakeapi.make_client(registry_routes())
+        assert c.get_device('d1').get_info().model.name == 'Thermometer'
+        c2 = Client(token='token', session_pool=SessionPool(factory=server.session))
+        assert c2.get_device('d2').get_info().model.name == 'Thermometer'
+        assert server.count('GET', '/device-models/m1') == 1
+
+    def test_tokens(self, fix_fakeapi):
+        "Test models fetched with one token are not served for other tokens."
+        from relayr.client import Client
+        from relayr.sessions import SessionPool
+        server, c = fix_fakeapi.make_client(registry_routes())
+        assert c.get_device('d1').get_info().model.name == 'Thermometer'
+        assert 'm1' not in c.models
+        assert c.models.get('m1', 'token') == TEMP
+        c2 = Client(token='other', session_pool=SessionPool(factory=server.session))
+        assert c2.models.get('m1', 'other') is None
+        assert c2.models.reading('m1', 'temperature', 'other') is None
+        assert c2.get_device('d2').get_info().model.name == 'Thermometer'
+        assert server.count('GET', '/device-models/m1') == 2
+        # public models are served for all tokens
+        list(c2.get_public_device_models())
+        assert c.models.get('m2', 'third') == LIGHT
+
+    def test_concurrent_load(self):
+        "Test concurrent loads of one model call the loader once."
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from relayr.registry import ModelRegistry
+        reg = ModelRegistry()
+        calls = []
+        def func():
+            calls.append(1)
+            time.sleep(0.05)
+            return TEMP
+        with ThreadPoolExecutor(8) as executor:
+            res = list(executor.map(lambda i: reg.load('m1', func), range(8)))
+        assert res == [TEMP] * 8
+        assert len(calls) == 1
+
+    def test_meanings(self, fix_fakeapi):
+        "Test the meanings are fetched once."
+        server, c = fix_fakeapi.make_client(registry_routes())
+        assert list(c.get_public_device_model_meanings())[0]['key'] == 'temperature'
+        assert list(c.get_public_device_model_meanings())[0]['key'] == 'temperature'
+        assert server.count('GET', '/device-models/meanings') == 1
+
+    def test_expiry(self):
+        "Test expired models are not served."
+        import time
+        from relayr.registry import ModelRegistry
+        reg = ModelRegistry(ttl=0.05)
+        reg.put(TEMP)
+        assert 'm1' in reg
+        time.sleep(0.1)
+        assert reg.get('m1') is None
+        assert ModelRegistry(ttl=None).load('m1', lambda: TEMP) is TEMP
+
+    def test_disabled(self, fix_fakeapi):
+        "Test clients without a registry."
+        server, c = fix_fakeapi.make_client(registry_routes(), models=False)
+        assert c.models is None
+        c.get_device('d1').get_info().model.name
+        list(c.get_public_device_model_meanings())
+        list(c.get_public_device_model_meanings())
+        assert server.count('GET', '/device-models/m1') == 1
+        assert server.count('GET', '/device-models/meanings') == 2
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of the resource classes in ``relayr.resources``.
+
+They run against a fake API backend provided by the fixture file
+``fixture_fakeapi.py`` and need no network access.
+"""
+
+import pytest
+
+
+MODEL = {'id': 'm1', 'name': 'Thermometer', 'manufacturer': 'relayr',
+    'readings': [{'meaning': 'temperature', 'unit': 'celsius'}]}
+
+
+def device_payload(id, **kwargs):
+    payload = {'id': id, 'name': 'dev-%s' % id, 'owner': 'u1',
+        'model': MODEL, 'public': True}
+    payload.update(kwargs)
+    return payload
+
+
+class TestHydrate(object):
+    "Test building resources from list payloads."
+
+    def test_full_list_payload(self, fix_fakeapi):
+        "Test complete list payloads cost no further requests."
+        from relayr.resources import User, DeviceModel
+        devices = [device_payload(str(i)) for i in range(5)]
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/users/u1/devices'): devices}, check=False)
+        devs = list(User('u1', client=c).get_devices())
+        assert [d.name for d in devs] == ['dev-%d' % i for i in range(5)]
+        assert isinstance(devs[0].model, DeviceModel)
+        assert devs[0].model.readings[0]['meaning'] == 'temperature'
+        assert len(server.requests) == 1
+
+    def test_missing_fields(self, fix_fakeapi):
+        "Test details are fetched only for resources with missing fields."
+        from relayr.resources import User
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/users/u1/devices'): [device_payload('1'), {'id': '2'}],
+            ('GET', '/devices/2'): device_payload('2', model={'id': 'm2'}),
+            ('GET', '/device-models/m2'): dict(MODEL, id='m2')}, check=False)
+        devs = list(User('u1', client=c).get_devices())
+        assert devs[1].name == 'dev-2'
+        assert devs[1].model.name == 'Thermometer'
+        assert server.count('GET', '/devices/1') == 0
+        assert server.count('GET', '/devices/2') == 1
+        assert server.count('GET', '/device-models/m1') == 0
+        assert server.count('GET', '/device-models/m2') == 1
+
+    def test_policies(self, fix_fakeapi):
+        "Test the 'never' and 'always' hydrate policies."
+        from relayr.resources import Transmitter
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/transmitters/t1/devices'): [{'id': '1'}],
+            ('GET', '/devices/1'): device_payload('1'),
+            ('GET', '/device-models/m1'): MODEL}, check=False)
+        t = Transmitter('t1', client=c)
+        dev = list(t.get_connected_devices(hydrate='never'))[0]
+        assert dev.missing_fields() == ['name', 'owner', 'model', 'public']
+        assert server.count('GET', '/devices/1') == 0
+        dev = list(t.get_connected_devices(hydrate='always'))[0]
+        assert dev.name == 'dev-1'
+        assert server.count('GET', '/devices/1') == 1
+        assert server.count('GET', '/device-models/m1') == 0
+        with pytest.raises(ValueError):
+            list(t.get_connected_devices(hydrate='sometimes'))
+
+    def test_public_devices(self, fix_fakeapi):
+        "Test public devices are built from the streamed list."
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/public'): [device_payload(str(i)) for i in range(3)]},
+            check=False)
+        devs = list(c.get_public_devices())
+        assert [d.id for d in devs] == ['0', '1', '2']
+        assert len(server.requests) == 1
+
+    def test_connected_apps(self, fix_fakeapi):
+        "Test apps are built from the list payload."
+        from relayr.resources import Device
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/d1/apps'): [
+                {'id': 'a1', 'name': 'app', 'description': 'An app'}]},
+            check=False)
+        apps = list(Device('d1', client=c).get_connected_apps())
+        assert apps[0].description == 'An app'
+        assert len(server.requests) == 1
+
+    def test_delete_app(self, fix_fakeapi):
+        "Test deleting an app calls the app endpoint, not the publisher one."
+        from relayr.resources import App
+        server, c = fix_fakeapi.make_client({
+            ('DELETE', '/apps/a1'): {}}, check=False)
+        App('a1', client=c).delete()
+        assert [r[:2] for r in server.requests] == [('DELETE', '/apps/a1')]
+
+
+class TestLazyLoading(object):
+    "Test fetching resource details on first access of missing attributes."
+
+    def test_known_attributes(self, fix_fakeapi):
+        "Test attributes from the list payload cause no requests."
+        from relayr.resources import User
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/users/u1/devices'): [{'id': '1', 'name': 'a'},
+                {'id': '2', 'name': 'b'}]}, check=False)
+        devs = list(User('u1', client=c).get_devices())
+        assert [(d.id, d.name) for d in devs] == [('1', 'a'), ('2', 'b')]
+        assert len(server.requests) == 1
+
+    def test_load_once(self, fix_fakeapi):
+        "Test details are fetched once, even by concurrent threads."
+        import threading
+        from relayr.resources import Device
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/1'): device_payload('1')}, check=False)
+        dev = Device('1', client=c)
+        names = []
+        threads = [threading.Thread(target=lambda: names.append(dev.name))
+            for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert names == ['dev-1'] * 8
+        with pytest.raises(AttributeError):
+            dev.unknown
+        assert server.count('GET', '/devices/1') == 1
+
+    def test_failed_load(self, fix_fakeapi):
+        "Test failed detail fetches raise AttributeError."
+        from relayr.resources import Device
+        from relayr.exceptions import RelayrApiException
+        server, c = fix_fakeapi.make_client(check=False)
+        dev = Device.shared('d1', c)
+        assert not hasattr(dev, 'colour')
+        assert getattr(dev, 'colour', None) is None
+        with pytest.raises(AttributeError) as info:
+            dev.name
+        assert isinstance(info.value.__cause__, RelayrApiException)
+        assert info.value.__cause__.status_code == 404
+
+    def test_lazy_model(self, fix_fakeapi):
+        "Test the device model is fetched only when needed."
+        from relayr.resources import Device
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/devices/1'): device_payload('1', model='m1'),
+            ('GET', '/device-models/m1'): MODEL}, check=False)
+        dev = Device('1', client=c)
+        assert dev.model.id == 'm1'
+        assert server.count('GET', '/device-models/m1') == 0
+        assert dev.model.readings[0]['unit'] == 'celsius'
+        assert server.count('GET', '/device-models/m1') == 1
+
+    def test_not_lazy(self, fix_fakeapi):
+        "Test resources without client or details endpoint are not fetched."
+        from relayr.resources import Device, Publisher
+        server, c = fix_fakeapi.make_client(check=False)
+        with pytest.raises(AttributeError):
+            Device('1').name
+        with pytest.raises(AttributeError):
+            Publisher('p1', client=c).name
+        pub = Publisher.from_payload({'id': 'p1'}, c, hydrate='always')
+        assert pub.hydrate('missing') is pub
+        assert len(server.requests) == 0
+
+
+class TestIdentityMap(object):
+    "Test resource objects are shared per client."
+
+    def test_shared_model(self, fix_fakeapi):
+        "Test devices of the same model share one model object."
+        from relayr.resources import User
+        devices = [device_payload(str(i), model={'id': 'm1'}) for i in range(10)]
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/users/u1/devices'): devices,
+            ('GET', '/device-models/m1'): MODEL}, check=False)
+        devs = list(User('u1', client=c).get_devices())
+        assert len(set(id(d.model) for d in devs)) == 1
+        assert [d.model.name for d in devs] == ['Thermometer'] * 10
+        assert server.count('GET', '/device-models/m1') == 1
+
+    def test_merge(self, fix_fakeapi):
+        "Test list payloads are merged into existing objects."
+        from relayr.resources import User
+        server, c = fix_fakeapi.make_client({
+            ('GET', '/users/u1/devices'): [{'id': '1', 'name': 'new'}]},
+            check=False)
+        dev = c.get_device('1')
+        dev.description = 'kept'
+        devs = list(User('u1', client=c).get_devices())
+        assert devs[0] is dev
+        assert dev.name == 'new'
+        assert dev.description == 'kept'
+
+    def test_weak_references(self, fix_fakeapi):
+        "Test unused objects are dropped from the identity map."
+        import gc
+        server, c = fix_fakeapi.make_client(check=False)
+        dev = c.get_device('1')
+        assert len(c.resources) == 1
+        del dev
+        gc.collect()
+        assert len(c.resources) == 0
+
+
+class TestSlots(object):
+    "Test slot-based resource records."
+
+    def test_known_and_extra_fields(self):
+        "Test known fields use slots and others an overflow dictionary."
+        from relayr.resources import Device
+        dev = Device.from_payload(device_payload('1', color='red'), None, 'never')
+        assert not hasattr(dev, '__dict__')
+        assert dev.name == 'dev-1'
+        assert dev.color == 'red'
+        assert dev._extra == {'color': 'red'}
+        dev.color = 'blue'
+        del dev.public
+        assert dev.color == 'blue'
+        assert dev.missing_fields() == ['public']
+        with pytest.raises(AttributeError):
+            del dev.unknown
+
+    def test_async_slots(self):
+        "Test the asynchronous resources keep the compact layout."
+        aio = pytest.importorskip('relayr.aio')
+        assert not hasattr(aio.AsyncDevice('1'), '__dict__')
+
+
+class TestReadAhead(object):
+    "Test prefetching resource details on the worker pool."
+
+    def test_readahead(self):
+        "Test results are yielded in order with a bounded window."
+        import time
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from relayr.utils.concurrency import readahead
+        lock = threading.Lock()
+        state = {'running': 0, 'max': 0}
+
+        def func(i):
+            with lock:
+                state['running'] += 1
+                state['max'] = max(state['max'], state['running'])
+            time.sleep(0.01)
+            with lock:
+                state['running'] -= 1
+            if i == 7:
+                raise ValueError(i)
+            return i * 2
+
+        with ThreadPoolExecutor(8) as ex:
+            gen = readahead(range(10), func, 3, ex)
+            assert [next(gen) for i in range(7)] == [0, 2, 4, 6, 8, 10, 12]
+            with pytest.raises(ValueError):
+                next(gen)
+        assert state['max'] <= 3
+        assert list(readahead(range(3), func, 0, None)) == [0, 2, 4]
+
+    def test_prefetch(self, fix_fakeapi):
+        "Test detail fetches of a generator overlap."
+        import time
+        import threading
+        from relayr.resources import User
+        lock = threading.Lock()
+        state = {'running': 0, 'max': 0}
+
+        def get_app(method, url, **kwargs):
+            with lock:
+                state['running'] += 1
+                state['max'] = max(state['max'], state['running'])
+            time.sleep(0.02)
+            with lock:
+                state['running'] -= 1
+            app_id = url.rsplit('/', 1)[1]
+            return fix_fakeapi.FakeResponse(200, {'id': app_id, 'name': app_id,
+                'description': ''})
+
+        routes = {('GET', '/users/u1/apps'): [{'app': 'a%d' % i} for i in range(12)]}
+        for i in range(12):
+            routes[('GET', '/apps/a%d' % i)] = get_app
+        server, c = fix_fakeapi.make_client(routes, check=False)
+        apps = list(User('u1', client=c).get_apps(prefetch=4))
+        assert [a.name for a in apps] == ['a%d' % i for i in range(12)]
+        assert 1 < state['max'] <= 4
+        assert len(server.requests) == 13
+        c.api.shutdown()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of the persistent metadata store in ``relayr.store``.
+
+They run against a fake API backend provided by the fixture file
+``fixture_fakeapi.py`` and need no network access.
+"""
+
+import pytest
+
+
+DEVICE = {'id': 'd1', 'name': 'dev', 'owner': 'u1', 'public': False,
+    'model': 'm1'}
+
+
+def store_key(key, token='token'):
+    "Return the key of a client's store entry, as used by ``Client.fetch``."
+
+    from relayr.store import token_digest
+    return '%s:%s' % (token_digest(token), key)
+
+
+class TestMetadataStore(object):
+    "Test reading resource details through a metadata store."
+
+    def test_warm_restart(self, fix_fakeapi, tmpdir):
+        "Test stored details are used by a new client without requests."
+        from relayr.store import MetadataStore
+        path = str(tmpdir.join('metadata.sqlite'))
+        server, c = fix_fakeapi.make_client({('GET', '/devices/d1'): DEVICE},
+            store=MetadataStore(path))
+        assert c.get_device('d1').name == 'dev'
+        assert server.count('GET', '/devices/d1') == 1
+
+        server, c = fix_fakeapi.make_client(store=MetadataStore(path))
+        assert c.get_device('d1').name == 'dev'
+        assert len(server.requests) == 0
+
+    def test_expired(self, fix_fakeapi, tmpdir):
+        "Test expired details are fetched again."
+        from relayr.store import MetadataStore
+        store = MetadataStore(str(tmpdir.join('m.sqlite')), ttls={'device': 0})
+        server, c = fix_fakeapi.make_client({('GET', '/devices/d1'): DEVICE},
+            check=False, store=store)
+        c.fetch('device', 'd1', c.api.get_device, 'd1')
+        c.fetch('device', 'd1', c.api.get_device, 'd1')
+        assert server.count('GET', '/devices/d1') == 2
+
+    def test_outage(self, fix_fakeapi, tmpdir):
+        "Test expired details are served while the API is unavailable."
+        import requests
+        from relayr.store import MetadataStore
+        from relayr.exceptions import RelayrApiException
+
+        def down(method, url, **kwargs):
+            raise requests.exceptions.ConnectionError('down')
+
+        path = str(tmpdir.join('m.sqlite'))
+        store = MetadataStore(path, ttls={'device': 0})
+        store.put('device', store_key('d1'), DEVICE)
+        server, c = fix_fakeapi.make_client({('GET', '/server-status'): down,
+            ('GET', '/devices/d1'): down, ('GET', '/devices/d2'): down},
+            retry=False, store=store)
+        assert c.get_device('d1').name == 'dev'
+        with pytest.raises(requests.exceptions.ConnectionError):
+            c.fetch('device', 'd2', c.api.get_device, 'd2')
+
+        server, c = fix_fakeapi.make_client({('GET', '/devices/d1'):
+            fix_fakeapi.FakeResponse(503, {})}, check=False, retry=False,
+            store=MetadataStore(path, ttls={'device': 0}, max_stale=0))
+        with pytest.raises(RelayrApiException):
+            c.fetch('device', 'd1', c.api.get_device, 'd1')
+
+    def test_deleted(self, fix_fakeapi, tmpdir):
+        "Test a 404 response removes the stored details."
+        from relayr.store import MetadataStore
+        from relayr.exceptions import RelayrApiException
+        store = MetadataStore(str(tmpdir.join('m.sqlite')), ttls={'device': 0})
+        store.put('device', store_key('d1'), DEVICE)
+        server, c = fix_fakeapi.make_client(check=False, store=store)
+        with pytest.raises(RelayrApiException):
+            c.fetch('device', 'd1', c.api.get_device, 'd1')
+        assert store.get('device', store_key('d1')) is None
+
+    def test_secrets(self, fix_fakeapi, tmpdir):
+        "Test secrets are not stored and the file is private."
+        import os
+        import stat
+        from relayr.store import MetadataStore
+        path = str(tmpdir.join('m.sqlite'))
+        store = MetadataStore(path)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        server, c = fix_fakeapi.make_client({('GET', '/transmitters/t1'):
+            {'id': 't1', 'name': 'master', 'secret': '123',
+             'credentials': {'user': 'x', 'password': 'y'}}},
+            check=False, store=store)
+        assert c.fetch('transmitter', 't1', c.api.get_transmitter, 't1')['secret'] == '123'
+        assert store.get('transmitter', store_key('t1')).payload == \
+            {'id': 't1', 'name': 'master'}
+        with open(path, 'rb') as f:
+            assert b'123' not in f.read()
+        os.chmod(path, 0o644)
+        MetadataStore(path)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    def test_restored_secrets(self, fix_fakeapi, tmpdir):
+        "Test secrets of stored transmitters are fetched on first access."
+        from relayr.resources import Transmitter
+        from relayr.store import MetadataStore
+        path = str(tmpdir.join('m.sqlite'))
+        routes = {('GET', '/transmitters/t1'):
+            {'id': 't1', 'name': 'master', 'owner': 'u1', 'secret': '123'}}
+        server, c = fix_fakeapi.make_client(routes, check=False,
+            store=MetadataStore(path))
+        assert Transmitter('t1', client=c).secret == '123'
+
+        server, c = fix_fakeapi.make_client(routes, check=False,
+            store=MetadataStore(path))
+        trans = Transmitter('t1', client=c).hydrate('missing')
+        assert trans.name == 'master'
+        assert len(server.requests) == 0
+        assert trans.secret == '123'
+        assert trans.secret == '123'
+        with pytest.raises(AttributeError):
+            trans.unknown
+        assert server.count('GET', '/transmitters/t1') == 1
+
+    def test_tokens(self, fix_fakeapi, tmpdir):
+        "Test clients with different tokens do not share entries."
+        from relayr.store import MetadataStore
+        path = str(tmpdir.join('m.sqlite'))
+        server, c = fix_fakeapi.make_client({('GET', '/devices/d1'): DEVICE},
+            check=False, store=MetadataStore(path))
+        c.fetch('device', 'd1', c.api.get_device, 'd1')
+        server, c = fix_fakeapi.make_client({('GET', '/devices/d1'): DEVICE},
+            token='other', check=False, store=MetadataStore(path))
+        c.fetch('device', 'd1', c.api.get_device, 'd1')
+        assert server.count('GET', '/devices/d1') == 1
+
+    def test_user_outage(self, fix_fakeapi, tmpdir):
+        "Test the user, their devices and fleet snapshots during an outage."
+        import requests
+        from relayr.store import MetadataStore
+        path = str(tmpdir.join('m.sqlite'))
+        routes = {
+            ('GET', '/oauth2/user-info'): {'id': 'u1', 'name': 'joe'},
+            ('GET', '/users/u1/devices'): [DEVICE],
+            ('GET', '/users/u1/transmitters'): [],
+            ('GET', '/users/u1/devices/bookmarks'): [],
+            ('GET', '/device-models/m1'): {'id': 'm1', 'name': 'M',
+                'manufacturer': 'x', 'readings': []},
+            ('GET', '/devices/d1/channels'): {'channels': []}}
+        # all entries expire at once
+        ttls = dict((k, 0) for k in MetadataStore(path).ttls)
+        server, c = fix_fakeapi.make_client(routes, check=False,
+            store=MetadataStore(path, ttls=ttls))
+        c.fleet_snapshot()
+        assert [d.name for d in c.get_user().get_devices()] == ['dev']
+
+        def down(method, url, **kwargs):
+            raise requests.exceptions.ConnectionError('down')
+
+        server, c = fix_fakeapi.make_client(dict((k, down) for k in routes),
+            check=False, retry=False, store=MetadataStore(path, ttls=ttls))
+        usr = c.get_user()
+        assert usr.name == 'joe'
+        assert [d.name for d in usr.get_devices()] == ['dev']
+        fleet = c.fleet_snapshot()
+        assert list(fleet.devices) == ['d1']
+        # user, 3 lists, 1 model, 1 channel list, all failed
+        assert fleet.requests == len(server.requests) - 2 == 6
+        c.api.shutdown()
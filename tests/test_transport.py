@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains tests of the HTTP transport layer underneath the API
+client, i.e. sessions, retries, caching etc.
+
+These tests run against a fake API backend provided by the fixture file
+``fixture_fakeapi.py`` and need no network access.
+"""
+
+import threading
+
+import pytest
+
+
+class TestSessionPool(object):
+    "Test pooled keep-alive HTTP sessions."
+
+    def test_shared_default_pool(self):
+        "Test all Api objects share the process-wide pool by default."
+        from relayr.sessions import get_default_pool, SessionPool
+        pool = get_default_pool()
+        assert isinstance(pool, SessionPool)
+        assert get_default_pool() is pool
+
+    def test_adapter_limits(self):
+        "Test pool size and per-host limits are applied to the adapter."
+        from relayr.sessions import SessionPool
+        pool = SessionPool(pool_connections=3, pool_maxsize=7)
+        s = pool.session
+        assert s.get_adapter('https://api.relayr.io') is pool.adapter
+        assert pool.adapter._pool_connections == 3
+        assert pool.adapter._pool_maxsize == 7
+
+    def test_session_per_thread(self):
+        "Test each thread gets its own session object."
+        from relayr.sessions import SessionPool
+        pool = SessionPool()
+        sessions = []
+        def target():
+            sessions.append(pool.session)
+        threads = [threading.Thread(target=target) for i in range(3)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert len(set(map(id, sessions))) == 3
+        assert pool.session is pool.session
+
+    def test_requests_use_pool(self, fix_fakeapi):
+        "Test API calls are sent through the session pool."
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/device-models'): [{'id': '1'}]})
+        assert api.get_public_device_models() == [{'id': '1'}]
+        assert server.count('GET', '/device-models') == 1
+
+
+class TestServerCheck(object):
+    "Test deferred and cached server status checks."
+
+    def test_cached_check(self, fix_fakeapi):
+        "Test many Api objects cause only one server status request."
+        from relayr.api import server_status_cache
+        server_status_cache.clear()
+        server, api = fix_fakeapi.make_api()
+        for i in range(3):
+            fix_fakeapi.make_api()
+        assert server.count('GET', '/server-status') == 1
+        assert api.check() == {'database': 'ok'}
+        assert server.count('GET', '/server-status') == 1
+        api.check(force=True)
+        assert server.count('GET', '/server-status') == 2
+
+    def test_lazy_check(self, fix_fakeapi):
+        "Test a lazy check is deferred until the first request."
+        from relayr.api import server_status_cache
+        server_status_cache.clear()
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/device-models'): []}, check='lazy')
+        assert server.count() == 0
+        api.get_public_device_models()
+        api.get_public_device_models()
+        assert server.count('GET', '/server-status') == 1
+        assert server.count('GET', '/device-models') == 2
+
+    def test_no_check(self, fix_fakeapi):
+        "Test no server status request is made if checks are disabled."
+        from relayr.api import server_status_cache
+        server_status_cache.clear()
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/device-models'): []}, check=False)
+        api.get_public_device_models()
+        assert server.count('GET', '/server-status') == 0
+
+
+class TestConcurrentCalls(object):
+    "Test concurrent endpoint calls via futures."
+
+    def test_map(self, fix_fakeapi):
+        "Test results are returned in submission order with errors captured."
+        from relayr.exceptions import RelayrApiException
+        routes = {}
+        for i in range(20):
+            routes[('GET', '/devices/%d' % i)] = {'id': str(i)}
+        server, api = fix_fakeapi.make_api(routes, check=False)
+        ids = [str(i) for i in range(20)] + ['missing']
+        futures = api.map('get_device', ids)
+        assert [f.result()['id'] for f in futures[:-1]] == ids[:-1]
+        assert isinstance(futures[-1].exception(), RelayrApiException)
+        api.shutdown()
+
+    def test_submit_shared_executor(self, fix_fakeapi):
+        "Test an executor passed in is used and not shut down."
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(2)
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/device-models/1'): {'id': '1'}},
+            check=False, executor=executor)
+        assert api.submit('get_device_model', '1').result() == {'id': '1'}
+        api.shutdown()
+        assert executor.submit(len, 'abc').result() == 3
+        executor.shutdown()
+
+
+class TestSingleFlight(object):
+    "Test coalescing identical concurrent GET requests."
+
+    def slow(self, response):
+        import time
+        def route(method, url, **kwargs):
+            time.sleep(0.2)
+            return response
+        return route
+
+    def test_coalesce(self, fix_fakeapi):
+        "Test concurrent identical requests share one request."
+        from concurrent.futures import ThreadPoolExecutor
+        model = {'id': 'm1', 'readings': []}
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/device-models/m1'): self.slow(model)}, check=False)
+        with ThreadPoolExecutor(20) as executor:
+            res = list(executor.map(lambda i: api.get_device_model('m1'), range(20)))
+        assert server.count('GET', '/device-models/m1') == 1
+        assert res == [model] * 20
+        # every caller gets its own copy
+        assert len(set(id(r) for r in res)) == 20
+        assert api.single_flight.shared == 19
+        assert len(api.single_flight) == 0
+        api.get_device_model('m1')
+        assert server.count('GET', '/device-models/m1') == 2
+
+    def test_errors(self, fix_fakeapi):
+        "Test errors are raised in all waiting threads."
+        from concurrent.futures import ThreadPoolExecutor
+        from relayr.exceptions import RelayrApiException
+        server, api = fix_fakeapi.make_api({('GET', '/device-models/m1'):
+            self.slow(fix_fakeapi.FakeResponse(404, {'message': 'no'}))},
+            check=False)
+        with ThreadPoolExecutor(10) as executor:
+            futures = [executor.submit(api.get_device_model, 'm1')
+                for i in range(10)]
+            errors = [f.exception() for f in futures]
+        assert all(isinstance(e, RelayrApiException) for e in errors)
+        assert server.count('GET', '/device-models/m1') == 1
+
+    def test_disabled(self, fix_fakeapi):
+        "Test requests are not coalesced when disabled."
+        from concurrent.futures import ThreadPoolExecutor
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/device-models/m1'): self.slow({'id': 'm1'})},
+            check=False, coalesce=False)
+        with ThreadPoolExecutor(5) as executor:
+            list(executor.map(lambda i: api.get_device_model('m1'), range(5)))
+        assert server.count('GET', '/device-models/m1') == 5
+
+
+class TestRetries(object):
+    "Test retrying API calls failing with transient errors."
+
+    def make_flaky(self, fix_fakeapi, statuses, headers=None):
+        "Return a route failing with given status codes before succeeding."
+        statuses = list(statuses)
+        def route(method, url, **kwargs):
+            if statuses:
+                return fix_fakeapi.FakeResponse(statuses.pop(0),
+                    {'message': 'busy'}, headers=headers)
+            return {'ok': True}
+        return route
+
+    def test_retry_idempotent(self, fix_fakeapi):
+        "Test GET requests are retried on 503 and 429 responses."
+        from relayr.retry import RetryPolicy
+        route = self.make_flaky(fix_fakeapi, [503, 429])
+        server, api = fix_fakeapi.make_api({('GET', '/devices/1'): route},
+            check=False, retry=RetryPolicy(total=3, backoff_factor=0))
+        assert api.get_device('1') == {'ok': True}
+        stats = api.retry_stats.as_dict()
+        assert stats['requests'] == 3
+        assert stats['retries'] == 2
+        assert stats['reasons'] == {503: 1, 429: 1}
+
+    def test_retries_exhausted(self, fix_fakeapi):
+        "Test an exception is raised when all retries failed."
+        from relayr.retry import RetryPolicy
+        from relayr.exceptions import RelayrApiException
+        route = self.make_flaky(fix_fakeapi, [503] * 5)
+        server, api = fix_fakeapi.make_api({('GET', '/devices/1'): route},
+            check=False, retry=RetryPolicy(total=2, backoff_factor=0))
+        with pytest.raises(RelayrApiException) as excinfo:
+            api.get_device('1')
+        assert excinfo.value.status_code == 503
+        assert server.count('GET', '/devices/1') == 3
+        assert api.retry_stats.as_dict()['failures'] == 1
+
+    def test_post_opt_in(self, fix_fakeapi):
+        "Test POST requests are retried only if requested."
+        from relayr.retry import RetryPolicy
+        from relayr.exceptions import RelayrApiException
+        route = self.make_flaky(fix_fakeapi, [503, 503])
+        server, api = fix_fakeapi.make_api({('POST', '/devices/1/data'): route},
+            check=False, retry=RetryPolicy(total=3, backoff_factor=0))
+        with pytest.raises(RelayrApiException):
+            api.post_device_data('1', {'x': 1})
+        assert api.post_device_data('1', {'x': 1}, retry=True) == {'ok': True}
+        assert server.count('POST', '/devices/1/data') == 3
+
+    def test_backoff(self):
+        "Test exponential backoff and Retry-After header values."
+        from relayr.retry import RetryPolicy, parse_retry_after
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        assert [policy.backoff(i) for i in range(5)] == [1, 2, 4, 5, 5]
+        assert policy.backoff(0, '3') == 3
+        assert policy.backoff(0, '3600') == 5
+        assert 0 <= RetryPolicy(backoff_factor=1).backoff(2) <= 4
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+        assert parse_retry_after('soon') is None
+
+
+class TestRateLimiter(object):
+    "Test client-side rate limiting with token buckets."
+
+    def test_token_bucket(self):
+        "Test tokens are taken until the bucket is empty."
+        from relayr.ratelimit import TokenBucket
+        bucket = TokenBucket(rate=10, capacity=2)
+        assert bucket.take() == 0
+        assert bucket.take() == 0
+        assert 0 < bucket.take() <= 0.1
+        bucket.adjust(0, reset=5)
+        assert bucket.take() > 4
+
+    def test_file_bucket_shared(self, tmpdir):
+        "Test a file-based bucket is shared between bucket objects."
+        from relayr.ratelimit import FileTokenBucket
+        path = str(tmpdir.join('bucket'))
+        b1 = FileTokenBucket(path, rate=1, capacity=2)
+        b2 = FileTokenBucket(path, rate=1, capacity=2)
+        assert b1.take() == 0
+        assert b2.take() == 0
+        assert b1.take() > 0.5
+
+    def test_buckets_per_token_and_class(self):
+        "Test separate buckets per API token and endpoint class."
+        from relayr.ratelimit import RateLimiter
+        limiter = RateLimiter(rate=5, limits={'history': (1, 1)})
+        url = 'https://api.relayr.io/devices/1'
+        b1 = limiter.bucket('t1', 'GET', url)
+        assert limiter.bucket('t1', 'GET', url + '/apps') is b1
+        assert limiter.bucket('t2', 'GET', url) is not b1
+        assert limiter.bucket('t1', 'POST', url + '/data') is not b1
+        history = limiter.bucket('t1', 'GET', url + '/history/list')
+        assert history.rate == 1
+
+    def test_api_adapts_to_headers(self, fix_fakeapi):
+        "Test the limiter is used by the API and adjusted by response headers."
+        from relayr.ratelimit import RateLimiter
+        headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '30'}
+        limiter = RateLimiter(rate=100)
+        server, api = fix_fakeapi.make_api({('GET', '/devices/1'):
+            fix_fakeapi.FakeResponse(200, {'id': '1'}, headers=headers)},
+            check=False, rate_limiter=limiter)
+        api.get_device('1')
+        bucket = limiter.bucket(api.token, 'GET', 'https://api.relayr.io/devices/1')
+        assert bucket.take() > 29
+
+
+class TestResponseCache(object):
+    "Test caching responses of read-mostly endpoints."
+
+    def test_fresh_and_revalidated(self, fix_fakeapi):
+        "Test fresh entries are served locally and stale ones revalidated."
+        from relayr.cache import ResponseCache
+        def route(method, url, headers=None, **kwargs):
+            if headers.get('If-None-Match') == '"v1"':
+                return fix_fakeapi.FakeResponse(304, content=b'')
+            return fix_fakeapi.FakeResponse(200, {'id': 'm1'}, headers={'ETag': '"v1"'})
+        cache = ResponseCache(ttls={'get_device_model': 60})
+        server, api = fix_fakeapi.make_api({('GET', '/device-models/m1'): route},
+            check=False, cache=cache)
+        assert api.get_device_model('m1') == {'id': 'm1'}
+        assert api.get_device_model('m1') == {'id': 'm1'}
+        assert server.count('GET', '/device-models/m1') == 1
+        for entry in cache._entries.values():
+            entry.expires = 0
+        assert api.get_device_model('m1') == {'id': 'm1'}
+        assert server.count('GET', '/device-models/m1') == 2
+        assert cache.revalidations == 1
+
+    def test_results_are_copies(self, fix_fakeapi):
+        "Test modifying a returned result does not change the cache."
+        from relayr.cache import ResponseCache
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/transmitters/t1'): {'id': 't1', 'name': 'a'}},
+            check=False, cache=ResponseCache())
+        api.get_transmitter('t1')['name'] = 'b'
+        assert api.get_transmitter('t1')['name'] == 'a'
+
+    def test_not_cached(self, fix_fakeapi):
+        "Test other endpoints and meanings are matched correctly."
+        from relayr.cache import ResponseCache
+        cache = ResponseCache()
+        host = 'https://api.relayr.io'
+        assert cache.ttl(host + '/devices/1') is None
+        assert cache.ttl(host + '/apps/1/extended') is None
+        assert cache.ttl(host + '/device-models/meanings') == 3600
+
+    def test_invalidation(self, fix_fakeapi):
+        "Test modifying a resource invalidates its cached entries."
+        from relayr.cache import ResponseCache
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/transmitters/t1'): {'id': 't1'},
+            ('GET', '/transmitters/t2'): {'id': 't2'},
+            ('PATCH', '/transmitters/t1'): {'id': 't1'}},
+            check=False, cache=ResponseCache())
+        api.get_transmitter('t1')
+        api.get_transmitter('t2')
+        api.patch_transmitter('t1', name='x')
+        api.get_transmitter('t1')
+        api.get_transmitter('t2')
+        assert server.count('GET', '/transmitters/t1') == 2
+        assert server.count('GET', '/transmitters/t2') == 1
+
+    def test_list_invalidation(self, fix_fakeapi):
+        "Test modifying an app invalidates the cached app lists of publishers."
+        from relayr.cache import ResponseCache
+        server, api = fix_fakeapi.make_api({
+            ('GET', '/publishers/p1/apps'): [{'id': 'a1'}],
+            ('GET', '/transmitters/t1'): {'id': 't1'},
+            ('PATCH', '/apps/a1'): {'id': 'a1'},
+            ('DELETE', '/apps/a1'): {}},
+            check=False, cache=ResponseCache())
+        api.get_publisher_apps('p1')
+        api.get_transmitter('t1')
+        api.patch_app('a1', name='x')
+        api.get_publisher_apps('p1')
+        api.delete_app('a1')
+        api.get_publisher_apps('p1')
+        api.get_transmitter('t1')
+        assert server.count('GET', '/publishers/p1/apps') == 3
+        assert server.count('GET', '/transmitters/t1') == 1
+
+    def test_lru_eviction(self):
+        "Test the least recently used entries are evicted first."
+        from relayr.cache import ResponseCache
+        cache = ResponseCache(maxsize=2, maxbytes=10)
+        cache.put('a', '/a', b'1234', {}, 60)
+        cache.put('b', '/b', b'1234', {}, 60)
+        cache.get('a')
+        cache.put('c', '/c', b'1234', {}, 60)
+        assert sorted(cache._entries) == ['a', 'c']
+        cache.put('d', '/d', b'12345678', {}, 60)
+        assert list(cache._entries) == ['d']
+
+
+class TestJsonCodecs(object):
+    "Test JSON codecs for request and response bodies."
+
+    def test_round_trip(self):
+        "Test all available codecs encode to and decode from bytes."
+        from relayr.jsoncodec import get_codec, available_codecs
+        data = {'meaning': u'temperature °C', 'value': [1, 2.5, None, True]}
+        assert 'json' in available_codecs()
+        for name in available_codecs():
+            codec = get_codec(name)
+            encoded = codec.dumps(data)
+            assert isinstance(encoded, bytes)
+            assert codec.loads(encoded) == data
+            with pytest.raises(ValueError):
+                codec.loads(b'{invalid')
+
+    def test_unavailable(self):
+        "Test asking for an unknown codec raises an exception."
+        from relayr.jsoncodec import get_codec
+        from relayr.exceptions import RelayrException
+        with pytest.raises(RelayrException):
+            get_codec('nojson')
+
+    def test_api_codec(self, fix_fakeapi):
+        "Test the API uses the given codec for requests and responses."
+        from relayr.jsoncodec import JsonCodec
+        class CountingCodec(JsonCodec):
+            calls = 0
+            def loads(self, data):
+                self.calls += 1
+                return super(CountingCodec, self).loads(data)
+        codec = CountingCodec()
+        server, api = fix_fakeapi.make_api({('POST', '/devices/1/data'): {'ok': 1}},
+            check=False, codec=codec)
+        assert api.post_device_data('1', {'x': 1}) == {'ok': 1}
+        assert codec.calls == 1
+        assert server.requests[-1][3]['data'] == b'{"x": 1}'
+
+
+class TestStreaming(object):
+    "Test incremental parsing of large list responses."
+
+    def test_iter_json_array(self):
+        "Test elements are parsed from arbitrarily split chunks."
+        import json
+        from relayr.utils.jsonstream import iter_json_array
+        data = [{'id': i, 'name': u'Gerät %d' % i, 'tags': [1, {'a': '],['}]}
+            for i in range(50)] + [12345, 'x', None]
+        content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        for size in (1, 2, 7, 1000):
+            chunks = [content[i:i+size] for i in range(0, len(content), size)]
+            assert list(iter_json_array(chunks)) == data
+        assert list(iter_json_array([b' [ ] '])) == []
+
+    def test_invalid(self):
+        "Test invalid and incomplete arrays raise ValueError."
+        from relayr.utils.jsonstream import iter_json_array
+        for chunks in ([b'{"a": 1}'], [b'[{"a": 1}, {"b'], [b'[1, 2'], [b'[{x}]'],
+                       [b'[1 2]'], [b'[,1]'], [b'[1,]'], [b'[1,', b',2]'], [b'[,]'],
+                       [b'["a"', b' "b"]']):
+            with pytest.raises(ValueError):
+                list(iter_json_array(chunks))
+
+    def test_first_item_before_end(self):
+        "Test the first element is yielded before the rest is received."
+        from relayr.utils.jsonstream import iter_json_array
+        received = []
+        def chunks():
+            for chunk in [b'[{"id": 1},', b' {"id": 2}]']:
+                received.append(chunk)
+                yield chunk
+        items = iter_json_array(chunks())
+        assert next(items) == {'id': 1}
+        assert len(received) == 1
+
+    def test_api_stream(self, fix_fakeapi):
+        "Test streamed endpoints and the client generators using them."
+        from relayr.resources import Publisher
+        from relayr.exceptions import RelayrApiException
+        server, client = fix_fakeapi.make_client({
+            ('GET', '/publishers'): [{'id': 'p1', 'name': 'a'}, {'id': 'p2', 'name': 'b'}]},
+            check=False)
+        pubs = list(client.get_public_publishers())
+        assert [p.name for p in pubs] == ['a', 'b']
+        assert isinstance(pubs[0], Publisher)
+        with pytest.raises(RelayrApiException):
+            list(client.api.get_public_apps(stream=True))